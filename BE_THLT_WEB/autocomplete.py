@@ -0,0 +1,129 @@
+# Gợi ý tìm kiếm theo tiền tố, chạy hoàn toàn trong bộ nhớ.
+#
+# Mỗi mục (câu hỏi hoặc tag) sinh ra một khoá cho mỗi vị trí đầu từ trong text đã bỏ dấu,
+# các khoá nằm trong một list đã sắp xếp và được tra bằng bisect. Số mục bị giới hạn
+# bởi max_entries (bỏ mục cũ nhất trước), khoá bị cắt còn MAX_KEY_LENGTH ký tự.
+#
+# Rebuild: index được nạp lúc startup (load_autocomplete), cập nhật từ các router khi ghi.
+# Khi dữ liệu bị sửa ngoài API (import, sửa tay trong DB) gọi POST /admin/autocomplete/rebuild
+# hoặc question_autocomplete.rebuild(db) / tag_autocomplete.rebuild(db).
+from sqlalchemy.orm import Session
+from .models import Question, Tag
+from .search import fold
+from bisect import bisect_left, insort
+from collections import OrderedDict
+import os
+import re
+import threading
+
+MAX_KEY_LENGTH = 64
+_WORD_START_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _keys(text: str) -> set:
+    folded = fold(text or "")
+    return {folded[m.start():m.start() + MAX_KEY_LENGTH] for m in _WORD_START_RE.finditer(folded)}
+
+
+class PrefixIndex:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._keys = []
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, entry_id: int):
+        old = self._entries.pop(entry_id, None)
+        if old is None:
+            return
+        for key in old[1]:
+            i = bisect_left(self._keys, (key, entry_id))
+            if i < len(self._keys) and self._keys[i] == (key, entry_id):
+                del self._keys[i]
+
+    def _add(self, entry_id: int, text: str, payload):
+        keys = _keys(text)
+        self._entries[entry_id] = (payload, keys)
+        for key in keys:
+            insort(self._keys, (key, entry_id))
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def add(self, entry_id: int, text: str, payload=None):
+        with self._lock:
+            self._remove(entry_id)
+            self._add(entry_id, text, payload if payload is not None else text)
+
+    def remove(self, entry_id: int):
+        with self._lock:
+            self._remove(entry_id)
+
+    def load(self, items):
+        # items: (id, text, payload) theo thứ tự cũ -> mới
+        entries = OrderedDict()
+        keys = []
+        for entry_id, text, payload in items:
+            entry_keys = _keys(text)
+            entries[entry_id] = (payload, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+        keys.sort()
+        with self._lock:
+            self._entries = entries
+            self._keys = keys
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        prefix = fold(" ".join(prefix.split()))[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        result = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(result) < limit:
+                key, entry_id = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                if entry_id not in seen:
+                    seen.add(entry_id)
+                    result.append(self._entries[entry_id][0])
+                i += 1
+        return result
+
+
+class QuestionAutocomplete(PrefixIndex):
+    def rebuild(self, db: Session):
+        rows = (
+            db.query(Question.id, Question.title)
+            .order_by(Question.id.desc())
+            .limit(self.max_entries)
+            .all()
+        )
+        self.load((r.id, r.title, {"id": r.id, "title": r.title}) for r in reversed(rows))
+
+    def add_question(self, question: Question):
+        self.add(question.id, question.title, {"id": question.id, "title": question.title})
+
+
+class TagAutocomplete(PrefixIndex):
+    def rebuild(self, db: Session):
+        rows = db.query(Tag).order_by(Tag.id).limit(self.max_entries).all()
+        self.load((t.id, t.name, self._payload(t)) for t in rows)
+
+    def add_tag(self, tag: Tag):
+        self.add(tag.id, tag.name, self._payload(tag))
+
+    @staticmethod
+    def _payload(tag: Tag):
+        return {"id": tag.id, "name": tag.name, "description": tag.description}
+
+
+question_autocomplete = QuestionAutocomplete(int(os.getenv("AUTOCOMPLETE_MAX_QUESTIONS", "50000")))
+tag_autocomplete = TagAutocomplete(int(os.getenv("AUTOCOMPLETE_MAX_TAGS", "20000")))
+
+
+def load_autocomplete(db: Session):
+    question_autocomplete.rebuild(db)
+    tag_autocomplete.rebuild(db)
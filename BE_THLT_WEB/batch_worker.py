@@ -0,0 +1,156 @@
+# Khung chung cho các worker nền ghi sự kiện theo lô (reputation, notifications, feed).
+#
+# Router đưa sự kiện vào hàng đợi trong bộ nhớ sau khi commit. Worker định kỳ gom tối đa
+# batch_size sự kiện và ghi mỗi lô trong một transaction (lớp con cài _write). Khi lô lỗi:
+# - lỗi dữ liệu (IntegrityError/DataError): thử riêng từng sự kiện, sự kiện hỏng được bỏ sang
+#   dead_letters để các sự kiện còn lại vẫn được ghi;
+# - lỗi khác (mất kết nối DB, lock timeout, ...): trả nguyên lô về hàng đợi, không bỏ sự kiện nào,
+#   chờ backoff tăng dần (tối đa WORKER_MAX_BACKOFF giây) rồi mới flush lại.
+from sqlalchemy.exc import DataError, IntegrityError
+from collections import deque
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WORKER_MAX_BACKOFF = float(os.getenv("WORKER_MAX_BACKOFF", "60"))
+
+
+def is_bad_data(error: Exception) -> bool:
+    # Lỗi do chính dữ liệu của sự kiện, thử lại bao nhiêu lần cũng vẫn lỗi
+    return isinstance(error, (IntegrityError, DataError))
+
+
+class BatchWorker:
+    thread_name = "batch-worker"
+
+    def __init__(self, session_factory, interval: float, batch_size: int):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.dropped_events = 0
+        self.dead_letters = deque(maxlen=100)
+        self.last_flush_at = None
+
+    def enqueue(self, events: list):
+        now = datetime.datetime.utcnow()
+        for event in events:
+            event.setdefault("created_at", now)
+            self._queue.put(event)
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, db, batch: list):
+        # Ghi cả lô vào db (chưa commit), trả kết quả cho _applied
+        raise NotImplementedError
+
+    def _applied(self, batch: list, result):
+        # Chạy sau khi commit thành công: cập nhật số liệu, publish realtime, ...
+        pass
+
+    def _try(self, batch: list):
+        # Trả None nếu ghi thành công, ngược lại trả exception
+        db = self.session_factory()
+        try:
+            result = self._write(db, batch)
+            db.commit()
+        except Exception as error:
+            db.rollback()
+            return error
+        finally:
+            db.close()
+        self.flush_count += 1
+        self.last_flush_at = time.time()
+        self._applied(batch, result)
+        return None
+
+    def flush(self) -> int:
+        done = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                error = self._try(batch)
+                if error is None:
+                    done += len(batch)
+                    continue
+                if not is_bad_data(error):
+                    self._requeue(batch, error)
+                    return done
+                # Lô có sự kiện hỏng: thử riêng từng sự kiện để nó không chặn cả hàng đợi
+                applied, error = self._apply_each(batch)
+                done += applied
+                if error is not None:
+                    return done
+            self._backoff = 0.0
+        return done
+
+    def _apply_each(self, batch: list):
+        done = 0
+        dropped = 0
+        for i, event in enumerate(batch):
+            error = self._try([event])
+            if error is None:
+                done += 1
+            elif is_bad_data(error):
+                dropped += 1
+                self.dropped_events += 1
+                self.dead_letters.append(event)
+                logger.error("%s bỏ sự kiện lỗi dữ liệu %r: %s", self.thread_name, event, error)
+            else:
+                # DB lỗi giữa chừng: dừng thử từng sự kiện, phần còn lại chờ lần flush sau
+                self._requeue(batch[i:], error)
+                return done, error
+        if dropped:
+            logger.warning("%s bỏ %d/%d sự kiện lỗi dữ liệu", self.thread_name, dropped, len(batch))
+        return done, None
+
+    def _requeue(self, batch: list, error: Exception):
+        for event in batch:
+            self._queue.put(event)
+        self.failed_flushes += 1
+        self._backoff = min(max(self._backoff * 2, self.interval), WORKER_MAX_BACKOFF)
+        self._retry_at = time.monotonic() + self._backoff
+        logger.error("%s ghi %d sự kiện thất bại, thử lại sau %.0fs: %s", self.thread_name, len(batch), self._backoff, error)
+
+    def tick(self):
+        if time.monotonic() >= self._retry_at:
+            self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.tick()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,153 @@
+# Sinh bộ dữ liệu benchmark cố định theo seed: users, tags, questions (kèm tag), answers,
+# comments, votes và follow_tags. Cùng --scale và --seed luôn ra đúng cùng dữ liệu và id,
+# nên kết quả giữa các lần chạy/nhánh so sánh được với nhau.
+#
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m BE_THLT_WEB.benchmarks.dataset --scale small
+#
+# Cần DB trống (SQLite file, tự bật WAL, hoặc MySQL local). Mọi user dùng chung mật khẩu BENCH_PASSWORD,
+# hash một lần bằng password_hasher nên kịch bản login đo đúng chi phí bcrypt thật.
+# Các bộ đếm (upvotes, answer_count, comment_count, question_count...) được tính khớp với dữ liệu sinh ra.
+import argparse
+import datetime
+import random
+import time
+from collections import Counter
+
+from sqlalchemy import func, insert, select, text
+from ..databases import Base, engine, SessionLocal
+from ..models import User, Question, Answer, Comment, Vote, Tag, QuestionTag, FollowTag
+from ..passwords import password_hasher
+from ..ranking import hot_score
+from ..tag_counts import reconcile_tag_counts
+
+BENCH_PASSWORD = "bench-password"
+BASE_TIME = datetime.datetime(2024, 1, 1)
+CHUNK = 1000
+
+# Số trung bình mỗi câu hỏi cho answers/comments/votes (phân bố đều trong [0, 2*avg])
+SCALES = {
+    "tiny": {"users": 50, "tags": 20, "questions": 300, "answers": 2, "comments": 2, "votes": 4},
+    "small": {"users": 500, "tags": 100, "questions": 5000, "answers": 3, "comments": 2, "votes": 6},
+    "medium": {"users": 5000, "tags": 500, "questions": 50000, "answers": 3, "comments": 3, "votes": 8},
+    "large": {"users": 20000, "tags": 2000, "questions": 250000, "answers": 4, "comments": 3, "votes": 10},
+}
+
+WORDS = [
+    "python", "java", "sql", "mysql", "react", "docker", "linux", "git", "api", "fastapi",
+    "thuật", "toán", "cấu", "trúc", "dữ", "liệu", "lỗi", "biến", "hàm", "vòng", "lặp",
+    "mảng", "chuỗi", "đệ", "quy", "sắp", "xếp", "tìm", "kiếm", "con", "trỏ", "lớp", "đối", "tượng",
+    "kế", "thừa", "giao", "diện", "truy", "vấn", "chỉ", "mục", "khóa", "ngoại", "mạng", "socket",
+]
+# Từ khóa cho kịch bản search, đều xuất hiện trong tiêu đề sinh ra
+KEYWORDS = ["python", "mysql", "react", "docker", "thuật toán", "cấu trúc", "truy vấn", "đệ quy"]
+
+
+def _sentence(rng, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _vote_counts(rng, users: int, avg: int):
+    voters = rng.sample(range(1, users + 1), min(users, rng.randint(0, 2 * avg)))
+    votes = [(u, 1 if rng.random() < 0.8 else -1) for u in voters]
+    return votes, sum(v == 1 for _, v in votes), sum(v == -1 for _, v in votes)
+
+
+def generate(scale: dict, seed: int = 1, progress=None) -> dict:
+    rng = random.Random(seed)
+    db = SessionLocal()
+    if db.scalar(select(func.count(Question.id))) or db.scalar(select(func.count(User.id))):
+        db.close()
+        raise SystemExit("DB phải trống để sinh dữ liệu cố định theo id")
+    password = password_hasher.hash(BENCH_PASSWORD)
+    users, tags, questions = scale["users"], scale["tags"], scale["questions"]
+
+    db.execute(insert(User), [
+        {"id": i, "username": f"bench{i}", "email": f"bench{i}@example.com", "password": password,
+         "created_at": BASE_TIME, "reputation": 0}
+        for i in range(1, users + 1)
+    ])
+    db.execute(insert(Tag), [{"id": i, "name": f"tag-{i}", "description": _sentence(rng, 8)} for i in range(1, tags + 1)])
+    # Vài tag rất phổ biến, đuôi dài ít dùng
+    tag_weights = [1 / i for i in range(1, tags + 1)]
+    follows = {(u, t) for u in range(1, users + 1) for t in rng.choices(range(1, tags + 1), tag_weights, k=rng.randint(0, 5))}
+    db.execute(insert(FollowTag), [{"user_id": u, "tag_id": t, "create_at": BASE_TIME} for u, t in sorted(follows)])
+    db.commit()
+
+    span = 365 * 86400 / max(questions, 1)
+    answer_id = comment_id = 0
+    totals = Counter()
+    for start in range(0, questions, CHUNK):
+        q_rows, qt_rows, a_rows, c_rows, v_rows = [], [], [], [], []
+        for qid in range(start + 1, min(start + CHUNK, questions) + 1):
+            created = BASE_TIME + datetime.timedelta(seconds=int((qid - 1) * span))
+            latest = created
+            q_votes, up, down = _vote_counts(rng, users, scale["votes"])
+            v_rows += [{"user_id": u, "vote_type": v, "question_id": qid, "answer_id": None} for u, v in q_votes]
+            answer_total = rng.randint(0, 2 * scale["answers"])
+            accepted = rng.randrange(answer_total) if answer_total and rng.random() < 0.4 else None
+            for k in range(answer_total):
+                answer_id += 1
+                answered = created + datetime.timedelta(minutes=rng.randint(5, 4320))
+                latest = max(latest, answered)
+                a_votes, a_up, a_down = _vote_counts(rng, users, scale["votes"] // 2)
+                v_rows += [{"user_id": u, "vote_type": v, "question_id": None, "answer_id": answer_id} for u, v in a_votes]
+                a_comments = rng.randint(0, scale["comments"])
+                for _ in range(a_comments):
+                    comment_id += 1
+                    c_rows.append({"id": comment_id, "user_id": rng.randint(1, users), "question_id": None, "answer_id": answer_id,
+                                   "content": _sentence(rng, 12), "created_at": answered + datetime.timedelta(minutes=rng.randint(1, 600))})
+                a_rows.append({"id": answer_id, "question_id": qid, "user_id": rng.randint(1, users), "content": _sentence(rng, 60),
+                               "created_at": answered, "updated_at": answered, "upvotes": a_up, "downvotes": a_down,
+                               "is_accepted": k == accepted, "comment_count": a_comments})
+            q_comments = rng.randint(0, 2 * scale["comments"])
+            for _ in range(q_comments):
+                comment_id += 1
+                commented = created + datetime.timedelta(minutes=rng.randint(1, 2880))
+                latest = max(latest, commented)
+                c_rows.append({"id": comment_id, "user_id": rng.randint(1, users), "question_id": qid, "answer_id": None,
+                               "content": _sentence(rng, 12), "created_at": commented})
+            qt_rows += [{"question_id": qid, "tag_id": t} for t in set(rng.choices(range(1, tags + 1), tag_weights, k=rng.randint(1, 3)))]
+            views = rng.randint(0, 800)
+            q_rows.append({
+                "id": qid, "user_id": rng.randint(1, users), "title": _sentence(rng, 7) + " " + rng.choice(KEYWORDS),
+                "content": _sentence(rng, 80), "created_at": created, "updated_at": created, "views": views,
+                "upvotes": up, "downvotes": down, "status": "open" if rng.random() < 0.9 else "closed",
+                "score": up - down, "hot_score": hot_score(up, down, answer_total, created),
+                "activity_at": latest, "ranked_at": BASE_TIME, "answer_count": answer_total, "comment_count": q_comments,
+            })
+        db.execute(insert(Question), q_rows)
+        db.execute(insert(QuestionTag), qt_rows)
+        if a_rows:
+            db.execute(insert(Answer), a_rows)
+        if c_rows:
+            db.execute(insert(Comment), c_rows)
+        if v_rows:
+            db.execute(insert(Vote), v_rows)
+        db.commit()
+        totals.update(questions=len(q_rows), answers=len(a_rows), comments=len(c_rows), votes=len(v_rows))
+        if progress:
+            progress(totals)
+    reconcile_tag_counts(db)
+    db.close()
+    return {"users": users, "tags": tags, "follows": len(follows), **totals}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    if engine.dialect.name == "sqlite":
+        # WAL lưu trong file DB: đọc không chặn ghi, startup (ranking, autocomplete) và
+        # các kịch bản chạy song song không vướng "database is locked"
+        with engine.connect() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL"))
+    started = time.perf_counter()
+    summary = generate(SCALES[args.scale], args.seed, progress=lambda t: print(f"\r{t['questions']} câu hỏi", end="", flush=True))
+    print(f"\n{summary} trong {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# Đo độ trễ GET /feed (read_feed) theo số tag đang theo dõi, so với cách join thẳng
+# follow_tags -> question_tags -> questions mỗi request.
+#
+#   DATABASE_URL=sqlite:////tmp/feed.db python -m BE_THLT_WEB.benchmarks.feed_latency --questions 20000 --follows 1,5,10,25,50
+#
+# Cần DB trống dạng file. Khoảng 1/5 số tag được cho nhiều người theo dõi (vượt --fanout-limit)
+# nên đi đường pull, phần còn lại được fan-out sẵn vào feed_entries.
+import argparse
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import selectinload
+from .. import feed
+from ..databases import Base, engine, SessionLocal
+from ..models import User, Question, Tag, QuestionTag, FollowTag
+from ..tag_counts import reconcile_tag_counts
+
+
+def seed(rng, tags: int, questions: int, follows: list, fanout_limit: int):
+    db = SessionLocal()
+    crowd = fanout_limit + 10
+    db.execute(insert(User), [{"username": f"feed{i}", "email": f"feed{i}@example.com", "password": "x"} for i in range(crowd)])
+    db.execute(insert(User), [{"username": f"reader{k}", "email": f"reader{k}@example.com", "password": "x"} for k in follows])
+    db.execute(insert(Tag), [{"name": f"feed-tag-{i}"} for i in range(tags)])
+    db.flush()
+    user_ids = db.scalars(select(User.id).where(User.username.like("feed%"))).all()
+    readers = dict(db.execute(select(User.username, User.id).where(User.username.like("reader%"))).all())
+    tag_ids = db.scalars(select(Tag.id)).all()
+    large = set(rng.sample(tag_ids, max(1, tags // 5)))
+
+    follow_rows = []
+    for tag_id in tag_ids:
+        count = crowd if tag_id in large else 3
+        follow_rows += [{"user_id": u, "tag_id": tag_id} for u in rng.sample(user_ids, count)]
+    for k in follows:
+        # Trộn tag lớn/nhỏ theo đúng tỉ lệ chung
+        follow_rows += [{"user_id": readers[f"reader{k}"], "tag_id": t} for t in rng.sample(tag_ids, min(k, tags))]
+    db.execute(insert(FollowTag), follow_rows)
+
+    start = time.time() - questions * 60
+    db.execute(insert(Question), [
+        {"title": f"Câu hỏi {i}", "content": "...", "user_id": rng.choice(user_ids), "upvotes": 0, "downvotes": 0,
+         "created_at": _ts(start + i * 60)}
+        for i in range(questions)
+    ])
+    question_ids = db.scalars(select(Question.id).order_by(Question.id)).all()
+    question_tags = {qid: rng.sample(tag_ids, rng.randint(1, 3)) for qid in question_ids}
+    db.execute(insert(QuestionTag), [{"question_id": q, "tag_id": t} for q, ts in question_tags.items() for t in ts])
+    db.commit()
+    reconcile_tag_counts(db)
+    created = dict(db.execute(select(Question.id, Question.created_at)).all())
+    db.close()
+
+    worker = feed.FeedWorker(SessionLocal)
+    for qid, ts in question_tags.items():
+        worker.enqueue(SimpleNamespace(id=qid, created_at=created[qid], tags=[SimpleNamespace(id=t) for t in ts]))
+    worker.flush()
+    return readers, worker.inserted_entries
+
+
+def _ts(seconds: float):
+    import datetime
+    return datetime.datetime.fromtimestamp(seconds)
+
+
+def naive_feed(db, user_id: int, limit: int):
+    ids = db.execute(
+        select(Question.id)
+        .join(QuestionTag, QuestionTag.question_id == Question.id)
+        .join(FollowTag, FollowTag.tag_id == QuestionTag.tag_id)
+        .where(FollowTag.user_id == user_id)
+        .distinct()
+        .order_by(Question.created_at.desc(), Question.id.desc())
+        .limit(limit)
+    ).scalars().all()
+    # Nạp câu hỏi giống read_feed để so sánh công bằng
+    loaded = {q.id: q for q in db.scalars(select(Question).options(selectinload(Question.user), selectinload(Question.tags)).where(Question.id.in_(ids)))}
+    return [loaded[i] for i in ids]
+
+
+def measure(fn, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--follows", default="1,5,10,25,50")
+    parser.add_argument("--fanout-limit", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    feed.FEED_FANOUT_LIMIT = args.fanout_limit
+    follows = [int(k) for k in args.follows.split(",")]
+    Base.metadata.create_all(bind=engine)
+    readers, entries = seed(random.Random(42), args.tags, args.questions, follows, args.fanout_limit)
+    print(f"{args.questions} câu hỏi, {args.tags} tag, {entries} dòng feed_entries sau fan-out")
+
+    db = SessionLocal()
+    print(f"{'tags':>5} {'hybrid p50':>11} {'p95':>8} {'trang 2 p50':>12} {'join p50':>9} {'p95':>8}  (ms)")
+    for k in follows:
+        user_id = readers[f"reader{k}"]
+        first, cursor = feed.read_feed(db, user_id, None, args.limit)
+        if [q.id for q in first] != [q.id for q in naive_feed(db, user_id, args.limit)]:
+            print(f"  cảnh báo: feed của reader{k} khác kết quả join")
+        hybrid = measure(lambda: feed.read_feed(db, user_id, None, args.limit), args.rounds)
+        second = measure(lambda: feed.read_feed(db, user_id, cursor, args.limit), args.rounds) if cursor else (0, 0)
+        naive = measure(lambda: naive_feed(db, user_id, args.limit), args.rounds)
+        print(f"{k:>5} {hybrid[0]:>11.2f} {hybrid[1]:>8.2f} {second[0]:>12.2f} {naive[0]:>9.2f} {naive[1]:>8.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
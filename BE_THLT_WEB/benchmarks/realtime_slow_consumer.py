@@ -0,0 +1,90 @@
+# Kiểm tra hành vi của realtime hub với client đọc chậm. Thoát mã 1 nếu sai.
+#
+#   DATABASE_URL=sqlite:// python -m BE_THLT_WEB.benchmarks.realtime_slow_consumer --events 2000
+#
+# - client đọc nhanh nhận đủ sự kiện theo đúng thứ tự
+# - client không đọc không làm hàng đợi vượt queue_size, nhận "resync" khi quay lại đọc
+# - client chậm mãi sau max_resyncs lần bị hub ngắt (CLOSED), hub không giữ lại nó
+# - publish từ thread khác (như router sync trong threadpool) không bị chặn bởi client chậm
+import argparse
+import asyncio
+import sys
+import threading
+import time
+
+from ..realtime import RealtimeHub, LocalBackend, CLOSED
+
+
+async def run(events: int, queue_size: int, max_resyncs: int) -> list:
+    hub = RealtimeHub(LocalBackend(), queue_size=queue_size, max_resyncs=max_resyncs)
+    fast = hub.subscribe(["question:1"])
+    slow = hub.subscribe(["question:1"])
+    failures = []
+    received = []
+
+    async def consume_fast():
+        while len(received) < events:
+            event = await fast.get(5)
+            if event is None or event is CLOSED:
+                return
+            if event["type"] == "resync":
+                failures.append("client đọc nhanh bị resync")
+                continue
+            received.append(event["data"]["n"])
+
+    def publisher():
+        start = time.perf_counter()
+        for n in range(events):
+            hub.publish("question:1", "vote.changed", {"n": n})
+            if n % 5 == 4:
+                time.sleep(0.001)
+        stats["publish_seconds"] = time.perf_counter() - start
+
+    stats = {}
+    consumer = asyncio.create_task(consume_fast())
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    while thread.is_alive():
+        if slow.queue.qsize() > queue_size:
+            failures.append(f"hàng đợi client chậm vượt giới hạn: {slow.queue.qsize()}")
+        await asyncio.sleep(0.01)
+    thread.join()
+    await asyncio.wait_for(consumer, 10)
+
+    if received != list(range(events)):
+        failures.append(f"client đọc nhanh nhận {len(received)}/{events} sự kiện hoặc sai thứ tự")
+    expected_overflows = events // queue_size
+    if expected_overflows > max_resyncs:
+        if (await slow.get(1)) is not CLOSED:
+            failures.append("client chậm không bị ngắt sau max_resyncs")
+    else:
+        first = await slow.get(1)
+        if not first or first["type"] != "resync":
+            failures.append("client chậm không nhận resync")
+    hub.unsubscribe(fast)
+    hub.unsubscribe(slow)
+    metrics = hub.metrics()
+    if metrics["connections"] != 0 or metrics["channels"] != 0:
+        failures.append(f"hub còn giữ kết nối: {metrics}")
+    print(f"publish {events} sự kiện trong {stats['publish_seconds']:.3f}s, {metrics}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--queue-size", type=int, default=50)
+    args = parser.parse_args()
+
+    failures = []
+    # Ít sự kiện: client chậm chỉ bị resync. Nhiều sự kiện: bị ngắt.
+    failures += asyncio.run(run(args.queue_size * 2 + 1, args.queue_size, max_resyncs=5))
+    failures += asyncio.run(run(args.events, args.queue_size, max_resyncs=5))
+    for failure in failures:
+        print("FAIL:", failure)
+    print("OK" if not failures else f"{len(failures)} lỗi")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
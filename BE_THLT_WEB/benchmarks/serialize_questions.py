@@ -0,0 +1,110 @@
+# Micro-benchmark cho GET /questions: so sánh đường serialize cũ (dict dựng tay + jsonable_encoder
+# + json) với serializers (dict dựng sẵn + orjson), và số request/giây end-to-end khi bật/tắt
+# TRUSTED_SERIALIZATION (tắt = FastAPI tự encode lại response).
+#
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m BE_THLT_WEB.benchmarks.serialize_questions --questions 200 --page-size 50
+#
+# Cần DB trống dạng file. Request gửi kèm header Authorization để đi qua cache response.
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import selectinload
+from .. import serializers
+from ..databases import Base, engine, SessionLocal
+from ..main import app
+from ..models import User, Question, Tag
+
+
+def seed(questions: int):
+    db = SessionLocal()
+    users = [User(username=f"bench{i}", email=f"bench{i}@example.com", password="x") for i in range(20)]
+    tags = [Tag(name=f"bench-tag-{i}") for i in range(30)]
+    db.add_all(users + tags)
+    db.flush()
+    db.add_all(
+        Question(title=f"Câu hỏi {i}", content="nội dung " * 40, user_id=users[i % 20].id,
+                 upvotes=i % 7, downvotes=0, tags=[tags[i % 30], tags[(i + 11) % 30]])
+        for i in range(questions)
+    )
+    db.commit()
+    db.close()
+
+
+def legacy_payload(questions):
+    # Bản sao cách get_questions dựng response trước đây
+    return {
+        "questions": [
+            {
+                "id": q.id,
+                "user_id": q.user_id,
+                "title": q.title,
+                "content": q.content,
+                "views": q.views,
+                "upvotes": q.upvotes,
+                "downvotes": q.downvotes,
+                "status": q.status,
+                "answer_count": q.answer_count,
+                "comment_count": q.comment_count,
+                "user": {
+                    "id": q.user.id,
+                    "username": q.user.username,
+                    "email": q.user.email,
+                    "reputation": q.user.reputation,
+                    "created_at": str(q.user.created_at) if q.user.created_at else None,
+                    "role": getattr(q.user, "role", "student"),
+                },
+                "tags": [tag.name for tag in q.tags],
+                "created_at": str(q.created_at),
+                "updated_at": str(q.updated_at) if q.updated_at else None
+            }
+            for q in questions
+        ],
+        "total": len(questions),
+        "next_cursor": None
+    }
+
+
+def timed(fn, seconds: float):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    seed(args.questions)
+
+    db = SessionLocal()
+    page = db.query(Question).options(selectinload(Question.user), selectinload(Question.tags)).limit(args.page_size).all()
+    legacy = timed(lambda: json.dumps(jsonable_encoder(legacy_payload(page))).encode(), args.seconds)
+    fast = timed(lambda: serializers.FastJSONResponse(
+        {"questions": serializers.serialize_question.many(page), "total": len(page), "next_cursor": None}
+    ).body, args.seconds)
+    db.close()
+    print(f"serialize {args.page_size} câu hỏi: cũ {legacy:9.1f} lần/s | mới {fast:9.1f} lần/s | x{fast / legacy:.2f}")
+
+    client = TestClient(app)
+    headers = {"Authorization": "Bearer benchmark"}
+    url = f"/questions?pageSize={args.page_size}&include_total=false"
+    results = {}
+    for trusted in (False, True):
+        serializers.TRUSTED_SERIALIZATION = trusted
+        client.get(url, headers=headers).raise_for_status()
+        results[trusted] = timed(lambda: client.get(url, headers=headers), args.seconds)
+    print(f"GET /questions: validate lại {results[False]:7.1f} req/s | trusted {results[True]:7.1f} req/s | x{results[True] / results[False]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Đo RSS đỉnh của worker khi trả GET /questions/by_tag/{id} theo số câu hỏi trong tag:
+# cách cũ (.all() rồi dựng cả body) so với ?stream=json và ?stream=ndjson.
+#
+#   DATABASE_URL=sqlite:////tmp/stream.db python -m BE_THLT_WEB.benchmarks.stream_memory --sizes 5000,20000,80000
+#
+# Cần DB trống dạng file. Mỗi phép đo chạy trong một process con mới, gọi thẳng ASGI app và bỏ
+# body ngay khi nhận để chỉ tính bộ nhớ phía server. Thoát mã 1 nếu RSS của chế độ stream tăng
+# quá --flat-mb giữa kích thước nhỏ nhất và lớn nhất.
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+
+from sqlalchemy import insert, func, select
+
+MODES = {"buffered": "", "json": "?stream=json", "ndjson": "?stream=ndjson"}
+
+
+def seed(total: int):
+    from ..databases import SessionLocal
+    from ..models import User, Question, Tag, QuestionTag
+    db = SessionLocal()
+    if not db.scalar(select(func.count(Tag.id))):
+        db.execute(insert(User), [{"username": "stream", "email": "stream@example.com", "password": "x"}])
+        db.execute(insert(Tag), [{"name": "stream-tag"}, {"name": "stream-other"}])
+    user_id = db.scalar(select(User.id).where(User.username == "stream"))
+    tag_id, other_id = db.scalars(select(Tag.id).order_by(Tag.id)).all()[:2]
+    existing = db.scalar(select(func.count(Question.id)))
+    content = "Nội dung câu hỏi dùng để đo bộ nhớ. " * 12
+    for start in range(existing, total, 5000):
+        stop = min(start + 5000, total)
+        db.execute(insert(Question), [
+            {"title": f"Câu hỏi {i}", "content": content, "user_id": user_id, "upvotes": 0, "downvotes": 0}
+            for i in range(start, stop)
+        ])
+        ids = db.scalars(select(Question.id).order_by(Question.id).offset(start).limit(stop - start)).all()
+        db.execute(insert(QuestionTag), [{"question_id": q, "tag_id": t} for q in ids for t in (tag_id, other_id)])
+        db.commit()
+    db.close()
+    return tag_id
+
+
+async def _call(app, path: str):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+        "headers": [], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    sent = {"status": None, "bytes": 0}
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            sent["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sent
+
+
+def measure(path: str) -> dict:
+    from ..main import app
+    # Chạy trước mọi nhánh code trên tag rỗng để import/khởi tạo không tính vào phép đo
+    for suffix in MODES.values():
+        asyncio.run(_call(app, "/questions/by_tag/0" + suffix))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    sent = asyncio.run(_call(app, path))
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {**sent, "rss_growth_kb": after - before}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="5000,20000,80000")
+    parser.add_argument("--flat-mb", type=float, default=16)
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return
+
+    from ..databases import Base, engine
+    Base.metadata.create_all(bind=engine)
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    growth = {mode: [] for mode in MODES}
+    print(f"{'câu hỏi':>8} {'chế độ':>9} {'body MB':>8} {'RSS tăng MB':>12}")
+    for size in sizes:
+        tag_id = seed(size)
+        for mode, suffix in MODES.items():
+            out = subprocess.run(
+                [sys.executable, "-m", "BE_THLT_WEB.benchmarks.stream_memory", "--measure", f"/questions/by_tag/{tag_id}{suffix}"],
+                capture_output=True, text=True, env=os.environ, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            if result["status"] != 200:
+                print(f"  lỗi: {mode} trả {result['status']}")
+                sys.exit(1)
+            growth[mode].append(result["rss_growth_kb"] / 1024)
+            print(f"{size:>8} {mode:>9} {result['bytes'] / 2**20:>8.1f} {growth[mode][-1]:>12.1f}")
+
+    failed = False
+    for mode in ("json", "ndjson"):
+        delta = growth[mode][-1] - growth[mode][0]
+        if delta > args.flat_mb:
+            print(f"FAIL: RSS của stream={mode} tăng {delta:.1f} MB từ {sizes[0]} lên {sizes[-1]} câu hỏi")
+            failed = True
+    if failed:
+        sys.exit(1)
+    print("OK: RSS của chế độ stream giữ phẳng theo kích thước kết quả")
+
+
+if __name__ == "__main__":
+    main()
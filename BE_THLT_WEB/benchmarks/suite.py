@@ -0,0 +1,286 @@
+# Bộ benchmark theo kịch bản trên dữ liệu sinh bởi benchmarks.dataset: list, thread, search,
+# vote, post (tạo câu hỏi), answer, login. Mỗi kịch bản báo p50/p95/p99, throughput và số câu
+# truy vấn mỗi request; kết quả ghi ra JSON để so sánh giữa các lần chạy.
+#
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m BE_THLT_WEB.benchmarks.dataset --scale small
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m BE_THLT_WEB.benchmarks.suite --requests 300 --output before.json
+#   ... đổi code ...
+#   DATABASE_URL=sqlite:////tmp/bench.db python -m BE_THLT_WEB.benchmarks.suite --requests 300 --compare before.json
+#
+# Mặc định gọi app trong process (TestClient, có startup/shutdown) và đếm query qua event hook
+# trên engine đồng bộ lẫn bất đồng bộ. --base-url để bắn vào server đang chạy (cùng DB, cùng
+# SECRET_KEY), khi đó không có số query. GET mặc định gửi kèm token để đo đường không qua
+# response cache, thêm --anonymous để đo đường ẩn danh có cache.
+# Kịch bản ghi (vote, post, answer) làm thay đổi dữ liệu: sinh lại DB trước khi so sánh nghiêm ngặt.
+import argparse
+import contextvars
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, func, select
+from .dataset import BENCH_PASSWORD, KEYWORDS
+from ..databases import engine, async_engine, SessionLocal
+from ..models import User, Question, Answer, Tag
+from ..utils import create_access_token
+
+_queries = contextvars.ContextVar("bench_queries", default=None)
+QUERY_HEADER = "x-bench-queries"
+
+
+def _count_query(*args):
+    box = _queries.get()
+    if box is not None:
+        box[0] += 1
+
+
+def instrument(app):
+    # Bọc ngoài cùng ASGI app: đếm query của từng request và trả về qua header
+    for e in (engine, async_engine.sync_engine):
+        event.listen(e, "before_cursor_execute", _count_query)
+
+    async def counted(scope, receive, send):
+        if scope["type"] != "http":
+            return await app(scope, receive, send)
+        box = [0]
+        _queries.set(box)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(QUERY_HEADER.encode(), str(box[0]).encode())]
+            await send(message)
+
+        await app(scope, receive, send_with_count)
+
+    return counted
+
+
+class Context:
+    def __init__(self, anonymous: bool):
+        db = SessionLocal()
+        self.users = db.scalar(select(func.max(User.id)).where(User.username.like("bench%")))
+        self.questions = db.scalar(select(func.max(Question.id)))
+        self.answers = db.scalar(select(func.max(Answer.id)))
+        self.tags = db.scalars(select(Tag.name).order_by(Tag.question_count.desc()).limit(50)).all()
+        db.close()
+        if not self.users or not self.questions:
+            raise SystemExit("DB chưa có dữ liệu, chạy benchmarks.dataset trước")
+        self.anonymous = anonymous
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def user(self, rng) -> int:
+        return rng.randint(1, self.users)
+
+    def auth(self, user_id: int) -> dict:
+        with self._lock:
+            token = self._tokens.get(user_id)
+            if token is None:
+                token = self._tokens[user_id] = create_access_token({"sub": str(user_id), "username": f"bench{user_id}", "role": "student"})
+        return {"Authorization": f"Bearer {token}"}
+
+    def read_headers(self, rng) -> dict:
+        return {} if self.anonymous else self.auth(self.user(rng))
+
+
+def list_questions(client, ctx, rng):
+    sort = rng.choice(["newest", "votes", "hot", "active"])
+    return client.get(f"/questions?sort={sort}&pageSize=20&page={rng.randint(1, 20)}", headers=ctx.read_headers(rng))
+
+
+def read_thread(client, ctx, rng):
+    return client.get(f"/questions/{rng.randint(1, ctx.questions)}/thread", headers=ctx.read_headers(rng))
+
+
+def search(client, ctx, rng):
+    return client.get(f"/questions/search/{rng.choice(KEYWORDS)}?pageSize=20", headers=ctx.read_headers(rng))
+
+
+def vote(client, ctx, rng):
+    body = {"vote_type": rng.choice(["up", "up", "down"])}
+    if rng.random() < 0.5:
+        body["question_id"] = rng.randint(1, ctx.questions)
+    else:
+        body["answer_id"] = rng.randint(1, ctx.answers)
+    return client.post("/votes", json=body, headers=ctx.auth(ctx.user(rng)))
+
+
+def post_question(client, ctx, rng):
+    body = {"title": f"Câu hỏi benchmark {rng.random():.8f}", "content": "nội dung " * 40, "tags": rng.sample(ctx.tags, min(3, len(ctx.tags)))}
+    return client.post("/questions", json=body, headers=ctx.auth(ctx.user(rng)))
+
+
+def post_answer(client, ctx, rng):
+    body = {"question_id": rng.randint(1, ctx.questions), "content": "câu trả lời " * 30}
+    return client.post("/answers", json=body, headers=ctx.auth(ctx.user(rng)))
+
+
+def login(client, ctx, rng):
+    return client.post("/auth/login", data={"username": f"bench{ctx.user(rng)}@example.com", "password": BENCH_PASSWORD})
+
+
+SCENARIOS = {
+    "list": ("GET /questions", list_questions),
+    "thread": ("GET /questions/{id}/thread", read_thread),
+    "search": ("GET /questions/search/{keyword}", search),
+    "vote": ("POST /votes", vote),
+    "post": ("POST /questions", post_question),
+    "answer": ("POST /answers", post_answer),
+    "login": ("POST /auth/login", login),
+}
+
+
+def percentile(samples: list, p: float) -> float:
+    # Nearest-rank trên mẫu đã sắp xếp
+    return samples[max(0, math.ceil(p / 100 * len(samples)) - 1)]
+
+
+def run_scenario(client, ctx, fn, requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    for i in range(warmup):
+        fn(client, ctx, random.Random(seed * 7919 + i))
+
+    def one(i):
+        rng = random.Random(seed * 1_000_003 + i)
+        start = time.perf_counter()
+        response = fn(client, ctx, rng)
+        elapsed = (time.perf_counter() - start) * 1000
+        queries = response.headers.get(QUERY_HEADER)
+        return elapsed, response.status_code, int(queries) if queries is not None else None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] for r in results)
+    statuses = {}
+    for _, code, _ in results:
+        statuses[str(code)] = statuses.get(str(code), 0) + 1
+    queries = [r[2] for r in results if r[2] is not None]
+    return {
+        "requests": requests,
+        "errors": sum(code >= 400 for _, code, _ in results),
+        "status_codes": statuses,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(statistics.fmean(latencies), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "throughput_rps": round(requests / wall, 1),
+        "queries_per_request": {
+            "mean": round(statistics.fmean(queries), 2),
+            "max": max(queries),
+        } if queries else None,
+    }
+
+
+def _git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report: dict, baseline: dict):
+    print(f"\nso với {baseline['meta'].get('git_rev')} ({baseline['meta'].get('started_at')}):")
+    print(f"{'kịch bản':<8} {'p50':>16} {'p95':>16} {'rps':>16} {'query':>10}")
+    for name, current in report["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+
+        def delta(new, prev):
+            return f"{new:>8.1f} ({(new - prev) / prev * 100:+5.0f}%)" if prev else f"{new:>8.1f}"
+
+        q_new = (current["queries_per_request"] or {}).get("mean")
+        q_old = (old["queries_per_request"] or {}).get("mean")
+        queries = f"{q_old}->{q_new}" if q_new is not None and q_old is not None else "-"
+        print(f"{name:<8} {delta(current['latency_ms']['p50'], old['latency_ms']['p50']):>16} "
+              f"{delta(current['latency_ms']['p95'], old['latency_ms']['p95']):>16} "
+              f"{delta(current['throughput_rps'], old['throughput_rps']):>16} {queries:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--login-requests", type=int, default=30, help="login tốn bcrypt nên chạy ít hơn")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--anonymous", action="store_true")
+    parser.add_argument("--base-url")
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"kịch bản không có: {', '.join(unknown)}")
+
+    ctx = Context(args.anonymous)
+    if args.base_url:
+        import httpx
+        client = httpx.Client(base_url=args.base_url, timeout=60)
+        closer = client.close
+    else:
+        from fastapi.testclient import TestClient
+        from ..main import app
+        client = TestClient(instrument(app))
+        client.__enter__()
+        closer = lambda: client.__exit__(None, None, None)
+
+    report = {
+        "meta": {
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "target": args.base_url or "in-process",
+            "database": engine.dialect.name,
+            "dataset": {"users": ctx.users, "questions": ctx.questions, "answers": ctx.answers},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "anonymous": args.anonymous,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "scenarios": {},
+    }
+    print(f"{'kịch bản':<8} {'endpoint':<32} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8} {'query':>6} {'lỗi':>5}")
+    try:
+        for name in names:
+            endpoint, fn = SCENARIOS[name]
+            requests = args.login_requests if name == "login" else args.requests
+            result = run_scenario(client, ctx, fn, requests, args.concurrency, min(args.warmup, requests), args.seed)
+            report["scenarios"][name] = {"endpoint": endpoint, **result}
+            latency = result["latency_ms"]
+            queries = result["queries_per_request"]["mean"] if result["queries_per_request"] else "-"
+            print(f"{name:<8} {endpoint:<32} {latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f} "
+                  f"{result['throughput_rps']:>8.1f} {queries:>6} {result['errors']:>5}")
+    finally:
+        closer()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+    if any(s["errors"] for s in report["scenarios"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
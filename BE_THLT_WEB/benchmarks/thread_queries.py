@@ -0,0 +1,93 @@
+# Kiểm tra số câu truy vấn của GET /questions/{id}/thread: phải cố định, không tăng theo
+# số câu trả lời/bình luận (chặn hồi quy N+1). Thoát mã 1 nếu vượt ngân sách.
+#
+#   DATABASE_URL=sqlite:////tmp/thread.db python -m BE_THLT_WEB.benchmarks.thread_queries --answers 50 --comments 5
+#
+# Cần DB trống dạng file (engine đồng bộ và bất đồng bộ phải cùng nhìn thấy dữ liệu).
+import argparse
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from ..databases import Base, engine, async_engine, SessionLocal
+from ..main import app
+from ..models import User, Question, Answer, Comment, Vote, Tag, SaveQuestion
+from ..utils import create_access_token, token_claims
+
+# question + tags + comments(+user) + answers(+user, +comments, +comment.user) + votes + saved + user
+QUERY_BUDGET = 12
+
+
+def seed(prefix: str, answers: int, comments: int):
+    db = SessionLocal()
+    users = [User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password="x") for i in range(10)]
+    db.add_all(users)
+    db.flush()
+    tags = [Tag(name=f"{prefix}-tag-{i}") for i in range(3)]
+    question = Question(title="Thread", content="...", user_id=users[0].id, upvotes=0, downvotes=0, tags=tags)
+    db.add(question)
+    db.flush()
+    for i in range(answers):
+        answer = Answer(question_id=question.id, user_id=users[i % 10].id, content=f"answer {i}", upvotes=i, downvotes=0)
+        db.add(answer)
+        db.flush()
+        db.add_all(Comment(answer_id=answer.id, user_id=users[j % 10].id, content="c") for j in range(comments))
+        db.add(Vote(user_id=users[1].id, answer_id=answer.id, vote_type=1))
+    db.add_all(Comment(question_id=question.id, user_id=users[j % 10].id, content="c") for j in range(comments))
+    db.add(Vote(user_id=users[1].id, question_id=question.id, vote_type=1))
+    db.add(SaveQuestion(user_id=users[1].id, question_id=question.id))
+    db.commit()
+    token = create_access_token(token_claims(users[1]))
+    question_id = question.id
+    db.close()
+    return question_id, token
+
+
+def count_queries(client, url, headers):
+    counter = {"n": 0}
+
+    def on_execute(*args):
+        counter["n"] += 1
+    targets = [engine, async_engine.sync_engine]
+    for target in targets:
+        event.listen(target, "before_cursor_execute", on_execute)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", on_execute)
+    response.raise_for_status()
+    return counter["n"], response.json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    client = TestClient(app)
+    small_id, _ = seed("small", 1, 1)
+    large_id, token = seed("large", args.answers, args.comments)
+
+    ok = True
+    for name, qid, headers in [
+        ("nhỏ, ẩn danh", small_id, {}),
+        ("lớn, ẩn danh", large_id, {}),
+        ("nhỏ, đăng nhập", small_id, {"Authorization": f"Bearer {token}"}),
+        ("lớn, đăng nhập", large_id, {"Authorization": f"Bearer {token}"}),
+    ]:
+        queries, body = count_queries(client, f"/questions/{qid}/thread", headers)
+        print(f"{name:16} answers={len(body['answers']):4} queries={queries}")
+        ok &= queries <= QUERY_BUDGET
+
+    _, body = count_queries(client, f"/questions/{large_id}/thread", {"Authorization": f"Bearer {token}"})
+    ok &= body["is_saved"] and body["my_vote"] == "up" and all(a["my_vote"] == "up" for a in body["answers"])
+    ok &= all(len(a["comments"]) == args.comments for a in body["answers"])
+    print("OK" if ok else f"FAIL: vượt ngân sách {QUERY_BUDGET} câu truy vấn hoặc sai dữ liệu")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# Load test cho vote_engine: nhiều thread vote đồng thời rồi kiểm tra upvotes/downvotes
+# khớp chính xác với bảng votes.
+#
+#   DATABASE_URL=sqlite:// python -m BE_THLT_WEB.benchmarks.vote_load --users 50 --questions 5 --rounds 40
+#
+# Mặc định chạy trên một file SQLite tạm, truyền --url để chạy trên MySQL local (DB trống).
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from ..databases import Base
+from ..models import User, Question, Vote
+from ..schemas import VoteCreate
+from ..vote_engine import cast_vote, cast_votes
+
+
+def setup(Session, users: int, questions: int):
+    db = Session()
+    db.add_all(User(username=f"voter{i}", email=f"voter{i}@example.com", password="x") for i in range(users))
+    db.add_all(Question(title=f"Câu hỏi {i}", content="...", user_id=1, upvotes=0, downvotes=0) for i in range(questions))
+    db.commit()
+    user_ids = [u.id for u in db.query(User.id)]
+    question_ids = [q.id for q in db.query(Question.id)]
+    db.close()
+    return user_ids, question_ids
+
+
+def voter(Session, user_id, question_ids, rounds, stats, lock):
+    rng = random.Random(user_id)
+    applied = rejected = retried = 0
+    for _ in range(rounds):
+        while True:
+            db = Session()
+            try:
+                if rng.random() < 0.2:
+                    batch = [VoteCreate(vote_type=rng.choice(["up", "down"]), question_id=qid) for qid in rng.sample(question_ids, min(3, len(question_ids)))]
+                    results, _, _ = cast_votes(db, user_id, batch)
+                    applied += sum(r["status"] == "applied" for r in results)
+                    rejected += sum(r["status"] != "applied" for r in results)
+                else:
+                    cast_vote(db, user_id, rng.choice(["up", "down"]), question_id=rng.choice(question_ids))
+                    applied += 1
+                break
+            except HTTPException:
+                rejected += 1
+                break
+            except OperationalError:
+                # SQLite/MySQL báo lock/deadlock: rollback và thử lại như client thật
+                db.rollback()
+                retried += 1
+            finally:
+                db.close()
+    with lock:
+        stats["applied"] += applied
+        stats["rejected"] += rejected
+        stats["retried"] += retried
+
+
+def verify(Session) -> list:
+    db = Session()
+    actual = {
+        (qid, vt): n
+        for qid, vt, n in db.query(Vote.question_id, Vote.vote_type, func.count()).group_by(Vote.question_id, Vote.vote_type)
+    }
+    mismatches = []
+    for q in db.query(Question):
+        expected = (actual.get((q.id, 1), 0), actual.get((q.id, -1), 0))
+        if (q.upvotes, q.downvotes) != expected:
+            mismatches.append((q.id, (q.upvotes, q.downvotes), expected))
+    db.close()
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--url", default="sqlite:///" + os.path.join(tempfile.mkdtemp(), "vote_load.db"))
+    args = parser.parse_args(argv)
+
+    connect_args = {"timeout": 60} if args.url.startswith("sqlite") else {}
+    engine = create_engine(args.url, connect_args=connect_args, pool_size=args.users, max_overflow=0)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    user_ids, question_ids = setup(Session, args.users, args.questions)
+    stats = {"applied": 0, "rejected": 0, "retried": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=voter, args=(Session, uid, question_ids, args.rounds, stats, lock))
+        for uid in user_ids
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    mismatches = verify(Session)
+    total = stats["applied"] + stats["rejected"]
+    print(f"{total} phiếu từ {len(user_ids)} user trong {elapsed:.2f}s ({total / elapsed:.0f} phiếu/s)")
+    print(f"applied={stats['applied']} rejected={stats['rejected']} retried={stats['retried']}")
+    if mismatches:
+        for qid, got, expected in mismatches:
+            print(f"SAI question {qid}: (up, down)={got}, đúng phải là {expected}")
+        return 1
+    print("OK: upvotes/downvotes khớp chính xác với bảng votes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
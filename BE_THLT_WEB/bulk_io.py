@@ -0,0 +1,510 @@
+# Nhập/xuất hàng loạt câu hỏi (kèm câu trả lời, bình luận, tag) dạng NDJSON.
+#
+# Mỗi dòng là một object:
+#   {"type": "tag", "name": "python", "description": "..."}
+#   {"type": "question", "ref": 12, "title": "...", "content": "...", "username": "sv01",
+#    "created_at": "2021-03-01T08:00:00", "tags": ["python"], "views": 10, "upvotes": 2, "downvotes": 0,
+#    "comments": [{"username": "...", "content": "...", "created_at": "..."}],
+#    "answers": [{"username": "...", "content": "...", "is_accepted": true, "comments": [...]}]}
+# Người dùng tham chiếu bằng "user_id" hoặc "username"; không tìm thấy thì để ẩn danh (user_id không tồn tại
+# được ghi vào danh sách lỗi nhưng vẫn nhập dòng đó).
+#
+# Nhập: mỗi IMPORT_CHUNK_SIZE câu hỏi là một transaction, mọi bảng ghi bằng executemany;
+# id của questions/answers (cần cho bảng con) đọc lại bằng một SELECT mỗi bảng.
+# Bộ đếm (answer_count, comment_count, question_count của tag) và điểm xếp hạng được tính sẵn
+# lúc ghi. Lỗi giữa chừng: các chunk trước đã commit, báo cáo có committed_line để chạy lại
+# với --start-line.
+# Xuất: duyệt questions theo keyset trên id, mỗi trang nạp quan hệ bằng selectinload rồi bỏ khỏi session.
+#
+#   python -m BE_THLT_WEB.bulk_io import data.ndjson [--chunk-size 500] [--start-line 1]
+#   python -m BE_THLT_WEB.bulk_io export [out.ndjson]
+from collections import Counter, defaultdict, deque
+from types import SimpleNamespace
+from sqlalchemy import func, insert, or_, select
+from sqlalchemy.orm import Session, selectinload
+from .databases import SessionLocal, insert_ignore
+from .models import User, Question, Answer, Comment, Tag, QuestionTag
+from .tag_resolver import tag_resolver
+from .tag_counts import adjust_tag_counts
+from .ranking import hot_score
+from .search import search_backend
+from .autocomplete import load_autocomplete
+from .pagination import question_count_cache
+from .response_cache import response_cache
+import datetime
+import logging
+import os
+import sys
+import time
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "200"))
+MAX_REPORTED_ERRORS = 100
+
+
+class RecordError(ValueError):
+    pass
+
+
+def _text(record: dict, field: str) -> str:
+    value = record.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise RecordError(f"thiếu {field}")
+    return value
+
+
+def _int(record: dict, field: str) -> int:
+    value = record.get(field) or 0
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise RecordError(f"{field} phải là số nguyên: {value!r}")
+    return value
+
+
+def _objects(record: dict, field: str) -> list:
+    value = record.get(field) or []
+    if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+        raise RecordError(f"{field} phải là danh sách object")
+    return value
+
+
+def _user_ref(record: dict) -> dict:
+    # Chỉ giữ khoá tham chiếu người dùng; user_id sai kiểu làm hỏng cả chunk nên phải chặn ở đây
+    user_id = record.get("user_id")
+    if user_id is not None:
+        if isinstance(user_id, bool) or not isinstance(user_id, int):
+            raise RecordError(f"user_id phải là số nguyên: {user_id!r}")
+        return {"user_id": user_id}
+    username = record.get("username")
+    return {"username": username} if isinstance(username, str) else {}
+
+
+def _time(value, default):
+    if value is None:
+        return default
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise RecordError(f"thời gian không hợp lệ: {value!r}")
+    # Cột DateTime lưu giờ local không kèm múi giờ
+    return parsed.astimezone().replace(tzinfo=None) if parsed.tzinfo else parsed
+
+
+class BulkImporter:
+    def __init__(self, session_factory=SessionLocal, chunk_size: int = IMPORT_CHUNK_SIZE, progress=None):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self._pending = []
+        self._pending_tags = []
+        self._last_line = 0
+        self._users = {}
+        self._user_ids = {}
+        self.started = time.monotonic()
+        self.stats = Counter()
+        self.errors = []
+        self.committed_line = 0
+
+    def _error(self, line_no: int, message: str):
+        self.stats["skipped"] += 1
+        self._note(line_no, message)
+
+    def _note(self, line_no: int, message: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def add(self, line_no: int, line) -> bool:
+        # Trả True khi đủ một chunk, người gọi nên flush()
+        self._last_line = line_no
+        if not line.strip():
+            return False
+        self.stats["lines"] += 1
+        try:
+            record = orjson.loads(line)
+            if not isinstance(record, dict):
+                raise RecordError("mỗi dòng phải là một object")
+            kind = record.get("type", "question")
+            if kind == "tag":
+                self._pending_tags.append({"name": _text(record, "name").strip(), "description": record.get("description")})
+            elif kind == "question":
+                question = self._question(record)
+                question["line"] = line_no
+                self._pending.append(question)
+            else:
+                raise RecordError(f"type không hỗ trợ: {kind!r}")
+        except (orjson.JSONDecodeError, RecordError) as e:
+            self._error(line_no, str(e))
+        return len(self._pending) >= self.chunk_size
+
+    def _comment(self, record: dict, now) -> dict:
+        return {"user": _user_ref(record), "content": _text(record, "content"), "created_at": _time(record.get("created_at"), now)}
+
+    def _question(self, record: dict) -> dict:
+        now = datetime.datetime.now()
+        created = _time(record.get("created_at"), now)
+        answers = []
+        for a in _objects(record, "answers"):
+            answer_created = _time(a.get("created_at"), created)
+            answers.append({
+                "user": _user_ref(a),
+                "content": _text(a, "content"),
+                "created_at": answer_created,
+                "updated_at": _time(a.get("updated_at"), answer_created),
+                "upvotes": _int(a, "upvotes"),
+                "downvotes": _int(a, "downvotes"),
+                "is_accepted": bool(a.get("is_accepted")),
+                "comments": [self._comment(c, answer_created) for c in _objects(a, "comments")],
+            })
+        comments = [self._comment(c, created) for c in _objects(record, "comments")]
+        tags = record.get("tags") or []
+        if not isinstance(tags, list):
+            raise RecordError("tags phải là danh sách")
+        status = record.get("status", "open")
+        if status not in ("open", "closed"):
+            raise RecordError(f"status không hợp lệ: {status!r}")
+        return {
+            "user": _user_ref(record),
+            "title": _text(record, "title"),
+            "content": _text(record, "content"),
+            "created_at": created,
+            "updated_at": _time(record.get("updated_at"), created),
+            "views": _int(record, "views"),
+            "upvotes": _int(record, "upvotes"),
+            "downvotes": _int(record, "downvotes"),
+            "status": status,
+            "tags": [t for t in tags if isinstance(t, str)],
+            "answers": answers,
+            "comments": comments,
+        }
+
+    def _resolve_users(self, db: Session, records: list):
+        # Một câu IN cho cả user_id lẫn username chưa gặp trong chunk
+        ids = set()
+        names = set()
+        for q in records:
+            refs = [q["user"]] + [c["user"] for c in q["comments"]]
+            for a in q["answers"]:
+                refs += [a["user"]] + [c["user"] for c in a["comments"]]
+            for ref in refs:
+                if "user_id" in ref:
+                    ids.add(ref["user_id"])
+                elif "username" in ref:
+                    names.add(ref["username"])
+        missing_ids = [i for i in ids if i not in self._user_ids]
+        missing_names = [n for n in names if n not in self._users]
+        if missing_ids or missing_names:
+            rows = db.execute(
+                select(User.id, User.username).where(or_(User.id.in_(missing_ids), User.username.in_(missing_names)))
+            ).all()
+            found_ids = {row.id for row in rows}
+            by_name = {row.username: row.id for row in rows}
+            for user_id in missing_ids:
+                self._user_ids[user_id] = user_id in found_ids
+            for name in missing_names:
+                self._users[name] = by_name.get(name)
+
+    def _user_id(self, ref: dict, line_no: int):
+        if "user_id" in ref:
+            if self._user_ids.get(ref["user_id"]):
+                return ref["user_id"]
+            self._note(line_no, f"không có user_id {ref['user_id']}, nhập dưới dạng ẩn danh")
+            self.stats["anonymous"] += 1
+            return None
+        user_id = self._users.get(ref.get("username"))
+        if user_id is None:
+            self.stats["anonymous"] += 1
+        return user_id
+
+    def _write_tags(self):
+        db = self.session_factory()
+        try:
+            db.execute(insert_ignore(Tag.__table__, db.get_bind().dialect.name), self._pending_tags)
+            db.commit()
+        finally:
+            db.close()
+        self.stats["tags"] += len(self._pending_tags)
+        self._pending_tags = []
+
+    def flush(self):
+        if self._pending_tags:
+            self._write_tags()
+        if not self._pending:
+            self.committed_line = self._last_line
+            return
+        records, self._pending = self._pending, []
+        db = self.session_factory()
+        try:
+            question_rows, answers, comments = self._write(db, records)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Nhập chunk kết thúc ở dòng %d thất bại", self._last_line)
+            raise
+        finally:
+            db.close()
+        # Chỉ đưa vào index tìm kiếm sau khi chunk đã commit
+        for row in question_rows:
+            search_backend.index(SimpleNamespace(id=row["id"], title=row["title"], content=row["content"]))
+        self.stats["questions"] += len(question_rows)
+        self.stats["answers"] += answers
+        self.stats["comments"] += comments
+        self.committed_line = self._last_line
+        self.stats["chunks"] += 1
+        if self.progress:
+            self.progress(self.report())
+
+    def _write(self, db: Session, records: list):
+        now = datetime.datetime.now()
+        tag_ids = tag_resolver.resolve(db, {name for q in records for name in q["tags"]})
+        self._resolve_users(db, records)
+
+        question_rows = []
+        for q in records:
+            comment_total = len(q["comments"])
+            latest = max([q["created_at"]] + [a["created_at"] for a in q["answers"]] + [c["created_at"] for c in q["comments"]])
+            question_rows.append({
+                "user_id": self._user_id(q["user"], q["line"]),
+                "title": q["title"],
+                "content": q["content"],
+                "created_at": q["created_at"],
+                "updated_at": q["updated_at"],
+                "views": q["views"],
+                "upvotes": q["upvotes"],
+                "downvotes": q["downvotes"],
+                "status": q["status"],
+                "answer_count": len(q["answers"]),
+                "comment_count": comment_total,
+                "score": q["upvotes"] - q["downvotes"],
+                "hot_score": hot_score(q["upvotes"], q["downvotes"], len(q["answers"]), q["created_at"]),
+                "activity_at": latest,
+                "ranked_at": now,
+            })
+        self._insert_questions(db, question_rows)
+
+        link_rows = []
+        tag_usage = Counter()
+        answer_rows = []
+        answer_comments = []
+        comment_rows = []
+        for q, row in zip(records, question_rows):
+            for tag_id in dict.fromkeys(tag_ids[t.strip()] for t in q["tags"] if t.strip() in tag_ids):
+                link_rows.append({"question_id": row["id"], "tag_id": tag_id})
+                tag_usage[tag_id] += 1
+            for c in q["comments"]:
+                comment_rows.append({"user_id": self._user_id(c["user"], q["line"]), "question_id": row["id"], "answer_id": None,
+                                     "content": c["content"], "created_at": c["created_at"]})
+            for a in q["answers"]:
+                answer_rows.append({
+                    "question_id": row["id"],
+                    "user_id": self._user_id(a["user"], q["line"]),
+                    "content": a["content"],
+                    "created_at": a["created_at"],
+                    "updated_at": a["updated_at"],
+                    "upvotes": a["upvotes"],
+                    "downvotes": a["downvotes"],
+                    "is_accepted": a["is_accepted"],
+                    "comment_count": len(a["comments"]),
+                })
+                answer_comments.append((q["line"], a["comments"]))
+        if answer_rows:
+            self._insert_answers(db, answer_rows)
+        for row, (line_no, comments) in zip(answer_rows, answer_comments):
+            for c in comments:
+                comment_rows.append({"user_id": self._user_id(c["user"], line_no), "question_id": None, "answer_id": row["id"],
+                                     "content": c["content"], "created_at": c["created_at"]})
+        if link_rows:
+            db.execute(insert(QuestionTag), link_rows)
+        if comment_rows:
+            db.execute(insert(Comment), comment_rows)
+        # Gom tag theo số lần dùng trong chunk: mỗi giá trị delta một câu UPDATE
+        by_delta = defaultdict(list)
+        for tag_id, count in tag_usage.items():
+            by_delta[count].append(tag_id)
+        for delta, ids in by_delta.items():
+            adjust_tag_counts(db, ids, delta)
+        return question_rows, len(answer_rows), len(comment_rows)
+
+    def _insert_questions(self, db: Session, rows: list):
+        # executemany rồi đọc lại id bằng một SELECT: MySQL không có RETURNING nên
+        # return_defaults sẽ tách thành từng INSERT một. Id trong cùng một câu INSERT tăng
+        # theo thứ tự dòng, và các dòng khác ghi sau mốc max(id) không nằm trong snapshot
+        # của transaction này, nên ghép theo (user_id, title) lần lượt là đúng.
+        watermark = db.scalar(select(func.max(Question.id))) or 0
+        db.execute(insert(Question), rows)
+        pending = defaultdict(deque)
+        for row in rows:
+            pending[(row["user_id"], row["title"])].append(row)
+        inserted = db.execute(
+            select(Question.id, Question.user_id, Question.title).where(Question.id > watermark).order_by(Question.id)
+        )
+        for question_id, user_id, title in inserted:
+            waiting = pending.get((user_id, title))
+            if waiting:
+                waiting.popleft()["id"] = question_id
+        if any(pending.values()):
+            raise RuntimeError("Không đọc lại được id của câu hỏi vừa nhập")
+
+    def _insert_answers(self, db: Session, rows: list):
+        # Câu hỏi cha vừa tạo trong transaction này nên mọi câu trả lời của chúng là của lần nhập
+        db.execute(insert(Answer), rows)
+        pending = defaultdict(deque)
+        for row in rows:
+            pending[row["question_id"]].append(row)
+        inserted = db.execute(
+            select(Answer.id, Answer.question_id).where(Answer.question_id.in_(list(pending))).order_by(Answer.id)
+        )
+        for answer_id, question_id in inserted:
+            pending[question_id].popleft()["id"] = answer_id
+
+    def finish(self) -> dict:
+        self.flush()
+        if self.stats["questions"] or self.stats["tags"]:
+            db = self.session_factory()
+            try:
+                load_autocomplete(db)
+            finally:
+                db.close()
+            question_count_cache.invalidate()
+            response_cache.invalidate("questions", "tags")
+        return self.report()
+
+    def report(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            **{k: self.stats[k] for k in ("lines", "questions", "answers", "comments", "tags", "skipped", "anonymous", "chunks")},
+            "committed_line": self.committed_line,
+            "elapsed_seconds": round(elapsed, 3),
+            "questions_per_second": round(self.stats["questions"] / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+        }
+
+
+def import_lines(lines, chunk_size: int = IMPORT_CHUNK_SIZE, start_line: int = 1, progress=None, session_factory=SessionLocal) -> dict:
+    importer = BulkImporter(session_factory, chunk_size, progress)
+    for line_no, line in enumerate(lines, start=1):
+        if line_no < start_line:
+            continue
+        if importer.add(line_no, line):
+            importer.flush()
+    return importer.finish()
+
+
+def _user(user):
+    return {"username": user.username} if user is not None else {}
+
+
+def _export_comment(c) -> dict:
+    return {**_user(c.user), "content": c.content, "created_at": c.created_at}
+
+
+def _export_question(q) -> dict:
+    return {
+        "type": "question",
+        "ref": q.id,
+        **_user(q.user),
+        "title": q.title,
+        "content": q.content,
+        "created_at": q.created_at,
+        "updated_at": q.updated_at,
+        "views": q.views,
+        "upvotes": q.upvotes,
+        "downvotes": q.downvotes,
+        "status": q.status,
+        "tags": [t.name for t in q.tags],
+        "comments": [_export_comment(c) for c in sorted(q.comments, key=lambda c: (c.created_at, c.id))],
+        "answers": [
+            {
+                "ref": a.id,
+                **_user(a.user),
+                "content": a.content,
+                "created_at": a.created_at,
+                "updated_at": a.updated_at,
+                "upvotes": a.upvotes,
+                "downvotes": a.downvotes,
+                "is_accepted": bool(a.is_accepted),
+                "comments": [_export_comment(c) for c in sorted(a.comments, key=lambda c: (c.created_at, c.id))],
+            }
+            for a in sorted(q.answers, key=lambda a: (a.created_at, a.id))
+        ],
+    }
+
+
+def export_lines(session_factory=SessionLocal, page_size: int = EXPORT_PAGE_SIZE, include_tags: bool = True):
+    # Generator bytes NDJSON, bộ nhớ chỉ giữ một trang
+    db = session_factory()
+    try:
+        if include_tags:
+            last_id = 0
+            while True:
+                tags = db.execute(
+                    select(Tag.id, Tag.name, Tag.description).where(Tag.id > last_id).order_by(Tag.id).limit(page_size * 5)
+                ).all()
+                if not tags:
+                    break
+                for t in tags:
+                    yield orjson.dumps({"type": "tag", "name": t.name, "description": t.description}) + b"\n"
+                last_id = tags[-1].id
+        last_id = 0
+        while True:
+            page = db.scalars(
+                select(Question)
+                .options(
+                    selectinload(Question.user),
+                    selectinload(Question.tags),
+                    selectinload(Question.comments).selectinload(Comment.user),
+                    selectinload(Question.answers).selectinload(Answer.user),
+                    selectinload(Question.answers).selectinload(Answer.comments).selectinload(Comment.user),
+                )
+                .where(Question.id > last_id)
+                .order_by(Question.id)
+                .limit(page_size)
+            ).all()
+            if not page:
+                break
+            for q in page:
+                yield orjson.dumps(_export_question(q)) + b"\n"
+            last_id = page[-1].id
+            db.expunge_all()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m BE_THLT_WEB.bulk_io")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import")
+    p_import.add_argument("path", help="file NDJSON, '-' để đọc stdin")
+    p_import.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    p_import.add_argument("--start-line", type=int, default=1)
+    p_export = sub.add_parser("export")
+    p_export.add_argument("path", nargs="?", default="-")
+    p_export.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        def show(report):
+            print(f"\rdòng {report['committed_line']}: {report['questions']} câu hỏi, {report['answers']} trả lời, "
+                  f"{report['comments']} bình luận, {report['skipped']} bỏ qua ({report['questions_per_second']}/s)",
+                  end="", file=sys.stderr, flush=True)
+
+        source = sys.stdin.buffer if args.path == "-" else open(args.path, "rb")
+        try:
+            report = import_lines(source, args.chunk_size, args.start_line, progress=show)
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+        print(file=sys.stderr)
+        print(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode())
+    else:
+        target = sys.stdout.buffer if args.path == "-" else open(args.path, "wb")
+        try:
+            for line in export_lines(page_size=args.page_size):
+                target.write(line)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
@@ -0,0 +1,63 @@
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from .models import Question, Answer, Comment
+
+
+def adjust_counter(db: Session, model, target_id: int, column: str, delta: int):
+    # Cộng/trừ phía server trong transaction hiện tại, không đổi updated_at
+    if target_id is None or not delta:
+        return
+    counter = getattr(model, column)
+    db.execute(
+        update(model)
+        .where(model.id == target_id)
+        .values({counter: counter + delta, model.updated_at: model.updated_at})
+    )
+
+
+def comment_created(db: Session, question_id=None, answer_id=None, delta: int = 1):
+    if question_id is not None:
+        adjust_counter(db, Question, question_id, "comment_count", delta)
+    if answer_id is not None:
+        adjust_counter(db, Answer, answer_id, "comment_count", delta)
+
+
+def _reconcile(db: Session, model, column: str, actual) -> int:
+    counter = getattr(model, column)
+    return db.execute(
+        update(model)
+        .where(func.coalesce(counter, -1) != actual)
+        .values({counter: actual, model.updated_at: model.updated_at})
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def reconcile_counters(db: Session) -> dict:
+    # Backfill/sửa answer_count và comment_count bằng các câu UPDATE có subquery tương quan
+    result = {
+        "question_answer_count": _reconcile(
+            db, Question, "answer_count",
+            select(func.count(Answer.id)).where(Answer.question_id == Question.id).scalar_subquery(),
+        ),
+        "question_comment_count": _reconcile(
+            db, Question, "comment_count",
+            select(func.count(Comment.id)).where(Comment.question_id == Question.id).scalar_subquery(),
+        ),
+        "answer_comment_count": _reconcile(
+            db, Answer, "comment_count",
+            select(func.count(Comment.id)).where(Comment.answer_id == Answer.id).scalar_subquery(),
+        ),
+    }
+    db.commit()
+    return result
+
+
+if __name__ == "__main__":
+    from .databases import SessionLocal
+
+    session = SessionLocal()
+    try:
+        for name, updated in reconcile_counters(session).items():
+            print(f"{name}: sửa {updated} dòng")
+    finally:
+        session.close()
@@ -1,26 +1,181 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+from bisect import bisect_left
 import os
+import threading
+import time
 
 # Chuỗi kết nối tới cơ sở dữ liệu MySQL
-load_dotenv(dotenv_path="d:/code/BTLWEB/BE_THLT_WEB/.env")
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
 URL_DATABASE = os.getenv("DATABASE_URL")
 
+# Driver async tương ứng với driver sync trong DATABASE_URL
+ASYNC_DRIVERS = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+ASYNC_URL_DATABASE = os.getenv("ASYNC_DATABASE_URL") or to_async_url(URL_DATABASE)
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Cấu hình pool, chỉnh theo số worker uvicorn/gunicorn (mỗi worker có pool riêng)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+
+
+class PoolStats:
+    # Số liệu pool cho /admin/db-pool, histogram thời gian chờ lấy connection
+    buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.wait_counts = [0] * (len(self.buckets) + 1)
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.checkouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_counts[bisect_left(self.buckets, seconds)] += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def incr(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            waits = sum(self.wait_counts)
+            histogram = {
+                f"le_{bound}": count for bound, count in zip(self.buckets, self.wait_counts)
+            }
+            histogram["le_inf"] = self.wait_counts[-1]
+            stats = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": self.wait_total / waits if waits else 0.0,
+                "wait_seconds_max": self.wait_max,
+                "wait_seconds_histogram": histogram,
+            }
+        stats["pool"] = pool.status()
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            if method is not None:
+                stats[name] = method()
+        stats["config"] = {k: v for k, v in engine_options.items() if k != "poolclass"}
+        return stats
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    # Đo thời gian chờ lấy connection khỏi pool (kể cả khi phải mở connection mới)
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.incr("timeouts")
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+engine_options = {"pool_pre_ping": DB_POOL_PRE_PING}
+if not URL_DATABASE.startswith("sqlite"):
+    engine_options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+
 # Tạo engine cho kết nối
-engine = create_engine(URL_DATABASE)
+engine = create_engine(URL_DATABASE, **engine_options)
 
 # Tạo session để tương tác với cơ sở dữ liệu
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine/session async cho các endpoint đọc nhiều, dùng chung cấu hình pool
+async_engine = create_async_engine(
+    ASYNC_URL_DATABASE,
+    **{k: v for k, v in engine_options.items() if k != "poolclass"}
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Cơ sở khai báo cho các mô hình
 Base = declarative_base()
 
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.incr("connects")
+
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.incr("checkouts")
+
+
+@event.listens_for(engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.incr("invalidations")
+
+
+def insert_ignore(table, dialect: str):
+    # INSERT bỏ qua dòng trùng khoá unique/primary, dùng chung cho các chỗ ghi có thể chạy đồng thời
+    if dialect == "mysql":
+        return mysql.insert(table).prefix_with("IGNORE")
+    if dialect == "sqlite":
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return table.insert()
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,236 @@
+# Feed cá nhân từ các tag đang theo dõi, kết hợp push và pull.
+#
+# - Tag nhỏ (follower_count <= FEED_FANOUT_LIMIT): câu hỏi mới được worker nền fan-out vào
+#   feed_entries của từng người theo dõi (push). Mỗi dòng chỉ có (user_id, question_id, created_at).
+# - Tag lớn: không fan-out, lúc đọc lấy thẳng câu hỏi mới nhất của tag qua question_tags (pull).
+# Lúc đọc gộp hai nguồn theo (created_at, id) giảm dần, bỏ trùng, phân trang bằng cursor.
+# Timeline mỗi user bị cắt còn FEED_TIMELINE_SIZE dòng mới nhất bởi job trim định kỳ.
+from sqlalchemy import delete, select, tuple_, func
+from sqlalchemy.orm import Session, selectinload
+from .databases import SessionLocal, insert_ignore
+from .models import FeedEntry, FollowTag, Question, QuestionTag, Tag
+from .pagination import encode_cursor, keyset_filter
+from .batch_worker import BatchWorker
+import heapq
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", "1000"))
+FEED_TIMELINE_SIZE = int(os.getenv("FEED_TIMELINE_SIZE", "500"))
+FEED_BACKFILL = int(os.getenv("FEED_BACKFILL", "50"))
+FEED_FLUSH_INTERVAL = float(os.getenv("FEED_FLUSH_INTERVAL", "1"))
+FEED_TRIM_INTERVAL = float(os.getenv("FEED_TRIM_INTERVAL", "300"))
+FEED_INSERT_CHUNK = int(os.getenv("FEED_INSERT_CHUNK", "1000"))
+
+_entries = FeedEntry.__table__
+
+
+def insert_entries(db: Session, rows: list):
+    # Trùng (user_id, question_id) thì bỏ qua: fan-out và backfill có thể chạy đồng thời
+    stmt = insert_ignore(_entries, db.get_bind().dialect.name)
+    for i in range(0, len(rows), FEED_INSERT_CHUNK):
+        db.execute(stmt, rows[i:i + FEED_INSERT_CHUNK])
+
+
+class FeedWorker(BatchWorker):
+    thread_name = "feed-worker"
+
+    def __init__(self, session_factory=SessionLocal, interval: float = FEED_FLUSH_INTERVAL, trim_interval: float = FEED_TRIM_INTERVAL):
+        super().__init__(session_factory, interval, 500)
+        self.trim_interval = trim_interval
+        self._last_trim = time.monotonic()
+        self.fanned_out_questions = 0
+        self.inserted_entries = 0
+        self.trimmed_entries = 0
+
+    def enqueue(self, question):
+        self._queue.put({
+            "question_id": question.id,
+            "created_at": question.created_at,
+            "tag_ids": [tag.id for tag in question.tags],
+        })
+
+    def _write(self, db: Session, batch: list):
+        tag_ids = {tag_id for event in batch for tag_id in event["tag_ids"]}
+        followers = {}
+        if tag_ids:
+            # Chỉ tag nhỏ mới push, một câu IN cho cả lô
+            for user_id, tag_id in db.execute(
+                select(FollowTag.user_id, FollowTag.tag_id)
+                .join(Tag, Tag.id == FollowTag.tag_id)
+                .where(FollowTag.tag_id.in_(tag_ids), Tag.follower_count <= FEED_FANOUT_LIMIT)
+            ):
+                followers.setdefault(tag_id, set()).add(user_id)
+        rows = []
+        for event in batch:
+            users = set().union(*(followers.get(t, ()) for t in event["tag_ids"]))
+            rows.extend({"user_id": u, "question_id": event["question_id"], "created_at": event["created_at"]} for u in users)
+        insert_entries(db, rows)
+        return rows
+
+    def _applied(self, batch: list, rows):
+        self.fanned_out_questions += len(batch)
+        self.inserted_entries += len(rows)
+
+    def trim(self) -> int:
+        db = self.session_factory()
+        try:
+            trimmed = trim_timelines(db, FEED_TIMELINE_SIZE)
+        except Exception:
+            db.rollback()
+            logger.exception("Cắt feed_entries thất bại")
+            return 0
+        finally:
+            db.close()
+        self.trimmed_entries += trimmed
+        return trimmed
+
+    def tick(self):
+        super().tick()
+        if time.monotonic() - self._last_trim >= self.trim_interval:
+            self._last_trim = time.monotonic()
+            self.trim()
+
+    def metrics(self) -> dict:
+        return {
+            "queued_questions": self._queue.qsize(),
+            "fanned_out_questions": self.fanned_out_questions,
+            "inserted_entries": self.inserted_entries,
+            "trimmed_entries": self.trimmed_entries,
+            "failed_flushes": self.failed_flushes,
+            "dropped_events": self.dropped_events,
+            "last_flush_at": self.last_flush_at,
+            "fanout_limit": FEED_FANOUT_LIMIT,
+            "timeline_size": FEED_TIMELINE_SIZE,
+        }
+
+feed_worker = FeedWorker()
+
+
+def trim_timelines(db: Session, size: int) -> int:
+    # Một câu DELETE cho mọi user: bỏ các dòng ngoài size dòng mới nhất
+    ranked = select(
+        FeedEntry.user_id,
+        FeedEntry.question_id,
+        func.row_number().over(
+            partition_by=FeedEntry.user_id,
+            order_by=(FeedEntry.created_at.desc(), FeedEntry.question_id.desc()),
+        ).label("rn"),
+    ).subquery()
+    # Bọc thêm một lớp để MySQL cho phép DELETE đọc chính bảng đó
+    overflow = select(ranked.c.user_id, ranked.c.question_id).where(ranked.c.rn > size).subquery()
+    deleted = db.execute(
+        delete(FeedEntry).where(
+            tuple_(FeedEntry.user_id, FeedEntry.question_id).in_(select(overflow.c.user_id, overflow.c.question_id))
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+def backfill(db: Session, user_id: int, tag_id: int):
+    # Theo dõi tag nhỏ: đưa ngay các câu hỏi gần nhất của tag vào timeline
+    recent = db.execute(
+        select(Question.id, Question.created_at)
+        .join(QuestionTag, QuestionTag.question_id == Question.id)
+        .where(QuestionTag.tag_id == tag_id)
+        .order_by(Question.created_at.desc(), Question.id.desc())
+        .limit(FEED_BACKFILL)
+    ).all()
+    insert_entries(db, [{"user_id": user_id, "question_id": q.id, "created_at": q.created_at} for q in recent])
+
+
+def remove_tag(db: Session, user_id: int, tag_id: int):
+    # Bỏ theo dõi: xoá các câu hỏi của tag đó, trừ câu còn thuộc tag khác user vẫn theo dõi
+    still_followed = (
+        select(QuestionTag.question_id)
+        .join(FollowTag, FollowTag.tag_id == QuestionTag.tag_id)
+        .where(FollowTag.user_id == user_id, FollowTag.tag_id != tag_id)
+    )
+    db.execute(
+        delete(FeedEntry).where(
+            FeedEntry.user_id == user_id,
+            FeedEntry.question_id.in_(select(QuestionTag.question_id).where(QuestionTag.tag_id == tag_id)),
+            FeedEntry.question_id.not_in(still_followed),
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def retag_question(db: Session, question_id: int, created_at, added, removed):
+    # Sửa tag của câu hỏi, gọi sau khi question_tags đã đổi trong cùng transaction
+    if added:
+        users = db.scalars(
+            select(FollowTag.user_id)
+            .join(Tag, Tag.id == FollowTag.tag_id)
+            .where(FollowTag.tag_id.in_(added), Tag.follower_count <= FEED_FANOUT_LIMIT)
+            .distinct()
+        ).all()
+        insert_entries(db, [{"user_id": user_id, "question_id": question_id, "created_at": created_at} for user_id in users])
+    if removed:
+        # Giữ lại cho người còn theo dõi một tag khác của câu hỏi
+        still_followed = (
+            select(FollowTag.user_id)
+            .join(QuestionTag, QuestionTag.tag_id == FollowTag.tag_id)
+            .where(QuestionTag.question_id == question_id)
+        )
+        db.execute(
+            delete(FeedEntry).where(
+                FeedEntry.question_id == question_id,
+                FeedEntry.user_id.in_(select(FollowTag.user_id).where(FollowTag.tag_id.in_(removed))),
+                FeedEntry.user_id.not_in(still_followed),
+            ).execution_options(synchronize_session=False)
+        )
+
+
+def remove_question(db: Session, question_id: int):
+    db.execute(delete(FeedEntry).where(FeedEntry.question_id == question_id).execution_options(synchronize_session=False))
+
+
+def read_feed(db: Session, user_id: int, cursor=None, limit: int = 20):
+    pushed = select(FeedEntry.question_id, FeedEntry.created_at).where(FeedEntry.user_id == user_id)
+    if cursor:
+        pushed = pushed.where(keyset_filter(FeedEntry.created_at, FeedEntry.question_id, cursor))
+    pushed = db.execute(pushed.order_by(FeedEntry.created_at.desc(), FeedEntry.question_id.desc()).limit(limit + 1)).all()
+
+    large_tags = db.scalars(
+        select(FollowTag.tag_id)
+        .join(Tag, Tag.id == FollowTag.tag_id)
+        .where(FollowTag.user_id == user_id, Tag.follower_count > FEED_FANOUT_LIMIT)
+    ).all()
+    pulled = []
+    if large_tags:
+        query = (
+            select(Question.id, Question.created_at)
+            .join(QuestionTag, QuestionTag.question_id == Question.id)
+            .where(QuestionTag.tag_id.in_(large_tags))
+            .distinct()
+        )
+        if cursor:
+            query = query.where(keyset_filter(Question.created_at, Question.id, cursor))
+        pulled = db.execute(query.order_by(Question.created_at.desc(), Question.id.desc()).limit(limit + 1)).all()
+
+    merged = []
+    seen = set()
+    key = lambda row: (row[1], row[0])
+    for question_id, created_at in heapq.merge(pushed, pulled, key=key, reverse=True):
+        if question_id in seen:
+            continue
+        seen.add(question_id)
+        merged.append((question_id, created_at))
+        if len(merged) > limit:
+            break
+
+    page = merged[:limit]
+    next_cursor = encode_cursor(page[-1][1], page[-1][0]) if len(merged) > limit else None
+    questions = {
+        q.id: q for q in db.scalars(
+            select(Question)
+            .options(selectinload(Question.user), selectinload(Question.tags))
+            .where(Question.id.in_([question_id for question_id, _ in page]))
+        )
+    } if page else {}
+    # Câu hỏi đã bị xoá nhưng chưa kịp dọn khỏi timeline thì bỏ qua
+    return [questions[question_id] for question_id, _ in page if question_id in questions], next_cursor
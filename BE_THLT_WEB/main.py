@@ -1,7 +1,17 @@
-from BE_THLT_WEB.routers import auth_router, questions_router, answers_router, comments_router, votes_router, tags_router, user_router
-from BE_THLT_WEB.databases import engine
+from BE_THLT_WEB.routers import auth_router, questions_router, answers_router, comments_router, votes_router, tags_router, user_router, admin_router, realtime_router, feed_router
+from BE_THLT_WEB.databases import engine, SessionLocal, async_engine
 from BE_THLT_WEB import models
 from BE_THLT_WEB import utils
+from BE_THLT_WEB.view_counter import view_counter
+from BE_THLT_WEB.autocomplete import load_autocomplete
+from BE_THLT_WEB.passwords import password_hasher
+from BE_THLT_WEB.response_cache import ResponseCacheMiddleware
+from BE_THLT_WEB.sql_metrics import SQLMetricsMiddleware
+from BE_THLT_WEB.reputation import reputation_worker
+from BE_THLT_WEB.ranking import ranking_job
+from BE_THLT_WEB.notifications import notification_worker
+from BE_THLT_WEB.realtime import realtime_hub
+from BE_THLT_WEB.feed import feed_worker
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
@@ -34,6 +44,11 @@ if loaded_secret_key: # Chỉ thực hiện các tác vụ phụ thuộc vào SE
     app.include_router(votes_router)
     app.include_router(tags_router)
     app.include_router(user_router)
+    app.include_router(admin_router)
+    app.include_router(realtime_router)
+    app.include_router(feed_router)
+
+    app.add_middleware(ResponseCacheMiddleware)
 
 
     app.add_middleware(
@@ -44,6 +59,38 @@ if loaded_secret_key: # Chỉ thực hiện các tác vụ phụ thuộc vào SE
     allow_headers=["*"],
 )
 
+    # Ngoài cùng để đo cả thời gian của các middleware còn lại
+    app.add_middleware(SQLMetricsMiddleware)
+
+@app.on_event("startup")
+def start_background_workers():
+    view_counter.start()
+    reputation_worker.start()
+    ranking_job.start()
+    notification_worker.start()
+    realtime_hub.start()
+    feed_worker.start()
+    db = SessionLocal()
+    try:
+        load_autocomplete(db)
+    finally:
+        db.close()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    # Flush nốt lượt xem còn trong bộ nhớ trước khi tắt
+    view_counter.stop()
+    reputation_worker.stop()
+    ranking_job.stop()
+    notification_worker.stop()
+    realtime_hub.stop()
+    feed_worker.stop()
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def close_async_engine():
+    await async_engine.dispose()
+
 @app.get("/")
 def root():
     return {"message": "Chào mừng đến với diễn đàn hỏi đáp sinh viên!"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Boolean, Index, UniqueConstraint, Double, text
 from sqlalchemy.orm import relationship
 from .databases import Base
 import datetime
@@ -20,6 +20,12 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     bio = Column(Text, nullable=True)
     title = Column(String(255), nullable=True)
+    unread_notifications = Column(Integer, default=0, server_default="0", nullable=False)
+
+    # Bảng xếp hạng đọc thẳng từ index này
+    __table_args__ = (
+        Index("ix_users_reputation_id", "reputation", "id"),
+    )
 
 class Question(Base):
     __tablename__ = "questions"
@@ -33,12 +39,32 @@ class Question(Base):
     upvotes = Column(Integer, default=0)
     downvotes = Column(Integer, default=0)
     status = Column(Enum("open", "closed"), default="open")
+    # Cột xếp hạng do ranking.py tính sẵn. hot_score là DOUBLE để giá trị trong cursor keyset
+    # so sánh bằng đúng giá trị đã lưu (FLOAT 4 byte của MySQL làm lặp/sót dòng khi phân trang)
+    score = Column(Integer, default=0, server_default="0")
+    hot_score = Column(Double, default=0, server_default="0")
+    activity_at = Column(DateTime, default=datetime.datetime.now, server_default=text("CURRENT_TIMESTAMP"))
+    ranked_at = Column(DateTime, nullable=True)
+    # Bộ đếm phi chuẩn hoá, cập nhật cùng transaction (xem counters.py)
+    answer_count = Column(Integer, default=0, server_default="0", nullable=False)
+    comment_count = Column(Integer, default=0, server_default="0", nullable=False)
     user = relationship("User", back_populates="questions")
     answers = relationship("Answer", back_populates="question", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="question", cascade="all, delete-orphan")
     votes = relationship("Vote", back_populates="question", cascade="all, delete-orphan")
     tags = relationship("Tag", secondary="question_tags", back_populates="questions") 
 
+    # Index phục vụ phân trang keyset theo từng kiểu sắp xếp
+    __table_args__ = (
+        Index("ix_questions_created_at_id", "created_at", "id"),
+        Index("ix_questions_upvotes_id", "upvotes", "id"),
+        Index("ix_questions_views_id", "views", "id"),
+        Index("ix_questions_hot_score_id", "hot_score", "id"),
+        Index("ix_questions_score_id", "score", "id"),
+        Index("ix_questions_activity_at_id", "activity_at", "id"),
+        Index("ix_questions_fulltext", "title", "content", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
 class Answer(Base):
     __tablename__ = "answers"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -50,6 +76,7 @@ class Answer(Base):
     upvotes = Column(Integer, default=0)
     downvotes = Column(Integer, default=0)
     is_accepted = Column(Boolean, default=False)
+    comment_count = Column(Integer, default=0, server_default="0", nullable=False)
     question = relationship("Question", back_populates="answers")
     user = relationship("User", back_populates="answers")
     comments = relationship("Comment", back_populates="answer", cascade="all, delete-orphan")
@@ -67,6 +94,12 @@ class Comment(Base):
     question = relationship("Question", back_populates="comments")
     answer = relationship("Answer", back_populates="comments")
 
+    # Phân trang keyset theo (created_at, id) trong từng câu hỏi/câu trả lời
+    __table_args__ = (
+        Index("ix_comments_question_created_id", "question_id", "created_at", "id"),
+        Index("ix_comments_answer_created_id", "answer_id", "created_at", "id"),
+    )
+
 class Vote(Base):
     __tablename__ = "votes"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -77,21 +110,38 @@ class Vote(Base):
     user = relationship("User", back_populates="votes")
     question = relationship("Question", back_populates="votes")
     answer = relationship("Answer", back_populates="votes")
-    
+
+    # Mỗi user chỉ có một phiếu cho mỗi câu hỏi/câu trả lời, vote_engine dựa vào đây để upsert
+    __table_args__ = (
+        UniqueConstraint("user_id", "question_id", name="uq_votes_user_question"),
+        UniqueConstraint("user_id", "answer_id", name="uq_votes_user_answer"),
+    )
 
 class Tag(Base):
     __tablename__ = "tags"
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), unique=True, nullable=False)
     description = Column(Text)
+    # Số câu hỏi dùng tag, cập nhật cùng transaction khi gắn/bỏ tag (xem tag_counts.py)
+    question_count = Column(Integer, default=0, server_default="0", nullable=False)
+    # Số người theo dõi, feed dùng để chọn push hay pull cho tag (xem feed.py)
+    follower_count = Column(Integer, default=0, server_default="0", nullable=False)
     questions = relationship("Question", secondary="question_tags", back_populates="tags")
 
+    __table_args__ = (
+        Index("ix_tags_question_count_id", "question_count", "id"),
+    )
+
 
 class QuestionTag(Base):
     __tablename__ = "question_tags"
     question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
     tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
 
+    __table_args__ = (
+        Index("ix_question_tags_tag_question", "tag_id", "question_id"),
+    )
+
 class SaveQuestion(Base):
     __tablename__ = "save_question"
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
@@ -104,6 +154,33 @@ class FollowTag(Base):
     tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
     create_at = Column(DateTime)
 
+    __table_args__ = (
+        Index("ix_follow_tags_tag_user", "tag_id", "user_id"),
+    )
+
+class FeedEntry(Base):
+    # Timeline đã fan-out sẵn cho từng user: chỉ lưu id câu hỏi và thời điểm tạo
+    __tablename__ = "feed_entries"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_feed_entries_user_created_question", "user_id", "created_at", "question_id"),
+        Index("ix_feed_entries_question", "question_id"),
+    )
+
+class ReputationEvent(Base):
+    __tablename__ = "reputation_ledger"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    reason = Column(Enum("question_upvote", "question_downvote", "answer_upvote", "answer_downvote", "answer_accepted"), nullable=False)
+    delta = Column(Integer, nullable=False)
+    question_id = Column(Integer, nullable=True)
+    answer_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -111,4 +188,13 @@ class Notification(Base):
     content = Column(String(255), nullable=False)
     is_read = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
-    user = relationship("User")
\ No newline at end of file
+    kind = Column(String(32), nullable=True)
+    actor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    question_id = Column(Integer, nullable=True)
+    answer_id = Column(Integer, nullable=True)
+    user = relationship("User", foreign_keys=[user_id])
+
+    # Trang thông báo keyset theo (created_at, id) của từng user
+    __table_args__ = (
+        Index("ix_notifications_user_created_id", "user_id", "created_at", "id"),
+    )
\ No newline at end of file
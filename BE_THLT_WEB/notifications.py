@@ -0,0 +1,186 @@
+# Thông báo được fan-out bởi worker nền.
+#
+# Router chỉ đưa sự kiện vào hàng đợi trong bộ nhớ sau khi commit (giống reputation).
+# Sự kiện có người nhận cố định ("user_id") hoặc theo tag ("tag_ids": người theo dõi các tag đó).
+# Worker gom sự kiện, tra người theo dõi của mọi tag trong lô bằng một câu IN, ghi thông báo
+# bằng bulk insert theo từng khúc và cộng users.unread_notifications bằng một UPDATE hàng loạt,
+# tất cả trong cùng transaction nên bộ đếm luôn khớp với số thông báo chưa đọc.
+#
+# Kiểm tra/sửa bộ đếm: python -m BE_THLT_WEB.notifications hoặc POST /admin/notifications/reconcile
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+from .databases import SessionLocal
+from .models import User, Notification, FollowTag
+from .realtime import realtime_hub
+from .batch_worker import BatchWorker
+from collections import defaultdict
+import os
+
+NOTIFICATION_FLUSH_INTERVAL = float(os.getenv("NOTIFICATION_FLUSH_INTERVAL", "1"))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "500"))
+NOTIFICATION_INSERT_CHUNK = int(os.getenv("NOTIFICATION_INSERT_CHUNK", "1000"))
+
+_users = User.__table__
+_bulk_update = (
+    _users.update()
+    .where(_users.c.id == bindparam("uid"))
+    .values(unread_notifications=func.coalesce(_users.c.unread_notifications, 0) + bindparam("delta"))
+)
+
+
+def _title(text: str, limit: int = 80) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def answer_event(question, answer, actor) -> list:
+    if question.user_id is None or question.user_id == actor.id:
+        return []
+    return [{
+        "user_id": question.user_id, "actor_id": actor.id, "kind": "answer",
+        "question_id": question.id, "answer_id": answer.id,
+        "content": f"{actor.username} đã trả lời câu hỏi \"{_title(question.title)}\"",
+    }]
+
+
+def comment_event(owner_id: int, question_id: int, answer_id, actor, target_title: str) -> list:
+    if owner_id is None or owner_id == actor.id:
+        return []
+    target = "câu trả lời của bạn cho" if answer_id else "câu hỏi"
+    return [{
+        "user_id": owner_id, "actor_id": actor.id, "kind": "comment",
+        "question_id": question_id, "answer_id": answer_id,
+        "content": f"{actor.username} đã bình luận {target} \"{_title(target_title)}\"",
+    }]
+
+
+def accept_event(question, answer, actor) -> list:
+    if answer.user_id is None or answer.user_id == actor.id:
+        return []
+    return [{
+        "user_id": answer.user_id, "actor_id": actor.id, "kind": "accepted",
+        "question_id": question.id, "answer_id": answer.id,
+        "content": f"Câu trả lời của bạn cho \"{_title(question.title)}\" đã được chấp nhận",
+    }]
+
+
+def question_event(question, actor, tags) -> list:
+    if not tags:
+        return []
+    return [{
+        "tag_ids": [tag.id for tag in tags], "actor_id": actor.id, "kind": "question",
+        "question_id": question.id, "answer_id": None,
+        "content": f"Câu hỏi mới trong tag {', '.join(tag.name for tag in tags)}: \"{_title(question.title)}\"",
+    }]
+
+
+class NotificationWorker(BatchWorker):
+    thread_name = "notification-worker"
+
+    def __init__(self, session_factory=SessionLocal, interval: float = NOTIFICATION_FLUSH_INTERVAL, batch_size: int = NOTIFICATION_BATCH_SIZE):
+        super().__init__(session_factory, interval, batch_size)
+        self.processed_events = 0
+        self.delivered = 0
+
+    def _expand(self, db: Session, batch: list) -> list:
+        tag_ids = {tag_id for event in batch for tag_id in event.get("tag_ids", ())}
+        followers = defaultdict(set)
+        if tag_ids:
+            for user_id, tag_id in db.execute(select(FollowTag.user_id, FollowTag.tag_id).where(FollowTag.tag_id.in_(tag_ids))):
+                followers[tag_id].add(user_id)
+        rows = []
+        for event in batch:
+            if "tag_ids" in event:
+                # Một user theo dõi nhiều tag của câu hỏi chỉ nhận một thông báo
+                recipients = set().union(*(followers[t] for t in event["tag_ids"])) - {event["actor_id"]}
+            else:
+                recipients = {event["user_id"]}
+            for user_id in recipients:
+                rows.append({
+                    "user_id": user_id,
+                    "actor_id": event["actor_id"],
+                    "kind": event["kind"],
+                    "question_id": event["question_id"],
+                    "answer_id": event["answer_id"],
+                    "content": event["content"][:255],
+                    "is_read": False,
+                    "created_at": event["created_at"],
+                })
+        return rows
+
+    def _write(self, db: Session, batch: list):
+        rows = self._expand(db, batch)
+        for i in range(0, len(rows), NOTIFICATION_INSERT_CHUNK):
+            db.bulk_insert_mappings(Notification, rows[i:i + NOTIFICATION_INSERT_CHUNK])
+        totals = defaultdict(int)
+        for row in rows:
+            totals[row["user_id"]] += 1
+        if totals:
+            db.execute(_bulk_update, [{"uid": uid, "delta": n} for uid, n in totals.items()])
+        return rows
+
+    def _applied(self, batch: list, rows):
+        for row in rows:
+            realtime_hub.publish(f"user:{row['user_id']}", "notification.created", {
+                "kind": row["kind"], "content": row["content"],
+                "question_id": row["question_id"], "answer_id": row["answer_id"],
+            })
+        self.processed_events += len(batch)
+        self.delivered += len(rows)
+
+    def metrics(self) -> dict:
+        return {
+            "queued_events": self._queue.qsize(),
+            "processed_events": self.processed_events,
+            "delivered": self.delivered,
+            "flush_count": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "dropped_events": self.dropped_events,
+            "last_flush_at": self.last_flush_at,
+        }
+
+notification_worker = NotificationWorker()
+
+
+def mark_read(db: Session, user_id: int, ids=None) -> int:
+    # ids=None: đánh dấu tất cả. Chỉ trừ bộ đếm đúng số dòng thực sự đổi trạng thái
+    query = update(Notification).where(Notification.user_id == user_id, Notification.is_read == False)
+    if ids is not None:
+        if not ids:
+            return 0
+        query = query.where(Notification.id.in_(ids))
+    updated = db.execute(query.values(is_read=True).execution_options(synchronize_session=False)).rowcount
+    if updated:
+        db.execute(
+            update(User).where(User.id == user_id)
+            .values(unread_notifications=func.coalesce(User.unread_notifications, 0) - updated)
+        )
+    db.commit()
+    return updated
+
+
+def unread_count(db: Session, user_id: int) -> int:
+    return db.scalar(select(User.unread_notifications).where(User.id == user_id)) or 0
+
+
+def reconcile_unread(db: Session) -> int:
+    actual = (
+        select(func.count(Notification.id))
+        .where(Notification.user_id == User.id, Notification.is_read == False)
+        .scalar_subquery()
+    )
+    updated = db.execute(
+        update(User)
+        .where(func.coalesce(User.unread_notifications, -1) != actual)
+        .values(unread_notifications=actual)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    session = SessionLocal()
+    try:
+        print(f"unread_notifications: sửa {reconcile_unread(session)} dòng")
+    finally:
+        session.close()
@@ -0,0 +1,80 @@
+from fastapi import HTTPException
+from datetime import datetime
+from sqlalchemy import and_, or_
+import base64
+import json
+import os
+import threading
+import time
+
+
+# Cursor là base64 của [giá trị cột sắp xếp, id] của bản ghi cuối trang trước
+def encode_cursor(value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+        return value, int(row_id)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(column, id_column, cursor: str, descending: bool = True):
+    value, row_id = decode_cursor(cursor)
+    if descending:
+        return or_(column < value, and_(column == value, id_column < row_id))
+    return or_(column > value, and_(column == value, id_column > row_id))
+
+
+def keyset_order(column, id_column, descending: bool = True):
+    if descending:
+        return [column.desc(), id_column.desc()]
+    return [column.asc(), id_column.asc()]
+
+
+class CountCache:
+    # Cache tổng số bản ghi theo key trong ttl giây để COUNT(*) không chạy mỗi request
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+        value = compute()
+        with self._lock:
+            self._data[key] = (value, now + self.ttl)
+        return value
+
+    async def get_or_compute_async(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+        value = await compute()
+        with self._lock:
+            self._data[key] = (value, now + self.ttl)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+question_count_cache = CountCache(float(os.getenv("QUESTION_COUNT_CACHE_TTL", "30")))
@@ -0,0 +1,166 @@
+# Điểm xếp hạng hot/top-week/active được tính sẵn vào các cột của questions.
+#
+# hot_score theo kiểu Reddit: log10 của mức tương tác (phiếu, câu trả lời) cộng với
+# thời điểm tạo chia HOT_DECAY_SECONDS. Câu hỏi mới luôn có lợi thế nên không cần tính lại
+# các câu hỏi không có hoạt động gì, job chỉ tính lại câu hỏi có activity_at mới hơn lần chạy trước.
+# Lượt xem không tính vào điểm: view_counter không đụng activity_at (cột này còn dùng cho sort=active)
+# nên job sẽ không bao giờ thấy câu hỏi chỉ có thêm lượt xem.
+from sqlalchemy import bindparam, func, or_
+from sqlalchemy.orm import Session
+from .databases import SessionLocal
+from .models import Question
+import datetime
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HOT_DECAY_SECONDS = 45000
+HOT_EPOCH = datetime.datetime(2024, 1, 1)
+RANKING_REFRESH_INTERVAL = float(os.getenv("RANKING_REFRESH_INTERVAL", "60"))
+RANKING_BATCH_SIZE = 1000
+
+_questions = Question.__table__
+_bulk_update = (
+    _questions.update()
+    .where(_questions.c.id == bindparam("qid"))
+    .values(
+        hot_score=bindparam("hot"),
+        score=bindparam("net"),
+        activity_at=func.coalesce(_questions.c.activity_at, bindparam("activity")),
+        ranked_at=bindparam("ranked"),
+        updated_at=_questions.c.updated_at,  # không tính là sửa câu hỏi
+    )
+)
+
+
+def hot_score(upvotes: int, downvotes: int, answer_count: int, created_at) -> float:
+    points = (upvotes or 0) - (downvotes or 0) + 2 * (answer_count or 0)
+    order = math.log10(max(abs(points), 1))
+    sign = 1 if points > 0 else -1 if points < 0 else 0
+    age = ((created_at or HOT_EPOCH) - HOT_EPOCH).total_seconds()
+    return round(sign * order + age / HOT_DECAY_SECONDS, 7)
+
+
+def touch_question(db: Session, question_id: int):
+    # Đánh dấu có hoạt động mới (trả lời, bình luận, vote) để job tính lại điểm
+    db.execute(
+        _questions.update()
+        .where(_questions.c.id == question_id)
+        .values(activity_at=datetime.datetime.now(), updated_at=_questions.c.updated_at)
+    )
+
+
+def recompute_scores(db: Session, since=None, unranked: bool = False) -> int:
+    started = datetime.datetime.now()
+    query = db.query(
+        Question.id, Question.upvotes, Question.downvotes,
+        Question.created_at, Question.updated_at, Question.activity_at, Question.answer_count,
+    )
+    if unranked:
+        # Dòng có từ trước khi thêm cột xếp hạng: NULL sẽ rơi khỏi điều kiện keyset
+        query = query.filter(or_(
+            Question.ranked_at.is_(None), Question.hot_score.is_(None),
+            Question.score.is_(None), Question.activity_at.is_(None),
+        ))
+    if since is not None:
+        query = query.filter(Question.activity_at >= since)
+    rows = query.order_by(Question.id).execution_options(yield_per=RANKING_BATCH_SIZE)
+
+    updated = 0
+    batch = []
+    for r in rows:
+        batch.append({
+            "qid": r.id,
+            "hot": hot_score(r.upvotes, r.downvotes, r.answer_count, r.created_at),
+            "net": (r.upvotes or 0) - (r.downvotes or 0),
+            "activity": r.activity_at or r.updated_at or r.created_at,
+            "ranked": started,
+        })
+        if len(batch) >= RANKING_BATCH_SIZE:
+            updated += _write(batch)
+            batch = []
+    if batch:
+        updated += _write(batch)
+    return updated
+
+
+def _write(batch: list) -> int:
+    # Ghi bằng session riêng vì session đọc vẫn đang stream kết quả
+    db = SessionLocal()
+    try:
+        db.execute(_bulk_update, batch)
+        db.commit()
+    finally:
+        db.close()
+    return len(batch)
+
+
+class RankingJob:
+    def __init__(self, interval: float = RANKING_REFRESH_INTERVAL):
+        self.interval = interval
+        self.watermark = None
+        self.last_run_at = None
+        self.last_run_updated = 0
+        self.last_run_duration = 0.0
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def run_once(self, full: bool = False) -> int:
+        with self._lock:
+            db = SessionLocal()
+            try:
+                if self.watermark is None and not full:
+                    # Lần chạy đầu của process: điền nốt các dòng chưa từng được tính điểm
+                    backfilled = recompute_scores(db, unranked=True)
+                    if backfilled:
+                        logger.info("Đã tính điểm cho %d câu hỏi chưa xếp hạng", backfilled)
+                    self.watermark = db.query(func.max(Question.ranked_at)).scalar()
+                started = time.monotonic()
+                run_started = datetime.datetime.now()
+                updated = recompute_scores(db, None if full else self.watermark)
+                self.watermark = run_started
+                self.last_run_at = time.time()
+                self.last_run_updated = updated
+                self.last_run_duration = time.monotonic() - started
+                return updated
+            finally:
+                db.close()
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Tính lại điểm xếp hạng thất bại")
+            if self._stopped.wait(self.interval):
+                return
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="ranking-job", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def metrics(self) -> dict:
+        return {
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "last_run_at": self.last_run_at,
+            "last_run_updated": self.last_run_updated,
+            "last_run_duration_seconds": self.last_run_duration,
+            "interval_seconds": self.interval,
+        }
+
+
+ranking_job = RankingJob()
@@ -0,0 +1,261 @@
+# Hub pub/sub cho cập nhật trực tiếp (SSE ở routers/realtime.py).
+#
+# Kênh là chuỗi "question:{id}" hoặc "tag:{id}". Router ghi dữ liệu gọi realtime_hub.publish(...)
+# sau khi commit (có thể từ thread của threadpool). Backend quyết định sự kiện đi đâu:
+#   - LocalBackend: phát thẳng cho các kết nối trong process (một worker)
+#   - RedisBackend: PUBLISH lên redis, mỗi worker có một thread nghe và phát lại cho kết nối của mình
+# Chọn bằng REALTIME_BACKEND=memory|redis.
+#
+# Mỗi kết nối có hàng đợi giới hạn REALTIME_QUEUE_SIZE. Client đọc chậm làm đầy hàng đợi thì
+# toàn bộ sự kiện đang chờ bị bỏ và client nhận một sự kiện "resync" (kèm số sự kiện bị bỏ)
+# để tự tải lại trạng thái qua REST; bộ nhớ mỗi kết nối vì vậy luôn bị chặn trên.
+# Client resync quá REALTIME_MAX_RESYNCS lần liên tiếp mà không đọc kịp thì bị ngắt.
+from collections import defaultdict
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+REALTIME_BACKEND = os.getenv("REALTIME_BACKEND", "memory")
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "100"))
+REALTIME_MAX_RESYNCS = int(os.getenv("REALTIME_MAX_RESYNCS", "5"))
+REALTIME_MAX_CONNECTIONS = int(os.getenv("REALTIME_MAX_CONNECTIONS", "5000"))
+REALTIME_MAX_CHANNELS = int(os.getenv("REALTIME_MAX_CHANNELS", "50"))
+
+CLOSED = object()
+
+
+class Subscription:
+    def __init__(self, hub, channels, loop, maxsize: int):
+        self.hub = hub
+        self.channels = frozenset(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+        self.resyncs = 0
+        self.closed = False
+
+    def offer(self, event: dict):
+        # Luôn chạy trên event loop của kết nối
+        if self.closed:
+            return
+        if self.queue.full():
+            lost = 1
+            carried = 0
+            while not self.queue.empty():
+                pending = self.queue.get_nowait()
+                # Marker resync cũ chưa được đọc: cộng dồn số đã bỏ vào marker mới
+                if pending.get("type") == "resync":
+                    carried += pending["dropped"]
+                else:
+                    lost += 1
+            self.dropped += lost
+            self.hub.dropped_events += lost
+            self.resyncs += 1
+            if self.resyncs > self.hub.max_resyncs:
+                self.hub.disconnected_slow += 1
+                self.close()
+                return
+            self.queue.put_nowait({"type": "resync", "dropped": lost + carried})
+            return
+        self.queue.put_nowait(event)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSED)
+
+    async def get(self, timeout: float = None):
+        # Trả None khi hết timeout, CLOSED khi kết nối bị hub đóng
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event is not CLOSED and event.get("type") != "resync":
+            self.resyncs = 0
+        return event
+
+
+class LocalBackend:
+    # Mọi người nghe đều nằm trong process này
+    local_only = True
+
+    def __init__(self):
+        self.hub = None
+
+    def attach(self, hub):
+        self.hub = hub
+
+    def publish(self, channel: str, event: dict):
+        self.hub.dispatch(channel, event)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class RedisBackend:
+    # client là redis.Redis (hoặc đối tượng có publish/pubsub tương tự)
+    local_only = False
+
+    def __init__(self, client, prefix: str = "realtime:"):
+        self.client = client
+        self.prefix = prefix
+        self.hub = None
+        self._pubsub = None
+        self._thread = None
+
+    def attach(self, hub):
+        self.hub = hub
+
+    def publish(self, channel: str, event: dict):
+        self.client.publish(self.prefix + channel, orjson.dumps(event))
+
+    def _run(self):
+        for message in self._pubsub.listen():
+            if message.get("type") != "pmessage":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                self.hub.dispatch(channel[len(self.prefix):], orjson.loads(message["data"]))
+            except Exception:
+                logger.exception("Không phát lại được sự kiện realtime từ redis")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(self.prefix + "*")
+        self._thread = threading.Thread(target=self._run, name="realtime-redis", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+        self._thread = None
+
+
+class RealtimeHub:
+    def __init__(self, backend, queue_size: int = REALTIME_QUEUE_SIZE, max_resyncs: int = REALTIME_MAX_RESYNCS,
+                 max_connections: int = REALTIME_MAX_CONNECTIONS):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.max_resyncs = max_resyncs
+        self.max_connections = max_connections
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+        self.dropped_events = 0
+        self.disconnected_slow = 0
+        backend.attach(self)
+
+    def subscribe(self, channels) -> Subscription:
+        # Gọi trong coroutine của kết nối; trả None khi đã đủ số kết nối
+        subscription = Subscription(self, channels, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            if self.connections >= self.max_connections:
+                return None
+            self.connections += 1
+            for channel in subscription.channels:
+                self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self.connections -= 1
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+        subscription.closed = True
+
+    def has_subscribers(self, channels) -> bool:
+        # Với redis người nghe có thể ở worker khác nên luôn coi là có
+        if not getattr(self.backend, "local_only", False):
+            return True
+        with self._lock:
+            return any(channel in self._channels for channel in channels)
+
+    def publish(self, channel: str, event_type: str, data: dict):
+        self.published += 1
+        try:
+            self.backend.publish(channel, {"type": event_type, "channel": channel, "data": data, "ts": time.time()})
+        except Exception:
+            # Realtime chỉ là tối ưu, không được làm hỏng request ghi dữ liệu
+            logger.exception("Publish realtime lên kênh %s thất bại", channel)
+
+    def dispatch(self, channel: str, event: dict):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            self.delivered += 1
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is subscription.loop:
+                subscription.offer(event)
+            else:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, event)
+                except RuntimeError:
+                    # loop đã đóng, kết nối sẽ tự unsubscribe
+                    pass
+
+    def start(self):
+        self.backend.start()
+
+    def stop(self):
+        self.backend.stop()
+        with self._lock:
+            subscribers = {s for subs in self._channels.values() for s in subs}
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.close)
+            except RuntimeError:
+                pass
+
+    def metrics(self) -> dict:
+        with self._lock:
+            channels = len(self._channels)
+        return {
+            "backend": type(self.backend).__name__,
+            "connections": self.connections,
+            "channels": channels,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_events": self.dropped_events,
+            "disconnected_slow": self.disconnected_slow,
+            "queue_size": self.queue_size,
+        }
+
+
+def _create_backend():
+    if REALTIME_BACKEND == "redis":
+        import redis  # chỉ cần khi bật backend redis
+        return RedisBackend(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    return LocalBackend()
+
+
+realtime_hub = RealtimeHub(_create_backend())
+
+
+def format_sse(event: dict) -> bytes:
+    return b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
@@ -0,0 +1,137 @@
+# Điểm uy tín tính tăng dần qua một sổ cái (bảng reputation_ledger).
+#
+# Router chỉ đưa sự kiện vào hàng đợi trong bộ nhớ sau khi commit. Worker nền gom sự kiện,
+# ghi sổ cái bằng một bulk insert và cộng delta vào users.reputation bằng một UPDATE hàng loạt,
+# cả hai trong cùng transaction nên tổng sổ cái luôn khớp với cột reputation.
+#
+# Kiểm tra/sửa: python -m BE_THLT_WEB.reputation [--fix] hoặc POST /admin/reputation/rebuild
+from sqlalchemy import bindparam, func
+from sqlalchemy.orm import Session
+from .databases import SessionLocal
+from .models import User, ReputationEvent
+from .batch_worker import BatchWorker
+from .utils import user_cache
+from collections import defaultdict
+import os
+
+REPUTATION_POINTS = {
+    "question_upvote": 5,
+    "question_downvote": -2,
+    "answer_upvote": 10,
+    "answer_downvote": -2,
+    "answer_accepted": 15,
+}
+REPUTATION_FLUSH_INTERVAL = float(os.getenv("REPUTATION_FLUSH_INTERVAL", "2"))
+REPUTATION_BATCH_SIZE = int(os.getenv("REPUTATION_BATCH_SIZE", "1000"))
+
+_users = User.__table__
+_bulk_update = (
+    _users.update()
+    .where(_users.c.id == bindparam("uid"))
+    .values(reputation=func.coalesce(_users.c.reputation, 0) + bindparam("delta"))
+)
+
+
+def vote_events(kind: str, owner_id: int, voter_id: int, up: int, down: int, question_id=None, answer_id=None) -> list:
+    # kind là "question" hoặc "answer", up/down là delta số phiếu từ vote_engine (có thể âm khi đổi chiều)
+    if owner_id is None or owner_id == voter_id:
+        return []
+    events = []
+    for reason, count in ((f"{kind}_upvote", up), (f"{kind}_downvote", down)):
+        if count:
+            events.append({
+                "user_id": owner_id,
+                "actor_id": voter_id,
+                "reason": reason,
+                "delta": REPUTATION_POINTS[reason] * count,
+                "question_id": question_id,
+                "answer_id": answer_id,
+            })
+    return events
+
+
+def accept_events(answer_owner_id: int, actor_id: int, answer_id: int, question_id: int, accepted: bool) -> list:
+    if answer_owner_id is None or answer_owner_id == actor_id:
+        return []
+    points = REPUTATION_POINTS["answer_accepted"]
+    return [{
+        "user_id": answer_owner_id,
+        "actor_id": actor_id,
+        "reason": "answer_accepted",
+        "delta": points if accepted else -points,
+        "question_id": question_id,
+        "answer_id": answer_id,
+    }]
+
+
+class ReputationWorker(BatchWorker):
+    thread_name = "reputation-worker"
+
+    def __init__(self, session_factory=SessionLocal, interval: float = REPUTATION_FLUSH_INTERVAL, batch_size: int = REPUTATION_BATCH_SIZE):
+        super().__init__(session_factory, interval, batch_size)
+        self.applied_events = 0
+
+    def _write(self, db: Session, batch: list):
+        totals = defaultdict(int)
+        for event in batch:
+            totals[event["user_id"]] += event["delta"]
+        db.bulk_insert_mappings(ReputationEvent, batch)
+        # Các sự kiện có thể triệt tiêu nhau (chấp nhận rồi bỏ chấp nhận) nên danh sách có thể rỗng
+        params = [{"uid": uid, "delta": d} for uid, d in totals.items() if d]
+        if params:
+            db.execute(_bulk_update, params)
+        return totals
+
+    def _applied(self, batch: list, totals):
+        self.applied_events += len(batch)
+        # UserPrincipal trong cache giữ reputation cũ
+        for uid, delta in totals.items():
+            if delta:
+                user_cache.invalidate(uid)
+
+    def metrics(self) -> dict:
+        return {
+            "queued_events": self._queue.qsize(),
+            "applied_events": self.applied_events,
+            "flush_count": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "dropped_events": self.dropped_events,
+            "last_flush_at": self.last_flush_at,
+        }
+
+reputation_worker = ReputationWorker()
+
+
+def rebuild_reputation(db: Session, fix: bool = False) -> list:
+    # Cộng lại toàn bộ sổ cái theo user và so với users.reputation
+    ledger = dict(
+        db.query(ReputationEvent.user_id, func.sum(ReputationEvent.delta))
+        .group_by(ReputationEvent.user_id)
+        .all()
+    )
+    mismatches = []
+    for user_id, reputation in db.query(User.id, User.reputation).execution_options(yield_per=5000):
+        expected = int(ledger.get(user_id) or 0)
+        if (reputation or 0) != expected:
+            mismatches.append({"user_id": user_id, "reputation": reputation or 0, "ledger": expected})
+    if fix and mismatches:
+        db.execute(
+            _users.update().where(_users.c.id == bindparam("uid")).values(reputation=bindparam("value")),
+            [{"uid": m["user_id"], "value": m["ledger"]} for m in mismatches],
+        )
+        db.commit()
+    return mismatches
+
+
+if __name__ == "__main__":
+    import sys
+
+    fix = "--fix" in sys.argv
+    session = SessionLocal()
+    try:
+        result = rebuild_reputation(session, fix=fix)
+    finally:
+        session.close()
+    for m in result:
+        print(f"user {m['user_id']}: reputation={m['reputation']} ledger={m['ledger']}")
+    print(f"{len(result)} user lệch" + (" (đã sửa)" if fix and result else ""))
@@ -0,0 +1,228 @@
+# Cache response cho các endpoint đọc của người dùng ẩn danh.
+#
+# Mỗi entry được gắn tag (vd "questions", "question:12"). Mỗi tag có một số version,
+# entry lưu version của các tag lúc ghi, khi đọc nếu version đã đổi thì coi như miss.
+# Router ghi dữ liệu gọi response_cache.invalidate(...) để tăng version các tag bị ảnh hưởng,
+# nhờ vậy backend dùng chung (redis) cũng invalidate được giữa nhiều worker.
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+
+
+class LRUStore:
+    # Backend trong process, chỉ đúng khi chạy một worker
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: dict, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def tag_versions(self, tags) -> list:
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SharedStore:
+    # Backend dùng chung giữa các worker, client là bất kỳ đối tượng nào có get/set(ex=)/incr/mget
+    # như redis.Redis. LocalKV dưới đây là bản thay thế trong process để chạy local.
+    def __init__(self, client, prefix: str = "respcache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str):
+        raw = self.client.get(self.prefix + key)
+        return json.loads(raw) if raw else None
+
+    def set(self, key: str, value: dict, ttl: float):
+        self.client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def tag_versions(self, tags) -> list:
+        if not tags:
+            return []
+        values = self.client.mget([self.prefix + "tag:" + tag for tag in tags])
+        return [int(v) if v else 0 for v in values]
+
+    def bump_tags(self, tags):
+        for tag in tags:
+            self.client.incr(self.prefix + "tag:" + tag)
+
+
+class LocalKV:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[1] is not None and entry[1] <= time.monotonic()):
+                return None
+            return entry[0]
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ex if ex else None)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._data.get(key, (0, None))[0]) + 1
+            self._data[key] = (value, None)
+            return value
+
+
+def _create_store():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        import redis  # chỉ cần khi bật backend redis
+        return SharedStore(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0")))
+    if RESPONSE_CACHE_BACKEND == "local-shared":
+        return SharedStore(LocalKV())
+    return LRUStore(RESPONSE_CACHE_SIZE)
+
+
+class ResponseCache:
+    def __init__(self, store, ttl: float):
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: str):
+        entry = self.store.get(key)
+        if entry is None or self.store.tag_versions(entry["tags"]) != entry["versions"]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, tags: list, body: bytes, media_type: str, versions: list):
+        entry = {
+            "tags": tags,
+            "versions": versions,
+            "body": body.decode("utf-8"),
+            "media_type": media_type,
+            "etag": '"%s"' % hashlib.sha1(body).hexdigest(),
+        }
+        self.store.set(key, entry, self.ttl)
+        return entry
+
+    def invalidate(self, *tags):
+        self.store.bump_tags(tags)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+response_cache = ResponseCache(_create_store(), RESPONSE_CACHE_TTL)
+
+
+def _on_question_hit(match):
+    # Bản cache bỏ qua handler nên vẫn phải đếm lượt xem
+    from .view_counter import view_counter
+    view_counter.increment(int(match.group(1)))
+
+
+# (pattern path, hàm sinh tag, hàm chạy khi hit)
+CACHE_RULES = [
+    (re.compile(r"^/questions$"), lambda m: ["questions", "users"], None),
+    (re.compile(r"^/questions/(\d+)$"), lambda m: [f"question:{m.group(1)}", "users"], _on_question_hit),
+    (re.compile(r"^/tags$"), lambda m: ["tags"], None),
+    (re.compile(r"^/tags/with_count$"), lambda m: ["tags"], None),
+    (re.compile(r"^/tags/popular$"), lambda m: ["tags"], None),
+    (re.compile(r"^/answers/question/(\d+)$"), lambda m: [f"answers:{m.group(1)}", "users"], None),
+]
+
+
+def _match_rule(path: str):
+    for pattern, tags, on_hit in CACHE_RULES:
+        match = pattern.match(path)
+        if match:
+            return match, tags(match), on_hit
+    return None, None, None
+
+
+def _cached_response(request, entry, cache_status: str):
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache", "X-Cache": cache_status}
+    if request.headers.get("if-none-match") == entry["etag"]:
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type=entry["media_type"], headers=headers)
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        if request.method != "GET" or "authorization" in request.headers:
+            return await call_next(request)
+        match, tags, on_hit = _match_rule(request.url.path)
+        # Response streaming không gom body vào cache, nếu không sẽ mất tác dụng giữ bộ nhớ phẳng
+        if match is None or "stream" in request.query_params:
+            return await call_next(request)
+
+        key = request.url.path + "?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        entry = response_cache.get(key)
+        if entry is not None:
+            if on_hit:
+                on_hit(match)
+            return _cached_response(request, entry, "HIT")
+
+        # Lấy version trước khi chạy handler để ghi đồng thời trong lúc đó làm entry hết hạn ngay
+        versions = response_cache.store.tag_versions(tags)
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        entry = response_cache.set(key, tags, body, response.headers.get("content-type"), versions)
+        return _cached_response(request, entry, "MISS")
@@ -4,4 +4,7 @@ from .answers import router as answers_router
 from .comments import router as comments_router
 from .votes import router as votes_router
 from .tags import router as tags_router
-from .user import router as user_router
\ No newline at end of file
+from .user import router as user_router
+from .admin import router as admin_router
+from .realtime import router as realtime_router
+from .feed import router as feed_router
\ No newline at end of file
@@ -0,0 +1,187 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from ..models import User
+from ..databases import get_db, engine, pool_stats
+from ..utils import get_current_user, user_cache
+from ..passwords import password_hasher
+from ..response_cache import response_cache
+from ..tag_counts import reconcile_tag_counts
+from ..tag_resolver import tag_resolver
+from ..reputation import reputation_worker, rebuild_reputation
+from ..ranking import ranking_job
+from ..counters import reconcile_counters
+from ..notifications import notification_worker, reconcile_unread
+from ..realtime import realtime_hub
+from ..feed import feed_worker
+from ..view_counter import view_counter
+from ..search import search_backend
+from ..autocomplete import load_autocomplete, question_autocomplete, tag_autocomplete
+from ..bulk_io import BulkImporter, IMPORT_CHUNK_SIZE, export_lines
+from ..sql_metrics import metrics as sql_metrics, route_metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def require_admin(current_user: User = Depends(get_current_user)):
+    if getattr(current_user, "role", "student") != "admin":
+        raise HTTPException(status_code=403, detail="Admin only")
+    return current_user
+
+
+@router.get("/view-counter")
+def get_view_counter_metrics(current_user: User = Depends(require_admin)):
+    return view_counter.metrics()
+
+
+@router.post("/view-counter/flush")
+def flush_view_counter(current_user: User = Depends(require_admin)):
+    return {"flushed_questions": view_counter.flush()}
+
+
+@router.post("/search/rebuild")
+def rebuild_search_index(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    search_backend.rebuild(db)
+    return {"detail": "Search index rebuilt"}
+
+
+@router.post("/autocomplete/rebuild")
+def rebuild_autocomplete(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    load_autocomplete(db)
+    return {"questions": len(question_autocomplete), "tags": len(tag_autocomplete)}
+
+
+@router.get("/db-pool")
+def get_db_pool_stats(current_user: User = Depends(require_admin)):
+    return pool_stats.snapshot(engine.pool)
+
+
+@router.get("/user-cache")
+def get_user_cache_stats(current_user: User = Depends(require_admin)):
+    return user_cache.stats()
+
+
+@router.get("/password-hasher")
+def get_password_hasher_stats(current_user: User = Depends(require_admin)):
+    return password_hasher.stats()
+
+
+@router.get("/response-cache")
+def get_response_cache_stats(current_user: User = Depends(require_admin)):
+    return response_cache.stats()
+
+
+@router.post("/tags/reconcile")
+def reconcile_tags(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    updated = reconcile_tag_counts(db)
+    response_cache.invalidate("tags")
+    return {"updated_tags": updated}
+
+
+@router.get("/tag-resolver")
+def get_tag_resolver_stats(current_user: User = Depends(require_admin)):
+    return tag_resolver.stats()
+
+
+@router.get("/reputation")
+def get_reputation_worker_metrics(current_user: User = Depends(require_admin)):
+    return reputation_worker.metrics()
+
+
+@router.post("/reputation/rebuild")
+def rebuild_reputation_from_ledger(fix: bool = False, db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    reputation_worker.flush()
+    mismatches = rebuild_reputation(db, fix=fix)
+    return {"mismatches": mismatches, "fixed": fix}
+
+
+@router.get("/ranking")
+def get_ranking_job_metrics(current_user: User = Depends(require_admin)):
+    return ranking_job.metrics()
+
+
+@router.post("/ranking/recompute")
+def recompute_ranking(full: bool = False, current_user: User = Depends(require_admin)):
+    updated = ranking_job.run_once(full=full)
+    response_cache.invalidate("questions")
+    return {"updated_questions": updated}
+
+
+@router.post("/counters/reconcile")
+def reconcile_question_counters(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    result = reconcile_counters(db)
+    response_cache.invalidate("questions")
+    return result
+
+
+@router.get("/notifications")
+def get_notification_worker_metrics(current_user: User = Depends(require_admin)):
+    return notification_worker.metrics()
+
+
+@router.post("/notifications/reconcile")
+def reconcile_unread_counters(db: Session = Depends(get_db), current_user: User = Depends(require_admin)):
+    notification_worker.flush()
+    return {"updated_users": reconcile_unread(db)}
+
+
+@router.get("/metrics")
+def get_request_metrics(current_user: User = Depends(require_admin)):
+    return sql_metrics()
+
+
+@router.post("/metrics/reset")
+def reset_request_metrics(current_user: User = Depends(require_admin)):
+    route_metrics.reset()
+    return {"detail": "Metrics reset"}
+
+
+@router.get("/realtime")
+def get_realtime_metrics(current_user: User = Depends(require_admin)):
+    return realtime_hub.metrics()
+
+
+@router.get("/feed")
+def get_feed_worker_metrics(current_user: User = Depends(require_admin)):
+    return feed_worker.metrics()
+
+
+@router.post("/feed/trim")
+def trim_feed_timelines(current_user: User = Depends(require_admin)):
+    feed_worker.flush()
+    return {"trimmed_entries": feed_worker.trim()}
+
+
+@router.post("/import")
+async def bulk_import(request: Request, chunk_size: int = Query(IMPORT_CHUNK_SIZE, ge=1, le=5000), current_user: User = Depends(require_admin)):
+    # Body NDJSON đọc dần theo stream, mỗi chunk ghi trong threadpool để không chặn event loop
+    importer = BulkImporter(chunk_size=chunk_size, progress=lambda r: logger.info("Bulk import: %s", {k: v for k, v in r.items() if k != "errors"}))
+    buffer = b""
+    line_no = 0
+    try:
+        async for data in request.stream():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_no += 1
+                if importer.add(line_no, line):
+                    await run_in_threadpool(importer.flush)
+        if buffer:
+            importer.add(line_no + 1, buffer)
+        return await run_in_threadpool(importer.finish)
+    except Exception:
+        report = importer.report()
+        raise HTTPException(status_code=500, detail={"message": "Import failed", **report})
+
+
+@router.get("/export")
+def bulk_export(include_tags: bool = True, current_user: User = Depends(require_admin)):
+    return StreamingResponse(
+        export_lines(include_tags=include_tags),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="questions.ndjson"'},
+    )
\ No newline at end of file
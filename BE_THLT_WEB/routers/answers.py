@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 from typing import List
 from ..models import Answer, Question, User
 from ..schemas import AnswerCreate, AnswerResponse, UserResponse
-from ..databases import get_db
+from ..databases import get_db, get_async_db
 from ..utils import get_current_user
+from ..response_cache import response_cache
+from ..reputation import reputation_worker, accept_events
+from ..ranking import touch_question
+from ..counters import adjust_counter
+from ..notifications import notification_worker, answer_event, accept_event
+from ..realtime import realtime_hub
+from ..serializers import respond, serialize_answer
 from sqlalchemy.orm import selectinload
 
 
@@ -17,16 +26,21 @@ def create_answer(answer: AnswerCreate, db: Session = Depends(get_db), current_u
         raise HTTPException(status_code=404, detail="Question not found")
     new_answer = Answer(question_id=answer.question_id, user_id=current_user.id, content=answer.content)
     db.add(new_answer)
+    adjust_counter(db, Question, answer.question_id, "answer_count", 1)
+    touch_question(db, answer.question_id)
     db.commit()
     db.refresh(new_answer)
+    notification_worker.enqueue(answer_event(question, new_answer, current_user))
+    realtime_hub.publish(f"question:{new_answer.question_id}", "answer.created", serialize_answer(new_answer))
+    response_cache.invalidate(f"answers:{new_answer.question_id}", "questions")
     return new_answer
 
 @router.get("/question/{question_id}", response_model=List[AnswerResponse])
-def get_answers(question_id: int, db: Session = Depends(get_db)):
-    answers = db.query(Answer).options(
+async def get_answers(question_id: int, db: AsyncSession = Depends(get_async_db)):
+    answers = (await db.scalars(select(Answer).options(
         selectinload(Answer.user) # Eager load user
-    ).filter(Answer.question_id == question_id).all()
-    return answers
+    ).filter(Answer.question_id == question_id))).all()
+    return respond(serialize_answer.many(answers))
 
 @router.put("/{id}", response_model=AnswerResponse)
 def update_answer(id: int, answer: AnswerCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -36,8 +50,11 @@ def update_answer(id: int, answer: AnswerCreate, db: Session = Depends(get_db),
     if db_answer.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this answer")
     db_answer.content = answer.content
+    touch_question(db, db_answer.question_id)
     db.commit()
     db.refresh(db_answer)
+    response_cache.invalidate(f"answers:{db_answer.question_id}")
+    realtime_hub.publish(f"question:{db_answer.question_id}", "answer.updated", serialize_answer(db_answer))
     return db_answer
 
 @router.delete("/{id}")
@@ -47,8 +64,12 @@ def delete_answer(id: int, db: Session = Depends(get_db), current_user: User = D
         raise HTTPException(status_code=404, detail="Khong tim thay cau tra loi")
     if db_answer.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this answer")
+    adjust_counter(db, Question, db_answer.question_id, "answer_count", -1)
     db.delete(db_answer)
+    touch_question(db, db_answer.question_id)
     db.commit()
+    response_cache.invalidate(f"answers:{db_answer.question_id}", "questions")
+    realtime_hub.publish(f"question:{db_answer.question_id}", "answer.deleted", {"id": id})
     return {"detail": "Answer deleted"}
 
 @router.post("/{id}/accept")
@@ -59,9 +80,24 @@ def accept_answer(id: int, db: Session = Depends(get_db), current_user: User = D
     question = db.query(Question).filter(Question.id == db_answer.question_id).first()
     if question.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Only question owner can accept an answer")
+    previously_accepted = db.query(Answer.id, Answer.user_id).filter(
+        Answer.question_id == db_answer.question_id, Answer.is_accepted == True, Answer.id != db_answer.id
+    ).all()
+    events = []
+    for old in previously_accepted:
+        events += accept_events(old.user_id, current_user.id, old.id, question.id, False)
+    notifications = []
+    if not db_answer.is_accepted:
+        events += accept_events(db_answer.user_id, current_user.id, db_answer.id, question.id, True)
+        notifications = accept_event(question, db_answer, current_user)
     db.query(Answer).filter(Answer.question_id == db_answer.question_id).update({"is_accepted": False})
     db_answer.is_accepted = True
+    touch_question(db, db_answer.question_id)
     db.commit()
+    reputation_worker.enqueue(events)
+    notification_worker.enqueue(notifications)
+    response_cache.invalidate(f"answers:{db_answer.question_id}")
+    realtime_hub.publish(f"question:{db_answer.question_id}", "answer.accepted", {"id": db_answer.id})
     return {"detail": "Answer accepted"}
 
 @router.post("/{id}/not_accept")
@@ -69,6 +105,16 @@ def not_accept_answer(id: int, db: Session = Depends(get_db), current_user: User
     db_answer = db.query(Answer).filter(Answer.id == id).first()
     if not db_answer:
         raise HTTPException(status_code=404, detail="Answer not found")
+    question = db.query(Question.user_id).filter(Question.id == db_answer.question_id).first()
+    if question.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Only question owner can unaccept an answer")
+    events = []
+    if db_answer.is_accepted:
+        events = accept_events(db_answer.user_id, current_user.id, db_answer.id, db_answer.question_id, False)
     db_answer.is_accepted = False
+    touch_question(db, db_answer.question_id)
     db.commit()
+    reputation_worker.enqueue(events)
+    response_cache.invalidate(f"answers:{db_answer.question_id}")
+    realtime_hub.publish(f"question:{db_answer.question_id}", "answer.unaccepted", {"id": db_answer.id})
     return {"detail": "Answer not accepted"}
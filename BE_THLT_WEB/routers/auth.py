@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session
 from ..models import User
 from ..schemas import UserCreate, UserResponse, Token   
 from ..databases import get_db
-from ..utils import hash_password, verify_password, create_access_token
+from ..utils import hash_password, verify_and_update_password, create_access_token, token_claims
 
 
 
@@ -53,12 +53,19 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     email = form_data.username
     db_user = db.query(User).filter(User.email == email).first()
 
-    if not db_user or not verify_password(form_data.password, db_user.password):
+    verified, new_hash = (False, None)
+    if db_user:
+        verified, new_hash = verify_and_update_password(form_data.password, db_user.password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Hash cũ (ít rounds hơn cấu hình) được thay bằng hash mới
+        db_user.password = new_hash
+        db.commit()
 
-    access_token = create_access_token(data={"sub": str(db_user.id)})
+    access_token = create_access_token(data=token_claims(db_user))
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
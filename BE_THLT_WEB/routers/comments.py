@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func, select
+from typing import Dict, List, Literal, Optional
 from ..models import Comment, Question, Answer, User
-from ..schemas import CommentCreate, CommentResponse, UserResponse
+from ..schemas import CommentCreate, CommentResponse, CommentPage, UserResponse
 from ..databases import get_db
 from ..utils import get_current_user
-from sqlalchemy.orm import selectinload
+from ..response_cache import response_cache
+from ..ranking import touch_question
+from ..counters import comment_created
+from ..notifications import notification_worker, comment_event
+from ..realtime import realtime_hub
+from ..pagination import encode_cursor, keyset_filter, keyset_order
+from ..serializers import respond, serialize_comment
+from ..streaming import stream_response
+from sqlalchemy.orm import selectinload, joinedload
 
 
 router = APIRouter(prefix="/comments", tags=["comments"])
@@ -22,24 +31,116 @@ def create_comment(comment: CommentCreate, db: Session = Depends(get_db), curren
         if not question:
             raise HTTPException(status_code=404, detail="Question not found")
         new_comment = Comment(content=comment.content, question_id=comment.question_id, user_id=current_user.id)
+        touch_question(db, question.id)
+        events = comment_event(question.user_id, question.id, None, current_user, question.title)
+        question_id = question.id
     else:
-        answer = db.query(Answer).filter(Answer.id == comment.id).first()
+        answer = db.query(Answer).filter(Answer.id == comment.answer_id).first()
         if not answer:
             raise HTTPException(status_code=404, detail="Answer not found")
         new_comment = Comment(content=comment.content, answer_id=comment.answer_id, user_id=current_user.id)
+        touch_question(db, answer.question_id)
+        events = comment_event(answer.user_id, answer.question_id, answer.id, current_user, answer.question.title)
+        question_id = answer.question_id
     
     db.add(new_comment)
+    comment_created(db, comment.question_id, comment.answer_id)
     db.commit()
     db.refresh(new_comment)
+    notification_worker.enqueue(events)
+    response_cache.invalidate("questions", f"question:{question_id}", f"answers:{question_id}")
+    realtime_hub.publish(f"question:{question_id}", "comment.created", serialize_comment(new_comment))
     return new_comment
 
+def paginate_comments(query, cursor: Optional[str], limit: int):
+    # Bình luận đọc từ cũ đến mới, keyset theo (created_at, id)
+    query = query.options(selectinload(Comment.user)).order_by(
+        *keyset_order(Comment.created_at, Comment.id, descending=False)
+    )
+    if cursor:
+        query = query.filter(keyset_filter(Comment.created_at, Comment.id, cursor, descending=False))
+    rows = query.limit(limit + 1).all()
+    comments = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(comments[-1].created_at, comments[-1].id)
+    return comments, next_cursor
+
 @router.get("", response_model=List[CommentResponse])
-def get_comments(db: Session = Depends(get_db)): # Consider pagination
-    comments = db.query(Comment).options(
-        selectinload(Comment.user) # Eager load user
-    ).all()
+def get_comments(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    db: Session = Depends(get_db)
+):
+    if stream:
+        # Stream toàn bộ từ cursor trở đi, bỏ qua limit
+        stmt = select(Comment).options(joinedload(Comment.user)).order_by(
+            *keyset_order(Comment.created_at, Comment.id, descending=False)
+        )
+        if cursor:
+            stmt = stmt.where(keyset_filter(Comment.created_at, Comment.id, cursor, descending=False))
+        return stream_response(stmt, serialize_comment, stream)
+    comments, next_cursor = paginate_comments(db.query(Comment), cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return comments
 
+@router.get("/question/{question_id}", response_model=CommentPage)
+def get_question_comments(question_id: int, cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    comments, next_cursor = paginate_comments(db.query(Comment).filter(Comment.question_id == question_id), cursor, limit)
+    return respond({"comments": serialize_comment.many(comments), "next_cursor": next_cursor})
+
+@router.get("/answer/{answer_id}", response_model=CommentPage)
+def get_answer_comments(answer_id: int, cursor: Optional[str] = None, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    comments, next_cursor = paginate_comments(db.query(Comment).filter(Comment.answer_id == answer_id), cursor, limit)
+    return respond({"comments": serialize_comment.many(comments), "next_cursor": next_cursor})
+
+def comments_for_answers(db: Session, answer_ids: List[int], limit: int) -> Dict[int, list]:
+    # Một câu truy vấn cho nhiều câu trả lời, mỗi câu trả lời lấy tối đa limit bình luận đầu tiên
+    answer_ids = list(set(answer_ids))
+    if not answer_ids:
+        return {}
+    ranked = (
+        select(
+            Comment.id,
+            func.row_number().over(
+                partition_by=Comment.answer_id, order_by=(Comment.created_at, Comment.id)
+            ).label("rn"),
+        )
+        .where(Comment.answer_id.in_(answer_ids))
+        .subquery()
+    )
+    comments = (
+        db.query(Comment)
+        .join(ranked, ranked.c.id == Comment.id)
+        .filter(ranked.c.rn <= limit)
+        .options(selectinload(Comment.user))
+        .order_by(Comment.answer_id, Comment.created_at, Comment.id)
+        .all()
+    )
+    result = {answer_id: [] for answer_id in answer_ids}
+    for comment in comments:
+        result[comment.answer_id].append(comment)
+    return result
+
+@router.get("/answers", response_model=Dict[int, List[CommentResponse]])
+def get_comments_for_answers(
+    ids: List[int] = Query(..., max_length=100),
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    return comments_for_answers(db, ids, limit)
+
+def comment_question_id(db_comment: Comment) -> int:
+    # Bình luận của câu trả lời đã bị xoá không còn câu hỏi để invalidate
+    if db_comment.question_id:
+        return db_comment.question_id
+    if db_comment.answer is None:
+        raise HTTPException(status_code=404, detail="Answer not found")
+    return db_comment.answer.question_id
+
 @router.put("/{comment_id}", response_model=CommentResponse)
 def update_comment(comment_id: int, comment: CommentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     db_comment = db.query(Comment).filter(Comment.id == comment_id).first()
@@ -47,9 +148,11 @@ def update_comment(comment_id: int, comment: CommentCreate, db: Session = Depend
         raise HTTPException(status_code=404, detail="Comment not found")
     if db_comment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this comment")
+    question_id = comment_question_id(db_comment)
     db_comment.content = comment.content
     db.commit()
     db.refresh(db_comment)
+    response_cache.invalidate(f"question:{question_id}", f"answers:{question_id}")
     return db_comment
 
 @router.delete("/{comment_id}")
@@ -59,6 +162,11 @@ def delete_comment(comment_id: int, db: Session = Depends(get_db), current_user:
         raise HTTPException(status_code=404, detail="Comment not found")
     if db_comment.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
+    question_id = comment_question_id(db_comment)
+    comment_created(db, db_comment.question_id, db_comment.answer_id, -1)
     db.delete(db_comment)
+    touch_question(db, question_id)
     db.commit()
+    response_cache.invalidate("questions", f"question:{question_id}", f"answers:{question_id}")
+    realtime_hub.publish(f"question:{question_id}", "comment.deleted", {"id": comment_id})
     return {"detail": "Comment deleted"}
\ No newline at end of file
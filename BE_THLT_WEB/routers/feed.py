@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from ..models import User
+from ..databases import get_db
+from ..utils import get_current_user_readonly
+from ..feed import read_feed
+from ..serializers import respond, serialize_question
+
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+
+@router.get("")
+def get_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_readonly)
+):
+    # Câu hỏi mới từ các tag đang theo dõi, mới nhất trước
+    questions, next_cursor = read_feed(db, current_user.id, cursor, limit)
+    return respond({"questions": serialize_question.many(questions), "next_cursor": next_cursor})
@@ -1,12 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
-from ..models import Question, Tag, QuestionTag, User, SaveQuestion
-from ..schemas import QuestionCreate, QuestionResponse, UserResponse
-from ..databases import get_db
-from ..utils import get_current_user
-from sqlalchemy.orm import selectinload
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from ..models import Question, Tag, QuestionTag, User, SaveQuestion, Answer, Comment, Vote
+from ..schemas import QuestionCreate, QuestionResponse, UserResponse, ThreadResponse
+from ..databases import get_db, get_async_db
+from ..utils import get_current_user, get_current_user_readonly, get_optional_user
+from ..pagination import encode_cursor, keyset_filter, keyset_order, question_count_cache
+from ..view_counter import view_counter
+from ..search import search_backend, search_questions as run_search
+from ..autocomplete import question_autocomplete, tag_autocomplete
+from ..response_cache import response_cache
+from ..tag_counts import adjust_tag_counts
+from ..tag_resolver import tag_resolver
+from ..notifications import notification_worker, question_event
+from ..realtime import realtime_hub
+from ..feed import feed_worker, remove_question, retag_question
+from ..ranking import hot_score
+from ..serializers import respond, serialize_question, serialize_question_row, serialize_comment, serialize_thread_answer
+from ..streaming import stream_response
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import select, func, or_, insert, delete
+from collections import defaultdict
+from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/questions", tags=["questions"])
 
@@ -17,144 +33,187 @@ def create_question(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)  # Bắt buộc đăng nhập
 ):
-    # Lấy hoặc tạo mới các tag
-    tag_objects = []
-    for tag_name in question_data.tags:
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.flush()
-        tag_objects.append(tag)
-
-    # Tạo câu hỏi, gán user_id
+    # Lấy hoặc tạo mới các tag: một câu IN + một INSERT IGNORE, có cache tên -> id.
+    # Tên khác hoa/thường trỏ về cùng một tag nên phải bỏ id trùng
+    tag_ids = list(dict.fromkeys(tag_resolver.resolve(db, question_data.tags).values()))
+
+    # Tạo câu hỏi, gán user_id. Điểm xếp hạng tính luôn để câu hỏi mới lên đầu sort=hot ngay
+    now = datetime.now()
     question = Question(
         title=question_data.title,
         content=question_data.content,
-        tags=tag_objects,
-        user_id=current_user.id
+        user_id=current_user.id,
+        created_at=now,
+        activity_at=now,
+        score=0,
+        hot_score=hot_score(0, 0, 0, now),
+        ranked_at=now,
     )
     db.add(question)
+    db.flush()
+    if tag_ids:
+        db.execute(insert(QuestionTag), [{"question_id": question.id, "tag_id": tag_id} for tag_id in tag_ids])
+    adjust_tag_counts(db, tag_ids, 1)
     db.commit()
     db.refresh(question)
-    return {
-        "id": question.id,
-        "title": question.title,
-        "content": question.content,
-        "tags": [tag.name for tag in question.tags],
-        "created_at": str(question.created_at),
-        "updated_at": str(question.updated_at) if question.updated_at else None,
-        "views": question.views,
-        "upvotes": question.upvotes,
-        "downvotes": question.downvotes,
-        "status": question.status,
-        "user": {
-            "id": current_user.id,
-            "username": current_user.username,
-            "email": current_user.email,
-            "reputation": current_user.reputation,
-            "created_at": str(current_user.created_at) if current_user.created_at else None,
-            "role": getattr(current_user, "role", "student"),
-        }
-    }
+    question_count_cache.invalidate()
+    notification_worker.enqueue(question_event(question, current_user, question.tags))
+    feed_worker.enqueue(question)
+    summary = {"id": question.id, "title": question.title, "tags": [tag.name for tag in question.tags], "user_id": question.user_id, "created_at": question.created_at}
+    for tag in question.tags:
+        realtime_hub.publish(f"tag:{tag.id}", "question.created", summary)
+    search_backend.index(question)
+    question_autocomplete.add_question(question)
+    for tag in question.tags:
+        tag_autocomplete.add_tag(tag)
+    response_cache.invalidate("questions", "tags")
+    return respond(serialize_question(question))
+
+
+# sort -> (cột sắp xếp, giảm dần?)
+QUESTION_SORTS = {
+    "newest": (Question.created_at, True),
+    "oldest": (Question.created_at, False),
+    "votes": (Question.upvotes, True),
+    "popular": (Question.views, True),
+    "views": (Question.views, True),
+    "hot": (Question.hot_score, True),
+    "top-week": (Question.score, True),
+    "active": (Question.activity_at, True),
+}
+
+
+def apply_question_filter(query, filter: str):
+    if filter == "no answer" or filter == "unanswered":
+        return query.filter(Question.answer_count == 0)
+    if filter == "answered":
+        return query.filter(Question.answer_count > 0)
+    if filter in ("open", "closed"):
+        return query.filter(Question.status == filter)
+    return query
 
 
 @router.get("")
-def get_questions(
-    db: Session = Depends(get_db),
+async def get_questions(
+    db: AsyncSession = Depends(get_async_db),
     page: int = 1,
-    pageSize: int = 10,
+    pageSize: int = Query(10, ge=1, le=100),
     sort: str = "newest",
-    filter: str = "all"
+    filter: str = "all",
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    query = db.query(Question).options(
+    if sort not in QUESTION_SORTS:
+        raise HTTPException(status_code=400, detail="Invalid sort")
+    sort_column, descending = QUESTION_SORTS[sort]
+
+    query = apply_question_filter(select(Question), filter)
+    if sort == "top-week":
+        query = query.filter(Question.created_at >= datetime.now() - timedelta(days=7))
+    total = None
+    if include_total:
+        async def count():
+            return await db.scalar(select(func.count()).select_from(query.subquery()))
+        total = await question_count_cache.get_or_compute_async((filter, sort == "top-week"), count)
+
+    query = query.options(
         selectinload(Question.user),
         selectinload(Question.tags)
-    )
-    # Có thể bổ sung logic sort/filter ở đây nếu muốn
-    total = query.count()
-    questions = query.offset((page-1)*pageSize).limit(pageSize).all()
-    return {
-        "questions": [
-            {
-                "id": q.id,
-                "user_id": q.user_id,
-                "title": q.title,
-                "content": q.content,
-                "views": q.views,
-                "upvotes": q.upvotes,
-                "downvotes": q.downvotes,
-                "status": q.status,
-                "user": {
-                    "id": 0,
-                    "username": "Ẩn danh",
-                    "email": "",
-                    "reputation": 0,
-                    "created_at": None,
-                    "role": "student",
-                } if q.user is None else {
-                    "id": q.user.id,
-                    "username": q.user.username,
-                    "email": q.user.email,
-                    "reputation": q.user.reputation,
-                    "created_at": str(q.user.created_at) if q.user.created_at else None,
-                    "role": getattr(q.user, "role", "student"),
-                },
-                "tags": [tag.name for tag in q.tags],
-                "created_at": str(q.created_at),
-                "updated_at": str(q.updated_at) if q.updated_at else None
-            }
-            for q in questions
-        ],
-        "total": total
-    }
+    ).order_by(*keyset_order(sort_column, Question.id, descending))
+    if cursor:
+        query = query.filter(keyset_filter(sort_column, Question.id, cursor, descending))
+    elif page > 1:
+        # Giữ tương thích với client cũ dùng page, nên chuyển sang cursor
+        query = query.offset((page-1)*pageSize)
+    rows = (await db.scalars(query.limit(pageSize + 1))).all()
+    questions = rows[:pageSize]
+    next_cursor = None
+    if len(rows) > pageSize:
+        last = questions[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+    return respond({
+        "questions": serialize_question.many(questions),
+        "total": total,
+        "next_cursor": next_cursor
+    })
 
 
 
 
 
 @router.get("/{question_id}", response_model=QuestionResponse)
-def get_question(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(Question).options(
+async def get_question(question_id: int, db: AsyncSession = Depends(get_async_db)):
+    question = (await db.scalars(select(Question).options(
         selectinload(Question.user),
         selectinload(Question.tags)
-    ).filter(Question.id == question_id).first()
+    ).filter(Question.id == question_id))).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
-    question.views += 1
-    db.commit()
+    # Lượt xem được gom lại và ghi định kỳ, cộng phần chưa flush để hiển thị
+    view_counter.increment(question.id)
+
+    data = serialize_question(question)
+    data["views"] = (question.views or 0) + view_counter.pending(question.id)
+    return respond(data)
 
-    return {
-        "id": question.id,
-        "title": question.title,
-        "content": question.content,
-        "tags": [tag.name for tag in question.tags],
-        "created_at": str(question.created_at),
-        "updated_at": str(question.updated_at) if question.updated_at else None,
-        "views": question.views,
-        "upvotes": question.upvotes,
-        "downvotes": question.downvotes,
-        "status": question.status,
-        "user": {
-            "id": 0,
-            "username": "Ẩn danh",
-            "email": "",
-            "reputation": 0,
-            "created_at": None,
-            "role": "student",
-        } if question.user is None else {
-            "id": question.user.id,
-            "username": question.user.username,
-            "email": question.user.email,
-            "reputation": question.user.reputation,
-            "created_at": str(question.user.created_at) if question.user.created_at else None,
-            "role": getattr(question.user, "role", "student"),
-        },
-        "success": True, "data": question
-    }
 
 
 
+THREAD_LOAD_OPTIONS = (
+    selectinload(Question.user),
+    selectinload(Question.tags),
+    selectinload(Question.comments).selectinload(Comment.user),
+    selectinload(Question.answers).selectinload(Answer.user),
+    selectinload(Question.answers).selectinload(Answer.comments).selectinload(Comment.user),
+)
+
+
+@router.get("/{question_id}/thread", response_model=ThreadResponse)
+async def get_question_thread(
+    question_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    # Cả trang câu hỏi trong một request: số câu truy vấn cố định, không phụ thuộc số câu trả lời
+    question = (await db.scalars(
+        select(Question).options(*THREAD_LOAD_OPTIONS).filter(Question.id == question_id)
+    )).first()
+    if not question:
+        raise HTTPException(status_code=404, detail="Question not found")
+    view_counter.increment(question.id)
+
+    my_votes = {}
+    is_saved = False
+    if current_user is not None:
+        answer_ids = [a.id for a in question.answers]
+        conditions = [Vote.question_id == question.id]
+        if answer_ids:
+            conditions.append(Vote.answer_id.in_(answer_ids))
+        votes = await db.execute(
+            select(Vote.question_id, Vote.answer_id, Vote.vote_type)
+            .filter(Vote.user_id == current_user.id, or_(*conditions))
+        )
+        for v in votes:
+            my_votes[("answer", v.answer_id) if v.answer_id else ("question", v.question_id)] = "up" if v.vote_type == 1 else "down"
+        is_saved = await db.scalar(
+            select(func.count()).select_from(SaveQuestion)
+            .filter(SaveQuestion.user_id == current_user.id, SaveQuestion.question_id == question.id)
+        ) > 0
+
+    answers = sorted(question.answers, key=lambda a: (not a.is_accepted, -((a.upvotes or 0) - (a.downvotes or 0)), a.created_at, a.id))
+    data = serialize_question(question)
+    data["views"] = (question.views or 0) + view_counter.pending(question.id)
+    thread_answers = serialize_thread_answer.many(answers)
+    for answer in thread_answers:
+        answer["my_vote"] = my_votes.get(("answer", answer["id"]))
+    return respond({
+        "question": data,
+        "comments": serialize_comment.many(sorted(question.comments, key=lambda c: (c.created_at, c.id))),
+        "answers": thread_answers,
+        "my_vote": my_votes.get(("question", question.id)),
+        "is_saved": is_saved,
+    })
+
 
 @router.put("/{question_id}", response_model=QuestionResponse)
 def update_question(question_id: int, question_data: QuestionCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -164,46 +223,32 @@ def update_question(question_id: int, question_data: QuestionCreate, db: Session
     if db_question.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to update this question")
 
+    new_tag_ids = set(tag_resolver.resolve(db, question_data.tags).values())
     db_question.title = question_data.title
     db_question.content = question_data.content
     db_question.updated_at = datetime.now()  # Cập nhật thời gian sửa
-
-    # Efficiently update tags: remove old, add new
-    db_question.tags.clear() # Clear existing tags for this question (removes entries from question_tags)
-
-    tags_to_associate = []
-    for tag_name in question_data.tags:
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-        tags_to_associate.append(tag)
-
-    db_question.tags.extend(tags_to_associate) # Associate new set of tags
+    db_question.activity_at = db_question.updated_at
+
+    # Chỉ xoá/thêm các dòng question_tags thực sự thay đổi
+    old_tag_ids = set(db.scalars(select(QuestionTag.tag_id).filter(QuestionTag.question_id == question_id)))
+    added = new_tag_ids - old_tag_ids
+    removed = old_tag_ids - new_tag_ids
+    if removed:
+        db.execute(delete(QuestionTag).filter(QuestionTag.question_id == question_id, QuestionTag.tag_id.in_(removed)))
+    if added:
+        db.execute(insert(QuestionTag), [{"question_id": question_id, "tag_id": tag_id} for tag_id in added])
+    adjust_tag_counts(db, added, 1)
+    adjust_tag_counts(db, removed, -1)
+    retag_question(db, question_id, db_question.created_at, added, removed)
 
     db.commit()
     db.refresh(db_question)
-    return {
-        "id": db_question.id,
-        "title": db_question.title,
-        "content": db_question.content,
-        "tags": [tag.name for tag in db_question.tags],
-        "created_at": str(db_question.created_at),
-        "updated_at": db_question.updated_at.isoformat() if db_question.updated_at else None,
-        "views": db_question.views,
-        "upvotes": db_question.upvotes,
-        "downvotes": db_question.downvotes,
-        "status": db_question.status,
-        "user": {
-            "id": db_question.user.id if db_question.user else 0,
-            "username": db_question.user.username if db_question.user else "Ẩn danh",
-            "email": db_question.user.email if db_question.user else "",
-            "reputation": db_question.user.reputation if db_question.user else 0,
-            "created_at": str(db_question.user.created_at) if db_question.user and db_question.user.created_at else None,
-            "role": getattr(db_question.user, "role", "student"),
-        }
-    }
-
+    search_backend.index(db_question)
+    question_autocomplete.add_question(db_question)
+    for tag in db_question.tags:
+        tag_autocomplete.add_tag(tag)
+    response_cache.invalidate("questions", f"question:{question_id}", "tags")
+    return respond(serialize_question(db_question))
 
 
 
@@ -217,12 +262,18 @@ def delete_question(question_id: int, db: Session = Depends(get_db), current_use
         raise HTTPException(status_code=404, detail="Question not found")
     if db_question.user_id != current_user.id and getattr(current_user, "role", "user") != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to delete this question")
+    adjust_tag_counts(db, [tag.id for tag in db_question.tags], -1)
+    remove_question(db, question_id)
     db.delete(db_question)
     db.commit()
+    question_count_cache.invalidate()
+    search_backend.remove(question_id)
+    question_autocomplete.remove(question_id)
+    response_cache.invalidate("questions", f"question:{question_id}", f"answers:{question_id}", "tags")
     return {"detail": "Question deleted"}
 
 @router.get("/{question_id}/save-status")
-def check_save_status(question_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def check_save_status(question_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_readonly)):
     saved = db.query(SaveQuestion).filter_by(user_id=current_user.id, question_id=question_id).first()
     return {"isSaved": bool(saved)}
 
@@ -250,44 +301,44 @@ def get_tags_of_question(question_id: int, db: Session = Depends(get_db)):
     tags = db.query(Tag).filter(Tag.id.in_(tag_ids)).all()
     return tags
 
+def attach_tag_names(conn, items: list):
+    # Một câu truy vấn cho cả lô câu hỏi đang stream
+    names = defaultdict(list)
+    rows = conn.execute(
+        select(QuestionTag.question_id, Tag.name)
+        .join(Tag, Tag.id == QuestionTag.tag_id)
+        .where(QuestionTag.question_id.in_([item["id"] for item in items]))
+    )
+    for question_id, name in rows:
+        names[question_id].append(name)
+    for item in items:
+        item["tags"] = names[item["id"]]
+
 @router.get("/by_tag/{tag_id}")
-def get_questions_by_tag(tag_id: int, db: Session = Depends(get_db)):
+def get_questions_by_tag(tag_id: int, stream: Optional[Literal["json", "ndjson"]] = None, db: Session = Depends(get_db)):
+    if stream:
+        stmt = (
+            select(Question)
+            .join(QuestionTag, QuestionTag.question_id == Question.id)
+            .where(QuestionTag.tag_id == tag_id)
+            .options(joinedload(Question.user))
+            .order_by(Question.id)
+        )
+        return stream_response(stmt, serialize_question_row, stream, enrich=attach_tag_names)
     qtags = db.query(QuestionTag).filter(QuestionTag.tag_id == tag_id).all()
     question_ids = [qt.question_id for qt in qtags]
     questions = db.query(Question).filter(Question.id.in_(question_ids)).all()
     return questions
 
 @router.get("/search/{keyword}")
-def search_questions(keyword: str, page: int = 1, pageSize: int = 10, db: Session = Depends(get_db)):
-    query = db.query(Question).filter(Question.title.ilike(f"%{keyword}%"))
-    total = query.count()
-    questions = query.offset((page-1)*pageSize).limit(pageSize).all()
+def search_questions(keyword: str, page: int = 1, pageSize: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    questions, total = run_search(db, keyword, max(page, 1), pageSize)
     return {"questions": questions, "total": total}
 
 @router.get("/search/suggestions/{keyword}")
-def search_suggestions(keyword: str, db: Session = Depends(get_db)):
-    # Lấy title chứa keyword
-    title_suggestions = db.query(Question.title).filter(Question.title.ilike(f"%{keyword}%")).limit(5).all()
-    # Lấy content chứa keyword
-    content_suggestions = db.query(Question.content).filter(Question.content.ilike(f"%{keyword}%")).limit(5).all()
-    result = []
-    title_set = set([s[0] for s in title_suggestions])
-    for s in title_suggestions:
-        result.append({"type": "title", "text": s[0]})
-    for s in content_suggestions:
-        content = s[0]
-        if content in title_set:
-            continue  # Không lặp lại nếu content trùng title
-        idx = content.lower().find(keyword.lower())
-        if idx != -1:
-            start = max(0, idx - 30)
-            end = min(len(content), idx + len(keyword) + 30)
-            snippet = content[start:end]
-            if start > 0:
-                snippet = "..." + snippet
-            if end < len(content):
-                snippet = snippet + "..."
-        else:
-            snippet = content[:60] + ("..." if len(content) > 60 else "")
-        result.append({"type": "content", "text": snippet})
-    return result
\ No newline at end of file
+def search_suggestions(keyword: str, limit: int = Query(10, ge=1, le=50)):
+    # Gợi ý từ prefix index trong bộ nhớ, không truy vấn DB
+    return [
+        {"type": "title", "text": s["title"], "id": s["id"]}
+        for s in question_autocomplete.suggest(keyword, limit)
+    ]
\ No newline at end of file
@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Optional
+from ..models import FollowTag
+from ..databases import AsyncSessionLocal
+from ..utils import oauth2_scheme_optional, _decode_token
+from ..realtime import realtime_hub, format_sse, CLOSED, REALTIME_MAX_CHANNELS
+import os
+
+REALTIME_KEEPALIVE = float(os.getenv("REALTIME_KEEPALIVE", "15"))
+
+router = APIRouter(prefix="/realtime", tags=["realtime"])
+
+
+async def event_stream(request: Request, subscription):
+    try:
+        yield b"retry: 3000\n\n"
+        while True:
+            event = await subscription.get(REALTIME_KEEPALIVE)
+            if event is CLOSED:
+                break
+            if event is None:
+                if await request.is_disconnected():
+                    break
+                yield b": keepalive\n\n"
+                continue
+            yield format_sse(event)
+    finally:
+        realtime_hub.unsubscribe(subscription)
+
+
+def stream(request: Request, channels):
+    if not channels:
+        raise HTTPException(status_code=400, detail="No channel to subscribe")
+    if len(channels) > REALTIME_MAX_CHANNELS:
+        raise HTTPException(status_code=400, detail="Too many channels")
+    subscription = realtime_hub.subscribe(channels)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many realtime connections")
+    return StreamingResponse(
+        event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/questions/{question_id}")
+async def subscribe_question(question_id: int, request: Request):
+    # Câu trả lời, bình luận, phiếu bầu mới của một câu hỏi
+    return stream(request, [f"question:{question_id}"])
+
+
+@router.get("/tags")
+async def subscribe_tags(request: Request, ids: str = Query(..., description="Danh sách tag id, cách nhau bởi dấu phẩy")):
+    try:
+        tag_ids = {int(i) for i in ids.split(",") if i.strip()}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid tag ids")
+    return stream(request, [f"tag:{tag_id}" for tag_id in tag_ids])
+
+
+@router.get("/me")
+async def subscribe_followed_tags(
+    request: Request,
+    token: Optional[str] = Query(None, description="EventSource không gửi được header nên cho phép truyền token qua query"),
+    header_token: Optional[str] = Depends(oauth2_scheme_optional)
+):
+    uid = _decode_token(header_token or token or "")["uid"]
+    # Không giữ connection DB suốt thời gian stream
+    async with AsyncSessionLocal() as db:
+        tag_ids = (await db.scalars(select(FollowTag.tag_id).filter(FollowTag.user_id == uid))).all()
+    # Kênh user:{id} nhận thông báo mới của chính người dùng
+    return stream(request, [f"user:{uid}"] + [f"tag:{tag_id}" for tag_id in tag_ids])
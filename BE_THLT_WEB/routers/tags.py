@@ -1,11 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from sqlalchemy import func, select
+from typing import List, Literal, Optional
 from ..models import Tag, User, FollowTag, QuestionTag
 from ..schemas import TagCreate, TagResponse
 from ..databases import get_db
-from ..utils import get_current_user
+from ..utils import get_current_user, get_current_user_readonly
+from ..autocomplete import tag_autocomplete
+from ..response_cache import response_cache
+from ..tag_counts import adjust_follower_count
+from ..feed import FEED_FANOUT_LIMIT, backfill, remove_tag
+from ..serializers import serialize_tag
+from ..streaming import stream_response
 from datetime import datetime
 
 router = APIRouter(prefix="/tags", tags=["tags"])
@@ -19,29 +25,37 @@ def create_tag(tag: TagCreate, db: Session = Depends(get_db), current_user: User
     db.add(new_tag)
     db.commit()
     db.refresh(new_tag)
+    tag_autocomplete.add_tag(new_tag)
+    response_cache.invalidate("tags")
     return new_tag
 
 @router.get("", response_model=List[TagResponse])
-def get_tags(db: Session = Depends(get_db)):
+def get_tags(stream: Optional[Literal["json", "ndjson"]] = None, db: Session = Depends(get_db)):
+    if stream:
+        return stream_response(select(Tag).order_by(Tag.id), serialize_tag, stream)
     tags = db.query(Tag).all()
     return tags
 
 @router.get("/with_count")
 def get_tags_with_count(db: Session = Depends(get_db)):
-    tag_counts = (
-        db.query(Tag.id, Tag.name, func.count(QuestionTag.question_id).label("count"))
-        .outerjoin(QuestionTag, Tag.id == QuestionTag.tag_id)
-        .group_by(Tag.id)
-        .all()
-    )
+    tag_counts = db.query(Tag.id, Tag.name, Tag.question_count).all()
     return [
-        {"id": t.id, "name": t.name, "count": t.count}
+        {"id": t.id, "name": t.name, "count": t.question_count}
         for t in tag_counts
     ]
 
+@router.get("/popular", response_model=List[TagResponse])
+def get_popular_tags(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    return (
+        db.query(Tag)
+        .order_by(Tag.question_count.desc(), Tag.id.desc())
+        .limit(limit)
+        .all()
+    )
+
 # --- FOLLOW TAGS ---
 @router.get("/followed")
-def get_followed_tags(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_followed_tags(db: Session = Depends(get_db), current_user: User = Depends(get_current_user_readonly)):
     follows = db.query(FollowTag).filter(FollowTag.user_id == current_user.id).all()
     tag_ids = [f.tag_id for f in follows]
     tags = db.query(Tag).filter(Tag.id.in_(tag_ids)).all()
@@ -51,8 +65,14 @@ def get_followed_tags(db: Session = Depends(get_db), current_user: User = Depend
 def follow_tag(tag_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     exist = db.query(FollowTag).filter_by(user_id=current_user.id, tag_id=tag_id).first()
     if not exist:
+        follower_count = db.query(Tag.follower_count).filter(Tag.id == tag_id).scalar()
+        if follower_count is None:
+            raise HTTPException(status_code=404, detail="Tag not found")
         follow = FollowTag(user_id=current_user.id, tag_id=tag_id, create_at=datetime.utcnow())
         db.add(follow)
+        adjust_follower_count(db, tag_id, 1)
+        if follower_count < FEED_FANOUT_LIMIT:
+            backfill(db, current_user.id, tag_id)
         db.commit()
     return {"detail": "Followed"}
 
@@ -61,10 +81,12 @@ def unfollow_tag(tag_id: int, db: Session = Depends(get_db), current_user: User
     follow = db.query(FollowTag).filter_by(user_id=current_user.id, tag_id=tag_id).first()
     if follow:
         db.delete(follow)
+        db.flush()
+        adjust_follower_count(db, tag_id, -1)
+        remove_tag(db, current_user.id, tag_id)
         db.commit()
     return {"detail": "Unfollowed"}
 
 @router.get("/search")
-def search_tags(keyword: str, db: Session = Depends(get_db)):
-    tags = db.query(Tag).filter(Tag.name.ilike(f"%{keyword}%")).all()
-    return tags
\ No newline at end of file
+def search_tags(keyword: str, limit: int = Query(10, ge=1, le=50)):
+    return tag_autocomplete.suggest(keyword, limit)
\ No newline at end of file
@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
+from sqlalchemy import select
+from typing import Literal, Optional
 from ..models import User, Notification
-from ..schemas import UserCreate, UserResponse, NotificationResponse
+from ..schemas import UserCreate, UserResponse, NotificationResponse, NotificationRead
 from ..databases import get_db
-from ..utils import get_current_user, hash_password
+from ..response_cache import response_cache
+from ..pagination import encode_cursor, keyset_filter, keyset_order
+from ..notifications import mark_read, unread_count
+from ..serializers import serialize_notification
+from ..streaming import stream_response
+from ..utils import get_current_user, get_current_user_readonly, hash_password, user_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -37,6 +44,8 @@ def update_user(user_update: UserCreate, db: Session = Depends(get_db), current_
     db_user.title = user_update.title
     db.commit()
     db.refresh(db_user)
+    user_cache.invalidate(db_user.id)
+    response_cache.invalidate("users")
     return db_user
 
 @router.delete("/me")
@@ -46,9 +55,70 @@ def delete_user(db: Session = Depends(get_db), current_user: User = Depends(get_
         raise HTTPException(status_code=404, detail="User not found")
     db.delete(db_user)
     db.commit()
+    user_cache.invalidate(current_user.id)
+    response_cache.invalidate("users")
     return {"detail": "User deleted"}
 
+@router.get("/leaderboard")
+def get_leaderboard(limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    # ORDER BY reputation DESC, id DESC đi theo index ix_users_reputation_id
+    users = (
+        db.query(User.id, User.username, User.avatar, User.reputation)
+        .order_by(User.reputation.desc(), User.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"rank": i + 1, "id": u.id, "username": u.username, "avatar": u.avatar, "reputation": u.reputation or 0}
+        for i, u in enumerate(users)
+    ]
+
 @router.get("/notifications", response_model=list[NotificationResponse])
-def get_notifications(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    notifications = db.query(Notification).filter(Notification.user_id == current_user.id).order_by(Notification.created_at.desc()).all()
-    return notifications
\ No newline at end of file
+def get_notifications(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(30, ge=1, le=100),
+    unread_only: bool = False,
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_readonly)
+):
+    if stream:
+        # Stream toàn bộ từ cursor trở đi, bỏ qua limit
+        stmt = select(Notification).where(Notification.user_id == current_user.id)
+        if unread_only:
+            stmt = stmt.where(Notification.is_read == False)
+        if cursor:
+            stmt = stmt.where(keyset_filter(Notification.created_at, Notification.id, cursor, descending=True))
+        stmt = stmt.order_by(*keyset_order(Notification.created_at, Notification.id, descending=True))
+        return stream_response(stmt, serialize_notification, stream)
+    # Mới nhất trước, keyset theo (created_at, id) trên ix_notifications_user_created_id
+    query = db.query(Notification).filter(Notification.user_id == current_user.id)
+    if unread_only:
+        query = query.filter(Notification.is_read == False)
+    if cursor:
+        query = query.filter(keyset_filter(Notification.created_at, Notification.id, cursor, descending=True))
+    rows = query.order_by(*keyset_order(Notification.created_at, Notification.id, descending=True)).limit(limit + 1).all()
+    notifications = rows[:limit]
+    if len(rows) > limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(notifications[-1].created_at, notifications[-1].id)
+    return notifications
+
+@router.get("/notifications/unread-count")
+def get_unread_count(db: Session = Depends(get_db), current_user: User = Depends(get_current_user_readonly)):
+    return {"unread": unread_count(db, current_user.id)}
+
+@router.put("/notifications/read")
+def mark_notifications_read(data: NotificationRead, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    updated = mark_read(db, current_user.id, data.ids)
+    return {"updated": updated, "unread": unread_count(db, current_user.id)}
+
+@router.put("/notifications/read-all")
+def mark_all_notifications_read(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    updated = mark_read(db, current_user.id)
+    return {"updated": updated, "unread": 0}
+
+@router.put("/notifications/{notification_id}/read")
+def mark_notification_read(notification_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    updated = mark_read(db, current_user.id, [notification_id])
+    return {"updated": updated, "unread": unread_count(db, current_user.id)}
\ No newline at end of file
@@ -1,75 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from ..models import Vote, Question, Answer, User
-from ..schemas import VoteCreate, VoteResponse , VoteType
+from ..models import Question, Answer, User
+from ..schemas import VoteCreate, VoteBatch
 from ..databases import get_db
 from ..utils import get_current_user
+from ..response_cache import response_cache
+from ..vote_engine import cast_vote, cast_votes
+from ..realtime import realtime_hub
 
 
 router = APIRouter(prefix="/votes", tags=["votes"])
 
 
+def publish_vote_counts(db: Session, question_ids, answer_ids, channel_ids):
+    # Đọc số phiếu sau commit, mỗi loại target một câu IN; bỏ qua khi không ai nghe các kênh question:{id}
+    if not realtime_hub.has_subscribers(f"question:{qid}" for qid in channel_ids):
+        return
+    if question_ids:
+        for q in db.query(Question.id, Question.upvotes, Question.downvotes).filter(Question.id.in_(question_ids)):
+            realtime_hub.publish(f"question:{q.id}", "vote.changed", {"question_id": q.id, "upvotes": q.upvotes, "downvotes": q.downvotes})
+    if answer_ids:
+        for a in db.query(Answer.id, Answer.question_id, Answer.upvotes, Answer.downvotes).filter(Answer.id.in_(answer_ids)):
+            realtime_hub.publish(f"question:{a.question_id}", "vote.changed", {"answer_id": a.id, "upvotes": a.upvotes, "downvotes": a.downvotes})
+
+
 @router.post("", response_model=VoteCreate)
 def create_vote(vote: VoteCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    question_id = cast_vote(db, current_user.id, vote.vote_type, vote.question_id, vote.answer_id)
     if vote.question_id:
-        target = db.query(Question).filter(Question.id == vote.question_id).first()
-        if not target:
-            raise HTTPException(status_code=404, detail="Question not found")
-        existing_vote = db.query(Vote).filter(
-            Vote.user_id == current_user.id,
-            Vote.question_id == vote.question_id
-        ).first()
-    elif vote.answer_id:
-        target = db.query(Answer).filter(Answer.answer_id == vote.answer_id).first()
-        if not target:
-            raise HTTPException(status_code=404, detail="Answer not found")
-        existing_vote = db.query(Vote).filter(
-            Vote.user_id == current_user.id,
-            Vote.answer_id == vote.answer_id
-        ).first()
-    
-    if existing_vote:
-        if existing_vote.vote_type == vote.vote_type:
-            raise HTTPException(status_code=400, detail="You have already voted this way")
-        db.delete(existing_vote)
-        if vote.question_id:
-            if existing_vote.vote_type == "up":
-                target.upvotes -= 1
-            else:
-                target.downvotes -= 1
-        else:
-            if existing_vote.vote_type == "up":
-                target.upvotes -= 1
-            else:
-                target.downvotes -= 1
-    
-    if vote.vote_type == "up":
-        vote_type_int = 1
-    elif vote.vote_type == "down":
-        vote_type_int = -1
+        response_cache.invalidate("questions", f"question:{vote.question_id}")
     else:
-        raise ValueError("vote_type phải là 'up' hoặc 'down'")
-    
-    new_vote = Vote(
-        user_id=current_user.id,
-        vote_type=vote_type_int,
-        question_id=vote.question_id,
-        answer_id=vote.answer_id
-    )
-    if vote.question_id:
-        if vote_type_int == 1:
-            target.upvotes += 1
-        else:
-            target.downvotes += 1
-    else:
-        if vote_type_int == 1:
-            target.upvotes += 1
-        else:
-            target.downvotes += 1
-    
-    db.add(new_vote)
-    db.commit()
+        response_cache.invalidate(f"answers:{question_id}")
+    publish_vote_counts(db, [vote.question_id] if vote.question_id else [], [vote.answer_id] if vote.answer_id else [], [question_id])
     return vote
 
+@router.post("/batch")
+def create_votes_batch(batch: VoteBatch, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    results, questions, answer_questions = cast_votes(db, current_user.id, batch.votes)
+    if questions:
+        response_cache.invalidate("questions", *(f"question:{qid}" for qid in questions))
+    if answer_questions:
+        response_cache.invalidate(*(f"answers:{qid}" for qid in answer_questions))
+    applied = [r for r in results if r["status"] == "applied"]
+    publish_vote_counts(db, {r["question_id"] for r in applied if r["question_id"]}, {r["answer_id"] for r in applied if r["answer_id"]}, questions | answer_questions)
+    return {"results": results}
+
 def int_to_vote_type(vote_type_int):
     return "up" if vote_type_int == 1 else "down"
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 from typing import Optional, List
 from pydantic import field_serializer
@@ -67,22 +67,25 @@ class AnswerResponse(BaseModel):
     upvotes: int
     downvotes: int
     is_accepted: bool
+    comment_count: int = 0
     user: UserResponse
 
     class Config:
         from_attributes = True
 
 class CommentCreate(BaseModel):
-    id: int
+    id: Optional[int] = None  # Client cũ gửi id của câu trả lời ở trường này
     content: str
     question_id: Optional[int] = None
     answer_id: Optional[int] = None
 
     @model_validator(mode='after') 
     def check_exclusive_ids(self) -> 'CommentCreate':
-        if self.question_id is not None and self.id is not None:
+        if self.answer_id is None:
+            self.answer_id = self.id
+        if self.question_id is not None and self.answer_id is not None:
             raise ValueError('Only one of question_id or answer_id can be provided')
-        if self.question_id is None and self.id is None:
+        if self.question_id is None and self.answer_id is None:
             raise ValueError('One of question_id or answer_id must be provided')
         return self
 
@@ -97,6 +100,10 @@ class CommentResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class CommentPage(BaseModel):
+    comments: List[CommentResponse]
+    next_cursor: Optional[str] = None
+
 class VoteCreate(BaseModel):
     vote_type: str # Should be Enum for better validation e.g. Literal["up", "down"]
     question_id: Optional[int] = None
@@ -110,6 +117,9 @@ class VoteCreate(BaseModel):
             raise ValueError('One of question_id or answer_id must be provided')
         return self
     
+class VoteBatch(BaseModel):
+    votes: List[VoteCreate] = Field(..., max_length=100)
+
 class VoteType(str, Enum):
     up = "up"
     down = "down"
@@ -117,6 +127,32 @@ class VoteType(str, Enum):
 class VoteResponse(BaseModel):
     vote_type: VoteType
 
+class ThreadQuestion(BaseModel):
+    id: int
+    title: str
+    content: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    views: int
+    upvotes: int
+    downvotes: int
+    status: str
+    answer_count: int
+    comment_count: int
+    user: Optional[UserResponse] = None
+    tags: List[str]
+
+class ThreadAnswer(AnswerResponse):
+    comments: List[CommentResponse] = []
+    my_vote: Optional[VoteType] = None
+
+class ThreadResponse(BaseModel):
+    question: ThreadQuestion
+    comments: List[CommentResponse]
+    answers: List[ThreadAnswer]
+    my_vote: Optional[VoteType] = None
+    is_saved: bool = False
+
 class TagCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -125,6 +161,7 @@ class TagResponse(BaseModel):
     id: int
     name: str
     description: Optional[str]
+    question_count: int = 0
 
     class Config:
         from_attributes = True
@@ -139,7 +176,13 @@ class NotificationResponse(BaseModel):
     content: str
     is_read: bool
     created_at: datetime
+    kind: Optional[str] = None
+    actor_id: Optional[int] = None
+    question_id: Optional[int] = None
+    answer_id: Optional[int] = None
 
     class Config:
         from_attributes = True
 
+class NotificationRead(BaseModel):
+    ids: List[int] = Field(..., max_length=500)
\ No newline at end of file
@@ -0,0 +1,170 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from .databases import engine
+from .models import Question
+from collections import defaultdict
+import html
+import math
+import os
+import re
+import threading
+import unicodedata
+
+TITLE_WEIGHT = 3
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _fold_char(c: str) -> str:
+    if c in "đĐ":
+        return "d"
+    return unicodedata.normalize("NFD", c)[0].lower()
+
+
+def fold(text: str) -> str:
+    # Bỏ dấu tiếng Việt, giữ nguyên độ dài chuỗi để vị trí khớp dùng được cho snippet
+    return "".join(_fold_char(c) for c in text)
+
+
+def strip_html(text: str) -> str:
+    return html.unescape(_TAG_RE.sub(" ", text or ""))
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN_RE.findall(fold(strip_html(text)))
+
+
+class InMemorySearchBackend:
+    # Inverted index thuần Python cho SQLite/dev, xếp hạng theo BM25
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        self._doc_tokens = {}
+        self._doc_len = {}
+        self._total_len = 0
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _add(self, question_id: int, title: str, content: str):
+        freqs = defaultdict(int)
+        for token in tokenize(title):
+            freqs[token] += TITLE_WEIGHT
+        for token in tokenize(content):
+            freqs[token] += 1
+        for token, tf in freqs.items():
+            self._postings[token][question_id] = tf
+        length = sum(freqs.values())
+        self._doc_tokens[question_id] = list(freqs)
+        self._doc_len[question_id] = length
+        self._total_len += length
+
+    def _remove(self, question_id: int):
+        for token in self._doc_tokens.pop(question_id, []):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(question_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._total_len -= self._doc_len.pop(question_id, 0)
+
+    def rebuild(self, db: Session):
+        with self._lock:
+            self._postings.clear()
+            self._doc_tokens.clear()
+            self._doc_len.clear()
+            self._total_len = 0
+            rows = db.query(Question.id, Question.title, Question.content).execution_options(yield_per=1000)
+            for question_id, title, content in rows:
+                self._add(question_id, title, content)
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.rebuild(db)
+
+    def index(self, question: Question):
+        with self._lock:
+            if not self._loaded:
+                return
+            self._remove(question.id)
+            self._add(question.id, question.title, question.content)
+
+    def remove(self, question_id: int):
+        with self._lock:
+            if self._loaded:
+                self._remove(question_id)
+
+    def search(self, db: Session, keyword: str, offset: int, limit: int):
+        self.ensure_loaded(db)
+        terms = list(dict.fromkeys(tokenize(keyword)))
+        if not terms:
+            return [], 0
+        with self._lock:
+            postings = [self._postings.get(t, {}) for t in terms]
+            if not all(postings):
+                return [], 0
+            n_docs = len(self._doc_len)
+            avg_len = self._total_len / n_docs if n_docs else 0
+            # Yêu cầu khớp tất cả từ khoá, bắt đầu từ danh sách ngắn nhất
+            postings.sort(key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            scores = {}
+            for p in postings:
+                idf = math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+                for qid in candidates:
+                    tf = p[qid]
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[qid] / avg_len)
+                    scores[qid] = scores.get(qid, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores, key=lambda qid: (-scores[qid], -qid))
+        return ranked[offset:offset + limit], len(ranked)
+
+
+class MySQLFulltextSearchBackend:
+    # Dùng FULLTEXT index ix_questions_fulltext, MySQL tự cập nhật index khi ghi
+    def index(self, question: Question):
+        pass
+
+    def remove(self, question_id: int):
+        pass
+
+    def rebuild(self, db: Session):
+        pass
+
+    def search(self, db: Session, keyword: str, offset: int, limit: int):
+        score = match(Question.title, Question.content, against=keyword).in_natural_language_mode()
+        rows = (
+            db.query(Question.id, func.count().over().label("total"))
+            .filter(score > 0)
+            .order_by(score.desc(), Question.id.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+        if not rows:
+            # Trang vượt quá cuối: COUNT(*) OVER() không có dòng nào để đọc, đếm riêng
+            total = db.query(func.count(Question.id)).filter(score > 0).scalar() if offset else 0
+            return [], total
+        return [r.id for r in rows], rows[0].total
+
+
+def _create_backend():
+    name = os.getenv("SEARCH_BACKEND") or ("mysql" if engine.dialect.name == "mysql" else "memory")
+    if name == "mysql":
+        return MySQLFulltextSearchBackend()
+    return InMemorySearchBackend()
+
+
+search_backend = _create_backend()
+
+
+def search_questions(db: Session, keyword: str, page: int, page_size: int):
+    ids, total = search_backend.search(db, keyword, (page - 1) * page_size, page_size)
+    if not ids:
+        return [], total
+    by_id = {q.id: q for q in db.query(Question).filter(Question.id.in_(ids)).all()}
+    return [by_id[qid] for qid in ids if qid in by_id], total
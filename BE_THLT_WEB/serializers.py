@@ -0,0 +1,88 @@
+# Lớp serialize dùng chung cho các response đọc nhiều.
+#
+# Mỗi kiểu response có một serializer dựng sẵn (danh sách field + attrgetter tính một lần),
+# chuyển ORM object sang dict thuần rồi encode bằng orjson. Dữ liệu lấy thẳng từ ORM là
+# tin cậy được nên mặc định trả Response trực tiếp, FastAPI không validate lại theo
+# response_model (response_model vẫn giữ để sinh tài liệu OpenAPI).
+# Đặt TRUSTED_SERIALIZATION=0 để quay về đường validate của FastAPI khi cần debug schema.
+from operator import attrgetter
+from starlette.responses import JSONResponse
+import orjson
+import os
+
+TRUSTED_SERIALIZATION = os.getenv("TRUSTED_SERIALIZATION", "1") == "1"
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class Serializer:
+    def __init__(self, fields, **nested):
+        self.fields = tuple(fields)
+        self.nested = nested
+        self._get = attrgetter(*self.fields)
+
+    def __call__(self, obj) -> dict:
+        values = self._get(obj)
+        data = dict(zip(self.fields, values if len(self.fields) > 1 else (values,)))
+        for name, convert in self.nested.items():
+            data[name] = convert(getattr(obj, name))
+        return data
+
+    def many(self, objs) -> list:
+        return [self(obj) for obj in objs]
+
+
+ANONYMOUS_USER = {
+    "id": 0,
+    "username": "Ẩn danh",
+    "email": "",
+    "reputation": 0,
+    "created_at": None,
+    "role": "student",
+    "avatar": None,
+    "bio": None,
+    "title": None,
+}
+
+_user = Serializer(["id", "username", "email", "created_at", "reputation", "role", "avatar", "bio", "title"])
+
+
+def serialize_user(user):
+    return ANONYMOUS_USER if user is None else _user(user)
+
+
+def tag_names(tags):
+    return [tag.name for tag in tags]
+
+
+def _comments(comments):
+    return serialize_comment.many(sorted(comments, key=lambda c: (c.created_at, c.id)))
+
+
+serialize_tag = Serializer(["id", "name", "description", "question_count"])
+serialize_question = Serializer(
+    ["id", "user_id", "title", "content", "created_at", "updated_at", "views", "upvotes", "downvotes",
+     "status", "answer_count", "comment_count"],
+    user=serialize_user, tags=tag_names,
+)
+serialize_comment = Serializer(["id", "content", "created_at", "question_id", "answer_id"], user=serialize_user)
+serialize_answer = Serializer(
+    ["id", "question_id", "content", "created_at", "updated_at", "upvotes", "downvotes", "is_accepted", "comment_count"],
+    user=serialize_user,
+)
+serialize_thread_answer = Serializer(serialize_answer.fields, user=serialize_user, comments=_comments)
+# Bản không kèm tags, dùng khi stream (tên tag được gắn theo từng lô)
+serialize_question_row = Serializer(serialize_question.fields, user=serialize_user)
+serialize_notification = Serializer(
+    ["id", "user_id", "content", "is_read", "created_at", "kind", "actor_id", "question_id", "answer_id"]
+)
+
+
+def respond(content, status_code: int = 200):
+    # Dữ liệu đã serialize từ ORM: bỏ qua bước validate response_model
+    if TRUSTED_SERIALIZATION:
+        return FastJSONResponse(content, status_code=status_code)
+    return content
@@ -0,0 +1,242 @@
+# Đo SQL theo từng request: số câu truy vấn, tổng thời gian DB và câu chậm nhất.
+#
+# Event hook trên engine đồng bộ và bất đồng bộ ghi vào RequestStats của request hiện tại
+# (contextvar, đi theo cả threadpool lẫn greenlet của engine async). SQLMetricsMiddleware
+# gắn header Server-Timing (db, app), ghi log có cấu trúc khi request vượt ngưỡng và cộng dồn
+# theo route để xem ở /admin/metrics. Câu chạy ngoài request (worker nền) không được tính.
+# Response stream (body chạy sau khi đã gửi header) không có Server-Timing, được gom riêng
+# dưới tên route kèm " (stream)" và không ghi log chậm; SSE (text/event-stream) không được tính.
+#
+# Ngưỡng: SLOW_REQUEST_MS, SLOW_QUERY_MS, SLOW_QUERY_COUNT. Tắt hẳn: SQL_METRICS=0.
+from collections import deque
+from sqlalchemy import event
+from .databases import engine, async_engine
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+SQL_METRICS = os.getenv("SQL_METRICS", "1") == "1"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_COUNT = int(os.getenv("SLOW_QUERY_COUNT", "25"))
+ROUTE_SAMPLES = 1000
+
+slow_log = logging.getLogger("BE_THLT_WEB.slow_requests")
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+
+_current = contextvars.ContextVar("sql_request_stats", default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    if elapsed > stats.slowest_seconds:
+        stats.slowest_seconds = elapsed
+        stats.slowest_statement = statement
+
+
+def _on_error(context):
+    # Câu lỗi không tới after_cursor_execute, bỏ mốc thời gian để stack không lệch
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def install():
+    for target in (engine, async_engine.sync_engine):
+        if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+            event.listen(target, "before_cursor_execute", _before_cursor_execute)
+            event.listen(target, "after_cursor_execute", _after_cursor_execute)
+            event.listen(target, "handle_error", _on_error)
+
+
+class RouteMetrics:
+    def __init__(self, samples: int = ROUTE_SAMPLES):
+        self.samples = samples
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            m = self._routes.get(route)
+            if m is None:
+                m = self._routes[route] = {
+                    "requests": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                    "queries": 0, "max_queries": 0, "db_seconds": 0.0, "slow": 0,
+                    "slowest_query_seconds": 0.0, "slowest_query": None,
+                    "latencies": deque(maxlen=self.samples),
+                }
+            m["requests"] += 1
+            m["errors"] += status >= 500
+            m["seconds"] += seconds
+            m["max_seconds"] = max(m["max_seconds"], seconds)
+            m["queries"] += stats.queries
+            m["max_queries"] = max(m["max_queries"], stats.queries)
+            m["db_seconds"] += stats.db_seconds
+            m["latencies"].append(seconds)
+            if stats.slowest_seconds > m["slowest_query_seconds"]:
+                m["slowest_query_seconds"] = stats.slowest_seconds
+                m["slowest_query"] = stats.slowest_statement
+
+    def mark_slow(self, route: str):
+        with self._lock:
+            self._routes[route]["slow"] += 1
+
+    def snapshot(self) -> list:
+        with self._lock:
+            routes = [(route, dict(m, latencies=sorted(m["latencies"]))) for route, m in self._routes.items()]
+        result = []
+        for route, m in routes:
+            n = m["requests"]
+            latencies = m["latencies"]
+            result.append({
+                "route": route,
+                "requests": n,
+                "errors": m["errors"],
+                "slow_requests": m["slow"],
+                "avg_ms": round(m["seconds"] / n * 1000, 2),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 2),
+                "max_ms": round(m["max_seconds"] * 1000, 2),
+                "avg_queries": round(m["queries"] / n, 2),
+                "max_queries": m["max_queries"],
+                "avg_db_ms": round(m["db_seconds"] / n * 1000, 2),
+                "db_share": round(m["db_seconds"] / m["seconds"], 3) if m["seconds"] else 0.0,
+                "total_ms": round(m["seconds"] * 1000, 1),
+                "slowest_query_ms": round(m["slowest_query_seconds"] * 1000, 2),
+                "slowest_query": m["slowest_query"],
+            })
+        # Route tốn nhiều thời gian nhất (tổng) lên đầu
+        result.sort(key=lambda r: r["total_ms"], reverse=True)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+route_metrics = RouteMetrics()
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    # Không khớp route (404) gom chung một nhóm để không phình theo path lạ
+    return f"{scope['method']} {route.path}" if route is not None else f"{scope['method']} <unmatched>"
+
+
+def _streams_body(status: int, headers) -> bool:
+    # StreamingResponse không có content-length (204/304 cũng không nhưng không có body)
+    return status not in (204, 304) and all(name.lower() != b"content-length" for name, _ in headers)
+
+
+def _server_timing(stats: RequestStats, seconds: float) -> bytes:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries", '
+        f'app;dur={seconds * 1000:.2f}'
+    ).encode()
+
+
+class SQLMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_METRICS:
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        kind = None
+
+        async def send_with_timing(message):
+            nonlocal status, kind
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                content_type = dict(headers).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    kind = "sse"
+                elif _streams_body(status, headers):
+                    # Câu truy vấn chạy trong lúc stream body, lúc này chưa đo được
+                    kind = "stream"
+                else:
+                    headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self._finish(scope, status, time.perf_counter() - started, stats, kind)
+
+    def _finish(self, scope, status: int, seconds: float, stats: RequestStats, kind: str = None):
+        if kind == "sse":
+            # Kết nối SSE sống hàng phút, thời gian chỉ là thời gian client giữ kết nối
+            return
+        route = _route_name(scope)
+        if kind == "stream":
+            # Thời gian gồm cả tốc độ đọc của client, số câu tăng theo số batch: không so với ngưỡng
+            route_metrics.record(f"{route} (stream)", status, seconds, stats)
+            return
+        route_metrics.record(route, status, seconds, stats)
+        reasons = []
+        if seconds * 1000 >= SLOW_REQUEST_MS:
+            reasons.append("slow_request")
+        if stats.slowest_seconds * 1000 >= SLOW_QUERY_MS:
+            reasons.append("slow_query")
+        if stats.queries >= SLOW_QUERY_COUNT:
+            reasons.append("query_count")
+        if not reasons:
+            return
+        route_metrics.mark_slow(route)
+        slow_log.warning(json.dumps({
+            "event": "slow_request",
+            "reasons": reasons,
+            "route": route,
+            "path": scope["path"],
+            "status": status,
+            "duration_ms": round(seconds * 1000, 2),
+            "queries": stats.queries,
+            "db_ms": round(stats.db_seconds * 1000, 2),
+            "slowest_query_ms": round(stats.slowest_seconds * 1000, 2),
+            "slowest_query": (stats.slowest_statement or "")[:500],
+        }, ensure_ascii=False))
+
+
+def metrics() -> dict:
+    return {
+        "enabled": SQL_METRICS,
+        "thresholds": {"slow_request_ms": SLOW_REQUEST_MS, "slow_query_ms": SLOW_QUERY_MS, "slow_query_count": SLOW_QUERY_COUNT},
+        "routes": route_metrics.snapshot(),
+    }
+
+
+if SQL_METRICS:
+    install()
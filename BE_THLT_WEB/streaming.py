@@ -0,0 +1,58 @@
+# Trả danh sách lớn theo kiểu streaming thay vì dựng cả body trong bộ nhớ.
+#
+# Câu truy vấn chạy với yield_per (MySQL dùng server-side cursor, SQLite đọc dần từ cursor),
+# mỗi lô được serialize rồi ghi ra ngay dưới dạng mảng JSON hoặc NDJSON. Generator chạy
+# trong threadpool của StreamingResponse và dùng session riêng, không phụ thuộc vòng đời get_db.
+# Connection đang stream không chạy được câu khác (MySQL), nên dữ liệu phụ cho từng lô
+# (vd tên tag của câu hỏi) lấy qua callback enrich trên một connection thứ hai.
+from starlette.responses import StreamingResponse
+from .databases import SessionLocal, engine
+import orjson
+import os
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+STREAM_MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def iter_batches(stmt, serialize, batch_size: int = STREAM_BATCH_SIZE, enrich=None, scalars: bool = True):
+    db = SessionLocal()
+    side = None
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        rows = result.scalars() if scalars else result.mappings()
+        for partition in rows.partitions():
+            items = [serialize(row) for row in partition]
+            if enrich is not None:
+                if side is None:
+                    side = engine.connect()
+                enrich(side, items)
+            # Identity map giữ tham chiếu yếu: lô đã ghi ra được giải phóng, không tích lũy theo kích thước kết quả
+            yield items
+    finally:
+        if side is not None:
+            side.close()
+        db.close()
+
+
+def encode_batches(batches, fmt: str):
+    if fmt == "ndjson":
+        for items in batches:
+            if items:
+                yield b"".join(orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE) for item in items)
+        return
+    yield b"["
+    first = True
+    for items in batches:
+        if not items:
+            continue
+        body = b",".join(orjson.dumps(item) for item in items)
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def stream_response(stmt, serialize, fmt: str = "json", batch_size: int = STREAM_BATCH_SIZE, enrich=None, scalars: bool = True):
+    return StreamingResponse(
+        encode_batches(iter_batches(stmt, serialize, batch_size, enrich, scalars), fmt),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+    )
@@ -0,0 +1,51 @@
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from .models import Tag, QuestionTag, FollowTag
+
+
+def adjust_tag_counts(db: Session, tag_ids, delta: int):
+    # Cộng/trừ phía server trong transaction hiện tại, không đọc giá trị lên Python
+    tag_ids = set(tag_ids)
+    if not tag_ids or not delta:
+        return
+    db.query(Tag).filter(Tag.id.in_(tag_ids)).update(
+        {Tag.question_count: Tag.question_count + delta}, synchronize_session=False
+    )
+
+
+def adjust_follower_count(db: Session, tag_id: int, delta: int):
+    db.query(Tag).filter(Tag.id == tag_id).update(
+        {Tag.follower_count: Tag.follower_count + delta}, synchronize_session=False
+    )
+
+
+def reconcile_tag_counts(db: Session) -> int:
+    # Tính lại toàn bộ question_count/follower_count bằng mỗi cột một câu UPDATE
+    actual = (
+        select(func.count(QuestionTag.question_id))
+        .where(QuestionTag.tag_id == Tag.id)
+        .scalar_subquery()
+    )
+    updated = db.query(Tag).filter(Tag.question_count != actual).update(
+        {Tag.question_count: actual}, synchronize_session=False
+    )
+    followers = (
+        select(func.count(FollowTag.user_id))
+        .where(FollowTag.tag_id == Tag.id)
+        .scalar_subquery()
+    )
+    updated += db.query(Tag).filter(Tag.follower_count != followers).update(
+        {Tag.follower_count: followers}, synchronize_session=False
+    )
+    db.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    from .databases import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Đã sửa {reconcile_tag_counts(session)} bộ đếm question_count/follower_count")
+    finally:
+        session.close()
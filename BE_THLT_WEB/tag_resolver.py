@@ -0,0 +1,106 @@
+# Đổi danh sách tên tag sang id: một câu IN cho các tên chưa có trong cache, các tên còn thiếu
+# được tạo bằng một INSERT IGNORE hàng loạt rồi đọc lại id bằng một câu IN nữa.
+#
+# Tag được tạo ngay trong transaction của request (savepoint), không mượn thêm connection khỏi pool.
+# INSERT IGNORE giúp hai người cùng đăng câu hỏi với tag mới không đụng unique constraint; lần đọc
+# lại dùng locking read để thấy cả tag do request kia vừa commit (snapshot REPEATABLE READ thì không).
+# Id của tag vừa tạo chỉ vào cache ở lần resolve sau, khi chắc chắn transaction tạo nó đã commit.
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .databases import insert_ignore
+from .models import Tag
+from collections import OrderedDict
+import os
+import threading
+
+TAG_CACHE_SIZE = int(os.getenv("TAG_CACHE_SIZE", "10000"))
+
+_tags = Tag.__table__
+
+
+class TagResolver:
+    def __init__(self, maxsize: int = TAG_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+
+    def _get(self, name: str):
+        with self._lock:
+            tag_id = self._data.get(name)
+            if tag_id is not None:
+                self._data.move_to_end(name)
+            return tag_id
+
+    def _set_many(self, mapping: dict):
+        with self._lock:
+            for name, tag_id in mapping.items():
+                self._data[name] = tag_id
+                self._data.move_to_end(name)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def _lookup(self, db: Session, names, lock: bool = False) -> dict:
+        query = select(_tags.c.name, _tags.c.id).where(_tags.c.name.in_(names))
+        if lock:
+            query = query.with_for_update(read=True)
+        found = dict(db.execute(query).all())
+        # Collation MySQL không phân biệt hoa thường: "Python" khớp dòng "python" có sẵn
+        folded = {name.casefold(): tag_id for name, tag_id in found.items()}
+        return {name: found.get(name, folded.get(name.casefold())) for name in names if name in found or name.casefold() in folded}
+
+    def resolve(self, db: Session, names) -> dict:
+        # Trả {tên: id} theo thứ tự tên truyền vào, bỏ tên rỗng và tên trùng
+        names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+        result = {}
+        missing = []
+        for name in names:
+            tag_id = self._get(name)
+            if tag_id is None:
+                missing.append(name)
+            else:
+                result[name] = tag_id
+        self.hits += len(names) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            found = self._lookup(db, missing)
+            self._set_many(found)
+            to_create = [name for name in missing if name not in found]
+            if to_create:
+                try:
+                    with db.begin_nested():
+                        db.execute(insert_ignore(_tags, db.get_bind().dialect.name), [{"name": name} for name in to_create])
+                except IntegrityError:
+                    # Dialect không có INSERT IGNORE: tag đã được request khác tạo, đọc lại bên dưới
+                    pass
+                self.created += len(to_create)
+                found.update(self._lookup(db, to_create, lock=True))
+            result.update(found)
+        return {name: result[name] for name in names if name in result}
+
+    def invalidate(self, name: str):
+        with self._lock:
+            self._data.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "created": self.created,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+tag_resolver = TagResolver()
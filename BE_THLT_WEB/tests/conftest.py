@@ -0,0 +1,17 @@
+import pytest
+from fastapi.testclient import TestClient
+from ..databases import Base, engine
+from ..main import app
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    Base.metadata.create_all(bind=engine)
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Không vào context của TestClient: không chạy startup (worker nền, job xếp hạng)
+    return TestClient(app)
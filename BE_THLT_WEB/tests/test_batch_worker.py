@@ -0,0 +1,70 @@
+# Worker nền: lỗi dữ liệu chỉ bỏ sự kiện hỏng, lỗi DB tạm thời giữ nguyên cả lô trong hàng đợi
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from ..databases import SessionLocal
+from ..models import User
+from ..reputation import ReputationWorker
+from ..utils import load_user, user_cache
+
+
+def make_user(name):
+    db = SessionLocal()
+    user = User(username=name, email=f"{name}@example.com", password="x", reputation=0)
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def reputation(user_id):
+    db = SessionLocal()
+    value = db.get(User, user_id).reputation
+    db.close()
+    return value
+
+
+def event(user_id, delta=10):
+    return {"user_id": user_id, "actor_id": None, "reason": "answer_upvote", "delta": delta, "question_id": 1, "answer_id": None}
+
+
+def test_bad_event_is_dead_lettered():
+    user_id = make_user("worker-bad")
+    worker = ReputationWorker()
+    worker.enqueue([event(user_id), event(None), event(user_id)])
+    assert worker.flush() == 2
+    assert reputation(user_id) == 20
+    assert worker.dropped_events == 1
+    assert worker.dead_letters[0]["user_id"] is None
+    assert worker.metrics()["queued_events"] == 0
+
+
+def test_outage_keeps_events_queued():
+    user_id = make_user("worker-outage")
+    # DB không mở được: OperationalError cho mọi lần ghi
+    down = sessionmaker(bind=create_engine("sqlite:////nonexistent/dir/down.db"))
+    worker = ReputationWorker(session_factory=down, interval=0.01)
+    worker.enqueue([event(user_id) for _ in range(3)])
+    for _ in range(10):
+        assert worker.flush() == 0
+    assert worker.dropped_events == 0
+    assert worker.failed_flushes == 10
+    assert worker.metrics()["queued_events"] == 3
+    assert worker._retry_at > 0
+
+    worker.session_factory = SessionLocal
+    assert worker.flush() == 3
+    assert reputation(user_id) == 30
+    assert worker._backoff == 0
+
+
+def test_flush_invalidates_cached_user():
+    user_id = make_user("worker-cache")
+    db = SessionLocal()
+    load_user(user_id, db)
+    db.close()
+    assert user_cache.get(user_id).reputation == 0
+    worker = ReputationWorker()
+    worker.enqueue([event(user_id)])
+    worker.flush()
+    assert user_cache.get(user_id) is None
@@ -0,0 +1,36 @@
+# Nhập NDJSON: dòng lỗi chỉ bị bỏ riêng, user_id không tồn tại thành ẩn danh kèm lỗi
+import orjson
+
+from ..bulk_io import import_lines
+from ..databases import SessionLocal
+from ..models import Answer, Question, User
+
+
+def line(**record):
+    return orjson.dumps({"type": "question", "content": "...", **record}).decode()
+
+
+def test_user_references():
+    db = SessionLocal()
+    user = User(username="importer", email="importer@example.com", password="x")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+
+    report = import_lines([
+        line(title="import-by-id", user_id=user_id, answers=[{"content": "a", "user_id": 10 ** 9}]),
+        line(title="import-by-name", username="importer"),
+        line(title="import-bad-id", user_id="abc"),
+        line(title="import-unknown", user_id=10 ** 9),
+    ])
+    assert report["questions"] == 3 and report["skipped"] == 1
+    assert sorted(e["line"] for e in report["errors"]) == [1, 3, 4]
+    assert report["anonymous"] == 2
+
+    db = SessionLocal()
+    owners = dict(db.query(Question.title, Question.user_id).filter(Question.title.like("import-%")))
+    answer_owner = db.query(Answer.user_id).join(Question).filter(Question.title == "import-by-id").scalar()
+    db.close()
+    assert owners == {"import-by-id": user_id, "import-by-name": user_id, "import-unknown": None}
+    assert answer_owner is None
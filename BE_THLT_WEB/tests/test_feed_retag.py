@@ -0,0 +1,51 @@
+# Sửa tag của câu hỏi phải cập nhật feed của người theo dõi các tag nhỏ
+import itertools
+
+from ..databases import SessionLocal
+from ..feed import feed_worker
+from ..models import FeedEntry, Tag
+
+_names = itertools.count()
+
+
+def login(client):
+    name = f"feed{next(_names)}"
+    client.post("/auth/register", json={"username": name, "email": f"{name}@example.com", "password": "p"})
+    token = client.post("/auth/login", data={"username": f"{name}@example.com", "password": "p"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def tag_id(name):
+    db = SessionLocal()
+    value = db.query(Tag.id).filter(Tag.name == name).scalar()
+    db.close()
+    return value
+
+
+def feed_users(question_id):
+    db = SessionLocal()
+    users = {row.user_id for row in db.query(FeedEntry.user_id).filter(FeedEntry.question_id == question_id)}
+    db.close()
+    return users
+
+
+def user_id(client, headers):
+    return client.get("/users/me", headers=headers).json()["id"]
+
+
+def test_retag_updates_feed(client):
+    author = login(client)
+    client.post("/questions", json={"title": "Other", "content": "...", "tags": ["retag-c"]}, headers=author)
+    question = client.post("/questions", json={"title": "Retag", "content": "...", "tags": ["retag-a", "retag-b"]}, headers=author).json()
+    feed_worker.flush()
+    a_only, both, c_only = (login(client) for _ in range(3))
+    # Theo dõi tag nhỏ: backfill đưa các câu hỏi có sẵn của tag vào feed
+    for headers, names in [(a_only, ["retag-a"]), (both, ["retag-a", "retag-b"]), (c_only, ["retag-c"])]:
+        for name in names:
+            assert client.post(f"/tags/follow/{tag_id(name)}", headers=headers).status_code == 200
+    assert feed_users(question["id"]) == {user_id(client, h) for h in (a_only, both)}
+
+    response = client.put(f"/questions/{question['id']}", json={"title": "Retag", "content": "...", "tags": ["retag-b", "retag-c"]}, headers=author)
+    assert response.status_code == 200
+    # Bỏ retag-a: a_only mất câu hỏi, both vẫn giữ nhờ retag-b. Thêm retag-c: c_only nhận câu hỏi
+    assert feed_users(question["id"]) == {user_id(client, h) for h in (both, c_only)}
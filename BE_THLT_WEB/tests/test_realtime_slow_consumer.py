@@ -0,0 +1,57 @@
+# Realtime hub với client đọc chậm: hàng đợi có giới hạn, resync khi tràn, ngắt khi chậm mãi
+import asyncio
+
+from ..benchmarks.realtime_slow_consumer import run
+from ..realtime import CLOSED, LocalBackend, RealtimeHub
+
+
+def publish(hub, start, count):
+    for n in range(start, start + count):
+        hub.publish("question:1", "vote.changed", {"n": n})
+
+
+def test_slow_consumer_gets_resync():
+    async def scenario():
+        hub = RealtimeHub(LocalBackend(), queue_size=5, max_resyncs=3)
+        slow = hub.subscribe(["question:1"])
+        publish(hub, 0, 11)
+        assert slow.queue.qsize() <= 5
+        first = await slow.get(1)
+        # Marker resync gộp số sự kiện bị bỏ của mọi lần tràn chưa đọc
+        assert first == {"type": "resync", "dropped": 11}
+        publish(hub, 11, 1)
+        event = await slow.get(1)
+        assert event["data"] == {"n": 11}
+        assert slow.resyncs == 0
+        hub.unsubscribe(slow)
+        assert hub.metrics()["connections"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_disconnected_after_max_resyncs():
+    async def scenario():
+        hub = RealtimeHub(LocalBackend(), queue_size=5, max_resyncs=2)
+        slow = hub.subscribe(["question:1"])
+        fast = hub.subscribe(["question:1"])
+        for start in range(0, 30, 5):
+            publish(hub, start, 5)
+            while (await fast.get(0.1)) is not None:
+                pass
+        assert (await slow.get(1)) is CLOSED
+        assert hub.disconnected_slow == 1
+        # Client đọc nhanh không bị ảnh hưởng
+        publish(hub, 30, 1)
+        assert (await fast.get(1))["data"] == {"n": 30}
+        hub.unsubscribe(slow)
+        hub.unsubscribe(fast)
+        metrics = hub.metrics()
+        assert metrics["connections"] == 0 and metrics["channels"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_publish_from_thread_with_slow_consumer():
+    # Ít sự kiện: client chậm chỉ bị resync. Nhiều sự kiện: bị ngắt. Client nhanh luôn nhận đủ, đúng thứ tự
+    assert asyncio.run(run(101, 50, max_resyncs=5)) == []
+    assert asyncio.run(run(1000, 50, max_resyncs=5)) == []
@@ -0,0 +1,29 @@
+# Ngân sách câu truy vấn của GET /questions/{id}/thread: cố định, không tăng theo số câu trả lời/bình luận
+import itertools
+
+import pytest
+from ..benchmarks.thread_queries import QUERY_BUDGET, count_queries, seed
+
+_prefixes = itertools.count()
+
+
+def thread(client, answers, comments, logged_in):
+    question_id, token = seed(f"t{next(_prefixes)}x", answers, comments)
+    headers = {"Authorization": f"Bearer {token}"} if logged_in else {}
+    return count_queries(client, f"/questions/{question_id}/thread", headers)
+
+
+@pytest.mark.parametrize("logged_in", [False, True])
+def test_query_budget(client, logged_in):
+    small, _ = thread(client, 1, 1, logged_in)
+    large, body = thread(client, 50, 5, logged_in)
+    assert len(body["answers"]) == 50
+    assert large <= QUERY_BUDGET
+    assert large == small
+
+
+def test_thread_content(client):
+    _, body = thread(client, 20, 3, logged_in=True)
+    assert body["is_saved"] and body["my_vote"] == "up"
+    assert all(a["my_vote"] == "up" for a in body["answers"])
+    assert all(len(a["comments"]) == 3 for a in body["answers"])
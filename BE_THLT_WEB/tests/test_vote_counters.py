@@ -0,0 +1,65 @@
+# upvotes/downvotes phải khớp chính xác với bảng votes, kể cả khi nhiều user vote đồng thời
+import threading
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from ..benchmarks.vote_load import setup, verify, voter
+from ..databases import Base
+from ..models import Question
+from ..vote_engine import cast_vote
+
+USERS = 20
+
+
+@pytest.fixture
+def Session(tmp_path):
+    # DB riêng cho mỗi test để verify so sánh trên toàn bộ bảng votes
+    engine = create_engine(f"sqlite:///{tmp_path / 'votes.db'}", connect_args={"timeout": 60}, pool_size=USERS, max_overflow=0)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+def counters(Session, question_id):
+    db = Session()
+    question = db.get(Question, question_id)
+    db.close()
+    return question.upvotes, question.downvotes
+
+
+def test_vote_switch_and_repeat(Session):
+    user_ids, (question_id,) = setup(Session, 2, 1)
+    steps = [
+        (user_ids[0], "up", (1, 0)),
+        (user_ids[1], "down", (1, 1)),
+        (user_ids[0], "down", (0, 2)),
+        (user_ids[1], "up", (1, 1)),
+    ]
+    for user_id, vote_type, expected in steps:
+        db = Session()
+        cast_vote(db, user_id, vote_type, question_id=question_id)
+        db.close()
+        assert counters(Session, question_id) == expected
+
+    db = Session()
+    with pytest.raises(HTTPException) as error:
+        cast_vote(db, user_ids[1], "up", question_id=question_id)
+    db.close()
+    assert error.value.status_code == 400
+    assert counters(Session, question_id) == (1, 1)
+    assert verify(Session) == []
+
+
+def test_concurrent_votes_exact(Session):
+    user_ids, question_ids = setup(Session, USERS, 3)
+    stats = {"applied": 0, "rejected": 0, "retried": 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=voter, args=(Session, uid, question_ids, 15, stats, lock)) for uid in user_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert stats["applied"] > 0
+    assert verify(Session) == []
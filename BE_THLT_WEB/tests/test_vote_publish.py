@@ -0,0 +1,50 @@
+# Vote chỉ đọc lại số phiếu để publish khi kênh question:{id} có người nghe
+import asyncio
+
+from sqlalchemy import event
+from ..databases import engine
+from ..realtime import LocalBackend, RealtimeHub, realtime_hub
+
+
+def login(client, name):
+    client.post("/auth/register", json={"username": name, "email": f"{name}@example.com", "password": "p"})
+    token = client.post("/auth/login", data={"username": f"{name}@example.com", "password": "p"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def vote_queries(client, headers, question_id):
+    counter = {"n": 0}
+
+    def on_execute(*args):
+        counter["n"] += 1
+    event.listen(engine, "before_cursor_execute", on_execute)
+    try:
+        response = client.post("/votes", json={"vote_type": "up", "question_id": question_id}, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", on_execute)
+    assert response.status_code == 200
+    return counter["n"]
+
+
+def test_vote_skips_count_query_without_subscribers(client, monkeypatch):
+    author = login(client, "publish-author")
+    voters = [login(client, f"publish-voter{i}") for i in range(2)]
+    question_id = client.post("/questions", json={"title": "Publish", "content": "...", "tags": []}, headers=author).json()["id"]
+    # Lượt đầu làm ấm cache user của voter
+    client.get("/users/me", headers=voters[0])
+    client.get("/users/me", headers=voters[1])
+    quiet = vote_queries(client, voters[0], question_id)
+    monkeypatch.setattr(realtime_hub, "has_subscribers", lambda channels: True)
+    assert vote_queries(client, voters[1], question_id) == quiet + 1
+
+
+def test_has_subscribers():
+    async def scenario():
+        hub = RealtimeHub(LocalBackend())
+        assert not hub.has_subscribers(["question:1"])
+        subscription = hub.subscribe(["question:1"])
+        assert hub.has_subscribers(["question:2", "question:1"])
+        hub.unsubscribe(subscription)
+        assert not hub.has_subscribers(["question:1"])
+
+    asyncio.run(scenario())
@@ -1,25 +1,39 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from . import models, databases
+from .passwords import password_hasher
 from sqlalchemy.orm import Session
+from collections import OrderedDict
 import os
+import threading
+import time
 
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Cho phép endpoint chỉ đọc tin claims trong token, không cần tra user
+AUTH_STATELESS_READS = os.getenv("AUTH_STATELESS_READS", "false").lower() in ("1", "true", "yes")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_and_update(plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password, hashed_password):
+    # Trả về (đúng/sai, hash mới nếu hash cũ cần nâng cấp theo cấu hình hiện tại)
+    return password_hasher.verify_and_update(plain_password, hashed_password)
+
+def token_claims(user) -> dict:
+    return {"sub": str(user.id), "username": user.username, "role": user.role}
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -56,23 +70,116 @@ def create_access_token(data: dict):
 #         raise credentials_exception
 #     return user
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(databases.get_db)):
-    credentials_exception = HTTPException(
+class UserPrincipal:
+    # Bản chụp các cột của User, không gắn với Session nên dùng lại được giữa các request
+    __slots__ = ("id", "username", "email", "password", "created_at", "reputation", "role", "avatar", "bio", "title")
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_user(cls, user: models.User):
+        return cls(**{name: getattr(user, name) for name in cls.__slots__})
+
+
+class UserCache:
+    # LRU có TTL cho user đã xác thực, key là user id
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uid: int):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(uid)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[uid]
+                self.misses += 1
+                return None
+            self._data.move_to_end(uid)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, uid: int, principal: UserPrincipal):
+        with self._lock:
+            self._data[uid] = (principal, time.monotonic() + self.ttl)
+            self._data.move_to_end(uid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, uid: int):
+        with self._lock:
+            self._data.pop(uid, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+user_cache = UserCache(USER_CACHE_TTL, USER_CACHE_SIZE)
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str: str = payload.get("sub")  # JWT chứa ID người dùng trong trường "sub"
         if user_id_str is None:
-            raise credentials_exception
-        uid = int(user_id_str)
+            raise _credentials_exception()
+        payload["uid"] = int(user_id_str)
     except (JWTError, ValueError):
-        raise credentials_exception
+        raise _credentials_exception()
+    return payload
+
+def load_user(uid: int, db: Session):
+    principal = user_cache.get(uid)
+    if principal is None:
+        user = db.query(models.User).filter(models.User.id == uid).first()
+        if user is None:
+            raise _credentials_exception()
+        principal = UserPrincipal.from_user(user)
+        user_cache.set(uid, principal)
+    return principal
 
-    user = db.query(models.User).filter(models.User.id == uid).first()
-    if user is None:
-        raise credentials_exception
-    return user
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(databases.get_db)):
+    return load_user(_decode_token(token)["uid"], db)
 
+def get_current_user_readonly(token: str = Depends(oauth2_scheme), db: Session = Depends(databases.get_db)):
+    # Dùng cho endpoint chỉ đọc: ở chế độ stateless tin claims trong token, không tra DB
+    payload = _decode_token(token)
+    if AUTH_STATELESS_READS and "username" in payload:
+        return UserPrincipal(id=payload["uid"], username=payload["username"], role=payload.get("role", "student"))
+    return load_user(payload["uid"], db)
+
+def get_optional_user(token: str = Depends(oauth2_scheme_optional), db: Session = Depends(databases.get_db)):
+    # Endpoint công khai nhưng trả thêm trạng thái riêng khi có đăng nhập
+    if not token:
+        return None
+    try:
+        return load_user(_decode_token(token)["uid"], db)
+    except HTTPException:
+        return None
@@ -0,0 +1,131 @@
+from sqlalchemy import bindparam
+from .databases import SessionLocal
+from .models import Question
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))
+VIEW_FLUSH_THRESHOLD = int(os.getenv("VIEW_FLUSH_THRESHOLD", "500"))
+
+_questions = Question.__table__
+_bulk_update = (
+    _questions.update()
+    .where(_questions.c.id == bindparam("qid"))
+    .values(views=_questions.c.views + bindparam("delta"), updated_at=_questions.c.updated_at)
+)
+
+
+class ViewCounter:
+    # Gom lượt xem theo question_id trong bộ nhớ, ghi xuống DB bằng một UPDATE hàng loạt
+    def __init__(self, session_factory=SessionLocal, interval: float = VIEW_FLUSH_INTERVAL, threshold: int = VIEW_FLUSH_THRESHOLD):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.threshold = threshold
+        self._pending = {}
+        self._oldest_pending_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.total_flushed = 0
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush_at = None
+        self.last_flush_duration = 0.0
+        self.last_flush_lag = 0.0
+        self.max_flush_lag = 0.0
+
+    def increment(self, question_id: int, amount: int = 1):
+        with self._lock:
+            self._pending[question_id] = self._pending.get(question_id, 0) + amount
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+            over_threshold = len(self._pending) >= self.threshold
+        if over_threshold:
+            self._wakeup.set()
+
+    def pending(self, question_id: int) -> int:
+        with self._lock:
+            return self._pending.get(question_id, 0)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                oldest, self._oldest_pending_at = self._oldest_pending_at, None
+            if not batch:
+                return 0
+            started = time.monotonic()
+            db = self.session_factory()
+            try:
+                db.execute(_bulk_update, [{"qid": qid, "delta": delta} for qid, delta in batch.items()])
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.failed_flushes += 1
+                logger.exception("Flush lượt xem thất bại, giữ lại %d câu hỏi cho lần sau", len(batch))
+                with self._lock:
+                    for qid, delta in batch.items():
+                        self._pending[qid] = self._pending.get(qid, 0) + delta
+                    if self._oldest_pending_at is None or oldest < self._oldest_pending_at:
+                        self._oldest_pending_at = oldest
+                return 0
+            finally:
+                db.close()
+            finished = time.monotonic()
+            self.total_flushed += sum(batch.values())
+            self.flush_count += 1
+            self.last_flush_at = time.time()
+            self.last_flush_duration = finished - started
+            self.last_flush_lag = finished - oldest
+            self.max_flush_lag = max(self.max_flush_lag, self.last_flush_lag)
+            return len(batch)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            pending_questions = len(self._pending)
+            pending_views = sum(self._pending.values())
+            oldest = self._oldest_pending_at
+        return {
+            "pending_questions": pending_questions,
+            "pending_views": pending_views,
+            "current_lag_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+            "last_flush_lag_seconds": self.last_flush_lag,
+            "max_flush_lag_seconds": self.max_flush_lag,
+            "last_flush_duration_seconds": self.last_flush_duration,
+            "last_flush_at": self.last_flush_at,
+            "flush_count": self.flush_count,
+            "failed_flushes": self.failed_flushes,
+            "total_flushed_views": self.total_flushed,
+            "interval_seconds": self.interval,
+            "threshold": self.threshold,
+        }
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,139 @@
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from .databases import insert_ignore
+from .models import Vote, Question, Answer
+from .reputation import reputation_worker, vote_events
+from .ranking import touch_question
+from collections import defaultdict
+import datetime
+
+VOTE_VALUES = {"up": 1, "down": -1}
+_votes = Vote.__table__
+
+
+def vote_value(vote_type: str) -> int:
+    if vote_type not in VOTE_VALUES:
+        raise HTTPException(status_code=400, detail="vote_type phải là 'up' hoặc 'down'")
+    return VOTE_VALUES[vote_type]
+
+
+def _insert_if_absent(db: Session, values: dict) -> bool:
+    # Upsert dựa trên unique (user_id, question_id)/(user_id, answer_id), True nếu thực sự insert
+    stmt = insert_ignore(_votes, db.get_bind().dialect.name).values(**values)
+    return db.execute(stmt).rowcount == 1
+
+
+def _target_column(question_id, answer_id):
+    if question_id is not None:
+        return _votes.c.question_id, question_id
+    return _votes.c.answer_id, answer_id
+
+
+def record_vote(db: Session, user_id: int, question_id, answer_id, value: int):
+    # Ghi phiếu của user, trả về (delta upvotes, delta downvotes) hoặc None nếu đã vote như vậy rồi.
+    # Không đọc phiếu cũ lên Python: UPDATE có điều kiện đổi chiều phiếu, nếu không có thì INSERT.
+    column, target_id = _target_column(question_id, answer_id)
+    switched = db.execute(
+        _votes.update()
+        .where(_votes.c.user_id == user_id, column == target_id, _votes.c.vote_type == -value)
+        .values(vote_type=value)
+    ).rowcount
+    if switched:
+        return (1, -1) if value == 1 else (-1, 1)
+    inserted = _insert_if_absent(db, {
+        "user_id": user_id,
+        "vote_type": value,
+        "question_id": question_id,
+        "answer_id": answer_id,
+    })
+    if not inserted:
+        return None
+    return (1, 0) if value == 1 else (0, 1)
+
+
+def apply_counter_delta(db: Session, model, target_id: int, up: int, down: int):
+    values = {"upvotes": model.upvotes + up, "downvotes": model.downvotes + down, "updated_at": model.updated_at}
+    if model is Question:
+        values["activity_at"] = datetime.datetime.now()
+    db.execute(update(model).where(model.id == target_id).values(**values))
+
+
+def find_targets(db: Session, question_ids, answer_ids):
+    # Trả về ({question_id: tác giả}, {answer_id: (question_id, tác giả)}) bằng tối đa 2 câu truy vấn
+    questions = {}
+    answers = {}
+    if question_ids:
+        questions = {r.id: r.user_id for r in db.query(Question.id, Question.user_id).filter(Question.id.in_(set(question_ids)))}
+    if answer_ids:
+        answers = {
+            r.id: (r.question_id, r.user_id)
+            for r in db.query(Answer.id, Answer.question_id, Answer.user_id).filter(Answer.id.in_(set(answer_ids)))
+        }
+    return questions, answers
+
+
+def cast_vote(db: Session, user_id: int, vote_type: str, question_id=None, answer_id=None):
+    value = vote_value(vote_type)
+    questions, answers = find_targets(db, [question_id] if question_id else [], [answer_id] if answer_id else [])
+    if question_id and question_id not in questions:
+        raise HTTPException(status_code=404, detail="Question not found")
+    if answer_id and answer_id not in answers:
+        raise HTTPException(status_code=404, detail="Answer not found")
+    delta = record_vote(db, user_id, question_id, answer_id, value)
+    if delta is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="You have already voted this way")
+    if question_id:
+        apply_counter_delta(db, Question, question_id, *delta)
+        events = vote_events("question", questions[question_id], user_id, *delta, question_id=question_id)
+    else:
+        apply_counter_delta(db, Answer, answer_id, *delta)
+        touch_question(db, answers[answer_id][0])
+        events = vote_events("answer", answers[answer_id][1], user_id, *delta, question_id=answers[answer_id][0], answer_id=answer_id)
+    db.commit()
+    reputation_worker.enqueue(events)
+    return answers[answer_id][0] if answer_id else question_id
+
+
+def cast_votes(db: Session, user_id: int, votes: list):
+    # Áp dụng nhiều phiếu trong một transaction, cộng dồn delta rồi UPDATE mỗi target một lần
+    questions, answers = find_targets(
+        db,
+        [v.question_id for v in votes if v.question_id],
+        [v.answer_id for v in votes if v.answer_id],
+    )
+    deltas = defaultdict(lambda: [0, 0])
+    events = []
+    results = []
+    for v in votes:
+        if v.vote_type not in VOTE_VALUES:
+            results.append({"question_id": v.question_id, "answer_id": v.answer_id, "status": "invalid"})
+            continue
+        if (v.question_id and v.question_id not in questions) or (v.answer_id and v.answer_id not in answers):
+            results.append({"question_id": v.question_id, "answer_id": v.answer_id, "status": "not_found"})
+            continue
+        delta = record_vote(db, user_id, v.question_id, v.answer_id, VOTE_VALUES[v.vote_type])
+        if delta is None:
+            results.append({"question_id": v.question_id, "answer_id": v.answer_id, "status": "already_voted"})
+            continue
+        if v.question_id:
+            key = (Question, v.question_id)
+            events += vote_events("question", questions[v.question_id], user_id, *delta, question_id=v.question_id)
+        else:
+            key = (Answer, v.answer_id)
+            question_id, owner_id = answers[v.answer_id]
+            events += vote_events("answer", owner_id, user_id, *delta, question_id=question_id, answer_id=v.answer_id)
+        deltas[key][0] += delta[0]
+        deltas[key][1] += delta[1]
+        results.append({"question_id": v.question_id, "answer_id": v.answer_id, "status": "applied"})
+    for (model, target_id), (up, down) in deltas.items():
+        if up or down:
+            apply_counter_delta(db, model, target_id, up, down)
+    for question_id in {answers[tid][0] for (model, tid) in deltas if model is Answer}:
+        touch_question(db, question_id)
+    db.commit()
+    reputation_worker.enqueue(events)
+    touched_questions = {tid for (model, tid) in deltas if model is Question}
+    touched_answer_questions = {answers[tid][0] for (model, tid) in deltas if model is Answer}
+    return results, touched_questions, touched_answer_questions
@@ -0,0 +1,10 @@
+# Cấu hình môi trường cho test trước khi import BE_THLT_WEB (databases tạo engine ngay lúc import).
+# Test chạy trên SQLite tạm dạng file: engine đồng bộ và bất đồng bộ (aiosqlite) phải cùng nhìn thấy dữ liệu,
+# SQLite in-memory không chia sẻ được giữa hai engine. Đặt TEST_DATABASE_URL để chạy trên DB khác (phải trống).
+#
+#   python -m pytest BE_THLT_WEB/tests
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")